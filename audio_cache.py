@@ -0,0 +1,131 @@
+"""
+Audio Cache
+Content-addressed on-disk cache for synthesized speech, bounded by total size with LRU eviction.
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class AudioCache:
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, extension=".wav"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # key -> size (least recently used first)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Rebuild the LRU order from file modification times (refreshed on every hit)
+        entries = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.endswith(extension):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-len(extension)], stat.st_size))
+            elif name.endswith(".tmp") and time.time() - os.path.getmtime(path) > 3600:
+                os.remove(path)  # Leftover from an interrupted download (recent ones may belong to another worker)
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+    @staticmethod
+    def key(*parts):
+        """Content address for the synthesis inputs, e.g. key(text, voice, speed)."""
+        return hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.extension)
+
+    def get(self, key):
+        """Returns the cached file path, or None on a miss."""
+        with self._lock:
+            path = self._path(key)
+            if key not in self._index:
+                # Another worker process may have cached it
+                if not os.path.exists(path):
+                    self.misses += 1
+                    return None
+                self._index[key] = os.path.getsize(path)
+                self._bytes += self._index[key]
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                self._bytes -= self._index.pop(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return path
+
+    def writer(self, key):
+        """Returns a writer that streams bytes to a temp file and publishes them on commit()."""
+        return _CacheWriter(self, key)
+
+    def _publish(self, key, tmp_path):
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            os.replace(tmp_path, self._path(key))
+            if key in self._index:
+                self._bytes -= self._index.pop(key)
+            self._index[key] = size
+            self._bytes += size
+
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(old_key))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "files": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+
+class _CacheWriter:
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.cache_dir, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+        self._done = False
+
+    def write(self, chunk):
+        self._file.write(chunk)
+
+    def commit(self):
+        self._file.close()
+        self.cache._publish(self.key, self.tmp_path)
+        self._done = True
+
+    def abort(self):
+        """Discards a partial download (no-op after commit)."""
+        if self._done:
+            return
+        self._done = True
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
@@ -2,6 +2,7 @@ import yfinance as yf
 import random
 from datetime import datetime, timedelta
 import feedparser
+import metrics
 from .config import OLLAMA_HOST, TICKERS
 
 INSURANCE_RSS_FEEDS = [
@@ -30,7 +31,8 @@ class MarketIntelligence:
             })
 
             # 1 month history for volatility calc
-            history = yf.download(tickers_str, period="1mo", progress=False, session=session)
+            with metrics.timed("yfinance"):
+                history = yf.download(tickers_str, period="1mo", progress=False, session=session)
             
             for ticker in TICKERS:
                 try:
@@ -78,7 +80,8 @@ class MarketIntelligence:
         try:
             for url in INSURANCE_RSS_FEEDS:
                 try:
-                    feed = feedparser.parse(url)
+                    with metrics.timed("rss"):
+                        feed = feedparser.parse(url)
                     # Get top 3 from each
                     for entry in feed.entries[:3]:
                         # Extract summary if available, limit to 250 chars
@@ -1,8 +1,10 @@
 import feedparser
 import random
 from datetime import datetime
-from ollama import Client
 import os
+from concurrent.futures import ThreadPoolExecutor
+import llm_gateway
+import metrics
 
 # Configuration
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://host.docker.internal:11434")
@@ -16,18 +18,38 @@ RSS_FEEDS = [
     "https://blogs.microsoft.com/ai/feed/"
 ]
 
+# FALLBACK DATA (If RSS or Ollama fails, use this so UI is never 'Offline')
+FALLBACK_BRIEF = {
+    "headline": "Intelligence Systems Active",
+    "body": "Global data streams indicate accelerating demand for autonomous infrastructure. Swayne Systems is calibrated to support high-fidelity agentic workflows and real-time logic deployment.",
+    "sentiment": "STABLE"
+}
+
 class NewsIntelligence:
     def __init__(self):
-        self.client = Client(host=OLLAMA_HOST)
+        self.host = OLLAMA_HOST
 
     def fetch_latest_news(self):
         """Fetches and aggregates the latest AI news headlines."""
         articles = []
         print("📡 Scanning RSS frequencies for AI signals...")
         
-        for url in RSS_FEEDS:
+        def fetch(url):
+            try:
+                with metrics.timed("rss"):
+                    return url, feedparser.parse(url)
+            except Exception as e:
+                print(f"⚠️ Signal lost from {url}: {e}")
+                return url, None
+        
+        # Fetch all feeds at once instead of one after another
+        with ThreadPoolExecutor(max_workers=len(RSS_FEEDS)) as pool:
+            feeds = list(pool.map(fetch, RSS_FEEDS))
+        
+        for url, feed in feeds:
+            if feed is None:
+                continue
             try:
-                feed = feedparser.parse(url)
                 # Get top 2 from each feed to ensure variety
                 for entry in feed.entries[:2]:
                     articles.append({
@@ -51,16 +73,9 @@ class NewsIntelligence:
             print(f"⚠️ RSS Fetch Error: {e}")
             articles = [] # Trigger fallback handling
 
-        # FALLBACK DATA (If RSS or Ollama fails, use this so UI is never 'Offline')
-        fallback_brief = {
-            "headline": "Intelligence Systems Active",
-            "body": "Global data streams indicate accelerating demand for autonomous infrastructure. Swayne Systems is calibrated to support high-fidelity agentic workflows and real-time logic deployment.",
-            "sentiment": "STABLE"
-        }
-        
         if not articles:
             print("⚠️ No articles found. Using operational fallback.")
-            return fallback_brief
+            return FALLBACK_BRIEF
 
         # Format context for LLM
         news_context = "\n".join([f"- {a['title']} ({a['source']})" for a in articles])
@@ -88,7 +103,7 @@ Output JSON format:
         
         try:
             print("🧠 Neural Engine Digesting Information...")
-            response = self.client.chat(model=MODEL, messages=[{'role': 'user', 'content': prompt}], format='json')
+            response = llm_gateway.chat(model=MODEL, messages=[{'role': 'user', 'content': prompt}], host=self.host, format='json')
             content = response['message']['content']
             
             import json
@@ -98,7 +113,7 @@ Output JSON format:
         except Exception as e:
             print(f"❌ Synthesis Error: {e}")
             # Return the safe fallback instead of an error state
-            return fallback_brief
+            return FALLBACK_BRIEF
 
 if __name__ == "__main__":
     intel = NewsIntelligence()
@@ -1,12 +1,33 @@
 import json
 import os
-import ollama
+import threading
+import llm_gateway
+from shared_state import atomic_write_json, file_lock
 from datetime import datetime
 from ..config import OLLAMA_HOST, MODELS, DATA_DIR, PROMPTS_PATH
 
+BRIEFING_CACHE_PATH = os.path.join(DATA_DIR, "daily_briefing.json")
+BRIEFING_LOCK_PATH = BRIEFING_CACHE_PATH + ".lock"
+
+# Only one fresh generation at a time (API requests and the staff meeting share it;
+# the file lock extends this to every API worker process)
+_generation_lock = threading.Lock()
+
+def load_cached_brief():
+    """Returns (briefing, saved_at) from the daily cache file, or None if there is none."""
+    if not os.path.exists(BRIEFING_CACHE_PATH):
+        return None
+    with open(BRIEFING_CACHE_PATH, 'r') as f:
+        cached = json.load(f)
+    return cached, os.path.getmtime(BRIEFING_CACHE_PATH)
+
+def save_cached_brief(briefing):
+    """Writes the briefing atomically (temp file + rename) so readers never see a partial file."""
+    atomic_write_json(BRIEFING_CACHE_PATH, briefing)
+
 class ContentDirector:
     def __init__(self):
-        self.client = ollama.Client(host=OLLAMA_HOST)
+        self.host = OLLAMA_HOST
         self.model = MODELS["director"]
         
         # Load external prompts
@@ -33,9 +54,9 @@ class ContentDirector:
         
         try:
             print(f"📡 Pinging Trend Scout ({scout_model}) for a wild idea...")
-            response = self.client.chat(model=scout_model, messages=[
+            response = llm_gateway.chat(model=scout_model, messages=[
                 {'role': 'user', 'content': prompt}
-            ])
+            ], host=self.host)
             concept = response['message']['content'].strip()
             return concept
         except Exception as e:
@@ -48,19 +69,31 @@ class ContentDirector:
         
         # 1. Check for Cached Briefing (Speed Optimization)
         # The briefing only updates once per day. Caching removes the 30s RAG/LLM wait.
-        cache_path = os.path.join(DATA_DIR, "daily_briefing.json")
+        cached = self._todays_cached_brief()
+        if cached:
+            return cached
+
+        # Concurrent callers wait for the generation in progress, then reuse its result
+        with _generation_lock, file_lock(BRIEFING_LOCK_PATH):
+            cached = self._todays_cached_brief()
+            if cached:
+                return cached
+            return self._generate_brief()
+
+    def _todays_cached_brief(self):
+        today_str = datetime.now().strftime("%Y-%m-%d")
+        try:
+            loaded = load_cached_brief()
+            # Check for 'date' field or assume validity if file exists (refresh happens on failed read)
+            if loaded and loaded[0].get('date') == today_str:
+                print(f"🚀 Serving Cached Briefing from {BRIEFING_CACHE_PATH}")
+                return loaded[0]
+        except Exception as e:
+            print(f"⚠️ Cache read failed: {e}")
+        return None
+
+    def _generate_brief(self):
         today_str = datetime.now().strftime("%Y-%m-%d")
-        
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r') as f:
-                    cached = json.load(f)
-                # Check for 'date' field or assume validity if file exists (refresh happens on failed read)
-                if cached.get('date') == today_str:
-                    print(f"🚀 Serving Cached Briefing from {cache_path}")
-                    return cached
-            except Exception as e:
-                print(f"⚠️ Cache read failed: {e}")
 
         # 2. Generate Fresh Briefing (The Slow Part)
         print("🧠 Content Director initializing fresh generation...")
@@ -113,9 +146,9 @@ class ContentDirector:
             
             print(f"   💡 Synthesizing brief with Real-Time Data...")
             
-            response = self.client.chat(model=self.model, format='json', messages=[
+            response = llm_gateway.chat(model=self.model, format='json', messages=[
                 {'role': 'user', 'content': prompt}
-            ])
+            ], host=self.host)
             
             content = response['message']['content']
             briefing = json.loads(content)
@@ -128,9 +161,8 @@ class ContentDirector:
             
             # 3. Save to Cache
             try:
-                with open(cache_path, 'w') as f:
-                    json.dump(briefing, f, indent=4)
-                print(f"💾 Saved fresh briefing to {cache_path}")
+                save_cached_brief(briefing)
+                print(f"💾 Saved fresh briefing to {BRIEFING_CACHE_PATH}")
             except Exception as e:
                 print(f"⚠️ Failed to write cache: {e}")
                 
@@ -5,12 +5,14 @@ import requests
 import http.client
 import shutil
 import random
-import ollama
+import llm_gateway
+import metrics
+import circuit_breaker
 from ..config import OLLAMA_HOST, COMFYUI_HOST, MODELS, ASSETS_DIR, DATA_DIR, PROMPTS_PATH
 
 class PhotoDesigner:
     def __init__(self):
-        self.client = ollama.Client(host=OLLAMA_HOST)
+        self.host = OLLAMA_HOST
         self.model = MODELS["designer"]
         
         # Load prompts
@@ -66,9 +68,9 @@ class PhotoDesigner:
         """
         
         try:
-            response = self.client.chat(model=self.model, messages=[
+            response = llm_gateway.chat(model=self.model, messages=[
                 {'role': 'user', 'content': prompt_instruction}
-            ])
+            ], host=self.host)
             content = response['message']['content'].strip()
             
             # Parse output
@@ -208,6 +210,12 @@ class PhotoDesigner:
             }
         }
         
+        # Straight to a stock image while ComfyUI is unreachable (instead of a 120s connect timeout)
+        comfyui = circuit_breaker.get(COMFYUI_HOST)
+        if not comfyui.allow():
+            print(f"⚡ ComfyUI is offline (circuit {comfyui.state}), using a stock image")
+            return self._get_fallback_image(category)
+        
         try:
             # 2. Queue Prompt via API
             host_parts = COMFYUI_HOST.replace("http://", "").replace("https://", "").split(":")
@@ -221,9 +229,11 @@ class PhotoDesigner:
             prompt_id = None
             
             try:
-                conn.request("POST", "/prompt", json.dumps(payload), headers)
-                response = conn.getresponse()
-                response_data = response.read()
+                with metrics.timed("comfyui_queue"):
+                    conn.request("POST", "/prompt", json.dumps(payload), headers)
+                    response = conn.getresponse()
+                    response_data = response.read()
+                comfyui.success()
                 
                 if response.status != 200:
                     print(f"⚠️ ComfyUI Error ({response.status}): {response_data.decode('utf-8')}")
@@ -235,6 +245,11 @@ class PhotoDesigner:
                 prompt_id = result.get('prompt_id')
                 conn.close()
                 
+            except ConnectionRefusedError as conn_error:
+                # Nothing listening: ComfyUI (or the tunnel) is down, no prompt was queued
+                comfyui.failure(conn_error)
+                conn.close()
+                raise
             except (TimeoutError, ConnectionResetError, OSError) as conn_error:
                 # SSH tunnel issue - connection timed out or was reset
                 # But prompt likely queued successfully, check history
@@ -258,8 +273,10 @@ class PhotoDesigner:
                         if prompt_ids:
                             prompt_id = prompt_ids[-1]  # Most recent
                             print(f"   ✅ Found recent prompt: {prompt_id}")
+                    comfyui.success()
                 except Exception as hist_error:
                     print(f"   ⚠️ Could not retrieve history: {hist_error}")
+                    comfyui.failure(conn_error)
             
             if not prompt_id:
                 print("⚠️ No prompt_id available")
@@ -322,6 +339,7 @@ class PhotoDesigner:
                                                 f.write(image_data)
                                             
                                             print(f"   ✅ Image saved to {dest_path}")
+                                            metrics.observe_upstream("comfyui_render", time.time() - start_time)
                                             return f"/assets/{dest_filename}"
                                         else:
                                             conn.close()
@@ -349,6 +367,7 @@ class PhotoDesigner:
             # If we got here without image_data, use fallback
             if not image_data:
                 print("⚠️ Timeout or error during image generation")
+                metrics.observe_upstream("comfyui_render", time.time() - start_time, error=True)
                 return self._get_fallback_image(category)
             
         except Exception as e:
@@ -1,4 +1,4 @@
-import ollama
+import llm_gateway
 import json
 import os
 from ..config import OLLAMA_HOST, MODELS, PROMPTS_PATH
@@ -6,7 +6,7 @@ from ..config import DATA_DIR # Keep if used elsewhere, but prompts uses specifi
 
 class WebDeveloper:
     def __init__(self):
-        self.client = ollama.Client(host=OLLAMA_HOST)
+        self.host = OLLAMA_HOST
         self.model = MODELS["writer"]
         
         # Load external prompts
@@ -83,9 +83,9 @@ class WebDeveloper:
         ===END===
         """
         
-        response = self.client.chat(model=self.model, messages=[
+        response = llm_gateway.chat(model=self.model, messages=[
             {'role': 'user', 'content': prompt}
-        ])
+        ], host=self.host)
         
         content = response['message']['content']
         
@@ -1,12 +1,30 @@
-from flask import Flask, request, jsonify, stream_with_context, Response
+from flask import Flask, request, jsonify, stream_with_context, Response, send_file, g
 from flask_cors import CORS
 import os
 import json
 import time
+import random
 from functools import wraps
-from collections import defaultdict
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from ollama import Client
+import llm_gateway
+import metrics
+import circuit_breaker
+from circuit_breaker import CircuitOpenError
+from health_monitor import HealthMonitor
+from rate_limiter import RateLimits
+from session_store import SessionStore
+from event_stream import EventLog, sse_events
+from audio_cache import AudioCache
+from swr_cache import StaleWhileRevalidate
+from shared_state import SharedState, atomic_write_json
+from stream_tracker import StreamTracker, close_upstream, estimate_tokens
+from response_cache import ResponseCache
+from history_compactor import HistoryCompactor
+from jobs import JobQueue, JobCancelled, QueueFull, run_script
+from http_cache import cached_json, uncacheable_json
+from profiler import Profiler
+from gemini_models import GeminiModels
 import google.generativeai as genai
 import hashlib
 import hmac
@@ -15,20 +33,106 @@ import requests
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.time()
+    
+    # Profiling: a sampled fraction of requests, or on demand with an X-Profile header from an admin
+    if request.endpoint in ("list_profiles", "download_profile"):
+        return
+    if (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE) or \
+            ("X-Profile" in request.headers and is_profile_admin()):
+        g.profile = profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    # Labelled by route pattern (not the raw path) so /api/jobs/<id> stays one series
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe_request(route, request.method, response.status_code, time.time() - g.request_start)
+    
+    session = g.pop("profile", None)
+    if session is not None:
+        # Streamed bodies are produced after this point, so a profile covers the view only
+        summary = profiler.stop(session, route, request.method, response.status_code)
+        if summary:
+            response.headers["X-Profile-Id"] = summary["id"]
+    return response
+
+@app.teardown_request
+def stop_abandoned_profile(exc):
+    session = g.pop("profile", None)
+    if session is not None:
+        profiler.stop(session, request.url_rule.rule if request.url_rule else "unmatched", request.method, 500)
+
 # Configuration
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://host.docker.internal:11434")
 COMFYUI_HOST = os.getenv("COMFYUI_HOST", "http://host.docker.internal:8188")
+M1_OLLAMA = os.getenv("M1_OLLAMA", "http://host.docker.internal:12434")
+TTS_HOST = os.getenv("TTS_HOST", "http://10.0.1.1:8001")  # Forwarded by sterling_tunnel.sh (Mapped to Mac 8000)
+VIDEO_HOST = os.getenv("VIDEO_HOST", "http://10.0.0.1:8888")
+HEALTH_PROBE_INTERVAL = int(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+
+# Serving mode: more than one worker process (gunicorn) keeps all cross-request state in SQLite.
+# Under gunicorn, gunicorn.conf.py sets this to the actual worker count
+API_WORKERS = int(os.getenv("BEDROCK_API_WORKERS", "1"))
+MULTI_WORKER = API_WORKERS > 1
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Persistent state (bedrock_agents/data is a mounted volume in Coolify)
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(BASE_DIR, "bedrock_agents", "data"))
+SESSION_DB_PATH = os.path.join(STATE_DIR, "sessions.sqlite3")
+SHARED_STATE_PATH = os.path.join(STATE_DIR, "shared_state.sqlite3")
+NEWS_BRIEF_PATH = os.path.join(STATE_DIR, "news_brief.json")
+SESSION_MEMORY_LIMIT = int(os.getenv("SESSION_MEMORY_LIMIT", "500"))  # Sessions kept in RAM
+SESSION_TTL_HOURS = int(os.getenv("SESSION_TTL_HOURS", "168"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # Background jobs running at once (across all API workers)
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))  # Queued jobs before submissions are refused
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # Fraction of requests profiled (0 = on demand only)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # X-Profile header value that enables profiling (besides an admin session)
+PROFILE_DIR = os.path.join(STATE_DIR, "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+INGEST_SCRIPTS = {
+    "lab_knowledge": "ingest_lab_knowledge.py",
+    "sterling": "ingest_sterling.py",
+    "sigma": os.path.join("bedrock_agents", "ingest_sigma.py")
+}
+TTS_CACHE_DIR = os.path.join(STATE_DIR, "tts_cache")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "200"))
+NEWS_BRIEF_TTL = int(os.getenv("NEWS_BRIEF_TTL", "1800"))  # Seconds a news brief is considered fresh
+NEWS_BRIEF_REFRESH = int(os.getenv("NEWS_BRIEF_REFRESH", "900"))  # Background rebuild interval
+TTS_VOICE = "David"  # Hardcoded for this interface
+TTS_SPEED = 1.0
 MODEL = "dolphin-llama3"
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "1000"))  # Cached /api/chat replies
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", "3600"))
+CHAT_CACHE_SEMANTIC = os.getenv("CHAT_CACHE_SEMANTIC", "false").lower() == "true"  # Needs nomic-embed-text pulled
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.92"))
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+CHAT_HISTORY_BUDGET = int(os.getenv("CHAT_HISTORY_BUDGET", "1500"))  # Tokens of recent turns sent verbatim
+ANTIGRAVITY_HISTORY_BUDGET = int(os.getenv("ANTIGRAVITY_HISTORY_BUDGET", "6000"))
+HISTORY_SUMMARY_REFRESH = int(os.getenv("HISTORY_SUMMARY_REFRESH", "600"))  # Unsummarized tokens before re-summarizing
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", MODEL)
 
 # Authentication Configuration
 AUTH_SECRET = os.getenv('AUTH_SECRET', 'default-secret-change-me-in-production')
 
 # Antigravity Configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")  # Override the API host (e.g. http://localhost:8090 for a stub)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "4096"))  # Smallest context Gemini will cache
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", "3600"))
+# Below the cache minimum, the preamble opens each session once; true = send it on every turn instead
+GEMINI_SYSTEM_EVERY_TURN = os.getenv("GEMINI_SYSTEM_EVERY_TURN", "false").lower() == "true"
 ANTIGRAVITY_ALLOWED_IPS = os.getenv("ANTIGRAVITY_ALLOWED_IPS", "71.197.228.171").split(",")
 ANTIGRAVITY_ENABLED = os.getenv("ANTIGRAVITY_ENABLED", "true").lower() == "true"
 PUBLIC_CHAT_ENABLED = os.getenv("PUBLIC_CHAT_ENABLED", "true").lower() == "true"
 PUBLIC_CHAT_RATE_LIMIT = int(os.getenv("PUBLIC_CHAT_RATE_LIMIT", "20"))
+TTS_RATE_LIMIT = int(os.getenv("TTS_RATE_LIMIT", "60"))
+MEETING_RATE_LIMIT = int(os.getenv("MEETING_RATE_LIMIT", "6"))
+JOBS_RATE_LIMIT = int(os.getenv("JOBS_RATE_LIMIT", "20"))
 
 # Register chat API blueprint
 try:
@@ -39,7 +143,11 @@ except Exception as e:
     print(f"⚠️ Failed to register chat API blueprint: {e}")
 
 # Configure Gemini
-if GEMINI_API_KEY:
+if GEMINI_API_KEY and GEMINI_API_ENDPOINT:
+    # Local stand-in (see benchmarks/bench_gemini_context.py) or a proxy; REST allows plain http://
+    genai.configure(api_key=GEMINI_API_KEY, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+    print(f"✅ Gemini API configured for Antigravity (endpoint {GEMINI_API_ENDPOINT})")
+elif GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
     print(f"✅ Gemini API configured for Antigravity")
 else:
@@ -47,12 +155,86 @@ else:
 
 print(f"🚀 Bedrock API starting... Connecting to Ollama at {OLLAMA_HOST}")
 
-# Antigravity conversation history (in-memory)
-antigravity_conversations = {}
-public_chat_conversations = {}
+# Headers for Server-Sent Event responses (disable Nginx buffering so chunks flush immediately)
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+# Background dependency prober - /api/health serves its latest snapshot
+health_monitor = HealthMonitor({
+    "ollama": {"url": f"{OLLAMA_HOST}/api/tags"},
+    "comfyui": {"url": f"{COMFYUI_HOST}/system_stats"},
+    "m1_ollama": {"url": f"{M1_OLLAMA}/api/tags"},
+    "tts": {"url": f"{TTS_HOST}/", "require_ok": False},
+    "video": {"url": f"{VIDEO_HOST}/", "require_ok": False}
+}, interval=HEALTH_PROBE_INTERVAL)
+health_monitor.start()
+
+# State every worker process must agree on (meeting runs, shared rate limits)
+os.makedirs(STATE_DIR, exist_ok=True)
+shared_state = SharedState(SHARED_STATE_PATH)
 
-# Rate limiting for public chat
-public_chat_limits = defaultdict(list)
+# Finished vs. client-abandoned generations (shared with the Streamlit apps)
+stream_tracker = StreamTracker(shared_state)
+
+# Conversation history (bounded LRU in memory, persisted to SQLite)
+antigravity_conversations = SessionStore(
+    SESSION_DB_PATH, namespace="antigravity", shared=MULTI_WORKER,
+    max_sessions=SESSION_MEMORY_LIMIT, ttl_seconds=SESSION_TTL_HOURS * 3600
+)
+public_chat_conversations = SessionStore(
+    SESSION_DB_PATH, namespace="public_chat", shared=MULTI_WORKER,
+    max_sessions=SESSION_MEMORY_LIMIT, ttl_seconds=SESSION_TTL_HOURS * 3600
+)
+
+# Request profiles (collapsed stacks + pstats) - see /api/profiles
+profiler = Profiler(PROFILE_DIR, interval=PROFILE_INTERVAL_MS / 1000, keep=PROFILE_KEEP)
+
+# Synthesized speech, keyed by hash of (text, voice, speed)
+tts_cache = AudioCache(TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024)
+
+def summarize_turns(previous_summary, turns):
+    """Folds older chat turns into a short running summary (used by the history compactors)."""
+    transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    prompt = f"Summary so far:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+    response = llm_gateway.chat(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": "Update the running summary of this conversation with the new turns. Keep names, numbers, decisions and open questions. Reply with the summary only, under 150 words."},
+            {"role": "user", "content": prompt}
+        ],
+        host=OLLAMA_HOST,
+        options={"num_predict": 300}
+    )
+    return response['message']['content'].strip()
+
+# Prompt history stays within a token budget however long a conversation gets
+chat_history = HistoryCompactor(summarize_turns, budget_tokens=CHAT_HISTORY_BUDGET, refresh_tokens=HISTORY_SUMMARY_REFRESH)
+antigravity_history = HistoryCompactor(summarize_turns, budget_tokens=ANTIGRAVITY_HISTORY_BUDGET, refresh_tokens=HISTORY_SUMMARY_REFRESH)
+
+# Replies to repeated /api/chat questions (exact, plus near-duplicates when semantic matching is on)
+chat_cache = ResponseCache(
+    max_entries=CHAT_CACHE_SIZE,
+    ttl_seconds=CHAT_CACHE_TTL,
+    embed=(lambda text: llm_gateway.embed(EMBED_MODEL, text, host=OLLAMA_HOST)[0]) if CHAT_CACHE_SEMANTIC else None,
+    similarity=CHAT_CACHE_SIMILARITY
+)
+
+# Per-IP rate limits (requests per hour), idle IPs are evicted automatically
+rate_limits = RateLimits({
+    "public_chat": (PUBLIC_CHAT_RATE_LIMIT, 3600),
+    "tts": (TTS_RATE_LIMIT, 3600),
+    "meeting": (MEETING_RATE_LIMIT, 3600),
+    "jobs": (JOBS_RATE_LIMIT, 3600)
+}, shared_state=shared_state if MULTI_WORKER else None)
+
+def get_client_ip():
+    """Client IP (first X-Forwarded-For hop when behind Nginx)"""
+    client_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+    if ',' in client_ip:
+        client_ip = client_ip.split(',')[0].strip()
+    return client_ip
 
 # --- IP Whitelist Middleware ---
 def require_whitelisted_ip(f):
@@ -63,9 +245,7 @@ def require_whitelisted_ip(f):
             return jsonify({"error": "Antigravity is disabled"}), 403
         
         # Get client IP (check X-Forwarded-For first, then REMOTE_ADDR)
-        client_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-        if ',' in client_ip:
-            client_ip = client_ip.split(',')[0].strip()
+        client_ip = get_client_ip()
         
         # Check whitelist
         if client_ip not in ANTIGRAVITY_ALLOWED_IPS:
@@ -76,48 +256,20 @@ def require_whitelisted_ip(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# --- Rate Limiting for Public Chat ---
-def check_rate_limit(ip: str, limit: int = None, window_hours: int = 1) -> bool:
-    """Check if IP is within rate limit. Returns True if under limit."""
-    if limit is None:
-        limit = PUBLIC_CHAT_RATE_LIMIT
-    
-    now = datetime.now()
-    cutoff = now - timedelta(hours=window_hours)
-    
-    # Clean old entries
-    public_chat_limits[ip] = [
-        timestamp for timestamp in public_chat_limits[ip]
-        if timestamp > cutoff
-    ]
-    
-    # Check limit
-    if len(public_chat_limits[ip]) >= limit:
-        return False
-    
-    public_chat_limits[ip].append(now)
-    return True
+# --- Rate Limiting ---
+def check_rate_limit(ip: str, name: str = "public_chat") -> bool:
+    """Check if IP is within the named rate limit. Returns True if under limit."""
+    return rate_limits.allow(name, ip)
+
+def rate_limited_response():
+    return jsonify({"error": "Rate limit exceeded. Please try again later."}), 429
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    """Comprehensive system health check for Ollama and ComfyUI"""
-    
-    def check_ollama():
-        try:
-            response = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=3)
-            return response.status_code == 200
-        except:
-            return False
-    
-    def check_comfyui():
-        try:
-            response = requests.get(f"{COMFYUI_HOST}/system_stats", timeout=3)
-            return response.status_code == 200
-        except:
-            return False
-    
-    ollama_status = check_ollama()
-    comfyui_status = check_comfyui()
+    """System health from the background prober's latest snapshot (never blocks on probes)"""
+    services = health_monitor.snapshot()
+    ollama_status = services["ollama"]["ok"]
+    comfyui_status = services["comfyui"]["ok"]
     all_operational = ollama_status and comfyui_status
     
     # Determine status message
@@ -134,7 +286,9 @@ def health():
         "status": "operational" if all_operational else "degraded",
         "ollama": ollama_status,
         "comfyui": comfyui_status,
-        "message": message
+        "message": message,
+        "services": services,
+        "breakers": circuit_breaker.states()
     })
 
 
@@ -147,95 +301,395 @@ def chat():
 
         user_message = data['message']
         history = data.get('history', [])
+        # Conversation key for the history summary; clients without sessions get one per IP
+        session_id = data.get('session_id') or f"ip:{get_client_ip()}"
 
-        # Construct messages for Ollama
-        messages = [
-            {"role": "system", "content": "You are the specialized AI Assistant for Bedrock Insurance. You are helpful, professional, and knowledgeable about high-net-worth property protection, smart home security, and luxury asset insurance. Keep answers concise (under 3 sentences unless asked for more)."}
-        ]
-        
-        # Add history
-        for msg in history:
-            role = msg.get('role')
-            content = msg.get('content')
-            if role and content:
-                messages.append({"role": role, "content": content})
+        system_prompt = {"role": "system", "content": "You are the specialized AI Assistant for Bedrock Insurance. You are helpful, professional, and knowledgeable about high-net-worth property protection, smart home security, and luxury asset insurance. Keep answers concise (under 3 sentences unless asked for more)."}
+        user_turn = {"role": "user", "content": user_message}
 
-        # Add current message
-        messages.append({"role": "user", "content": user_message})
+        # Common questions are answered from the cache without touching the model (or the summarizer).
+        # The cache is keyed by the full conversation, not the compacted prompt
+        conversation = [system_prompt] + [
+            {"role": msg['role'], "content": msg['content']} for msg in history
+            if msg.get('role') and msg.get('content')
+        ] + [user_turn]
+        cached_reply, cache_tier = chat_cache.get(conversation)
+        metrics.inc("bedrock_chat_cache_total", result=cache_tier or "miss")
+
+        if cached_reply is not None:
+            if data.get('stream'):
+                return Response(
+                    stream_with_context(stream_cached_reply(cached_reply, cache_tier)),
+                    mimetype='text/event-stream',
+                    headers=SSE_HEADERS
+                )
+            response = jsonify({"reply": cached_reply})
+            response.headers["X-Cache"] = cache_tier
+            return response
+
+        # Construct messages for Ollama: recent turns verbatim, older ones folded into a cached summary
+        messages = [system_prompt]
+        summary, turns = chat_history.compact(history, key=session_id)
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        for msg in turns:
+            messages.append({"role": msg['role'], "content": msg['content']})
+        messages.append(user_turn)
+
+        # Streaming mode: send tokens as Server-Sent Events
+        if data.get('stream'):
+            return Response(
+                stream_with_context(stream_chat_reply(messages, conversation)),
+                mimetype='text/event-stream',
+                headers=SSE_HEADERS
+            )
 
         # Call Ollama
-        client = Client(host=OLLAMA_HOST)
-        response = client.chat(model=MODEL, messages=messages)
+        response = llm_gateway.chat(model=MODEL, messages=messages, host=OLLAMA_HOST)
         
         bot_reply = response['message']['content']
+        if bot_reply:
+            chat_cache.put(conversation, bot_reply)
         
-        return jsonify({"reply": bot_reply})
+        response = jsonify({"reply": bot_reply})
+        response.headers["X-Cache"] = "miss"
+        return response
 
+    except CircuitOpenError as e:
+        print(f"⚡ Chat skipped: {e}")
+        return jsonify({"error": "Language model is offline. Please try again shortly."}), 503
     except Exception as e:
         print(f"❌ Error in chat endpoint: {e}")
         return jsonify({"error": str(e)}), 500
 
+def stream_chat_reply(messages, conversation):
+    """Yields Ollama tokens as SSE events, ending with a timing summary (TTFT, tokens/s).
+    The finished reply is cached under conversation (the uncompacted turns).
+    If the client disconnects, the Ollama stream is closed so generation stops right away."""
+    start = time.time()
+    first_token_at = None
+    token_count = 0
+    final_chunk = None
+    finished = False
+    reply = []
+
+    stream = llm_gateway.chat(model=MODEL, messages=messages, host=OLLAMA_HOST, stream=True)
+    try:
+        for chunk in stream:
+            token = chunk['message']['content']
+            if token:
+                if first_token_at is None:
+                    first_token_at = time.time()
+                token_count += 1
+                reply.append(token)
+                yield f"data: {json.dumps({'chunk': token})}\n\n"
+            if chunk.get('done'):
+                final_chunk = chunk
+
+        finished = True
+        end = time.time()
+        stats = {
+            "ttft_ms": round((first_token_at - start) * 1000, 1) if first_token_at else None,
+            "total_ms": round((end - start) * 1000, 1),
+            "tokens": token_count,
+            "tokens_per_sec": None
+        }
+
+        # Prefer Ollama's own eval counters; fall back to wall-clock since the first token
+        if final_chunk and final_chunk.get('prompt_eval_count'):
+            stats["prompt_tokens"] = final_chunk['prompt_eval_count']
+        if final_chunk and final_chunk.get('eval_count') and final_chunk.get('eval_duration'):
+            stats["tokens"] = final_chunk['eval_count']
+            stats["tokens_per_sec"] = round(final_chunk['eval_count'] / (final_chunk['eval_duration'] / 1e9), 1)
+        elif first_token_at and end > first_token_at:
+            stats["tokens_per_sec"] = round(token_count / (end - first_token_at), 1)
+
+        stream_tracker.completed("chat", stats["tokens"])
+        yield f"data: {json.dumps({'done': True, 'stats': stats})}\n\n"
+        if reply:
+            chat_cache.put(conversation, "".join(reply))
+
+    except GeneratorExit:
+        # Raised at the pending yield when the server notices the client is gone
+        if not finished:
+            stream_tracker.abandoned("chat", token_count)
+        raise
+    except Exception as e:
+        print(f"❌ Error in chat stream: {e}")
+        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    finally:
+        stream.close()
+
+def stream_cached_reply(reply, tier):
+    """SSE framing for a cached reply: one chunk, then the usual done event."""
+    yield f"data: {json.dumps({'chunk': reply})}\n\n"
+    yield f"data: {json.dumps({'done': True, 'stats': {'cache': tier, 'tokens': 0}})}\n\n"
+
+@app.route('/api/chat/cache', methods=['GET'])
+def chat_cache_stats():
+    """Response cache hit rate (exact and semantic), size and evictions."""
+    return jsonify(chat_cache.stats())
+
+@app.route('/api/history/stats', methods=['GET'])
+def history_stats():
+    """How often long conversations were compacted and their summaries regenerated."""
+    return jsonify({
+        "chat": chat_history.stats(),
+        "antigravity": antigravity_history.stats()
+    })
+
+@app.route('/api/streams/stats', methods=['GET'])
+def stream_stats():
+    """Completed vs. client-abandoned generations per endpoint, and the tokens saved by cancelling."""
+    return jsonify(stream_tracker.stats())
+
+@app.route('/api/ratelimits', methods=['GET'])
+def rate_limit_stats():
+    """Returns tracked-key counts and allow/reject totals for each rate limit."""
+    return jsonify(rate_limits.stats())
+
+@app.route('/api/llm/stats', methods=['GET'])
+def llm_stats():
+    """Returns LLM gateway call latency, retry and slot usage per model."""
+    return jsonify(llm_gateway.get_stats())
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Per-route and per-upstream counters and latency histograms (Prometheus text format)."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 import threading
 
-# Global Meeting State
-MEETING_STATE = {
+# --- Background Jobs ---
+# Heavy work (meetings, charts, ingestion, image renders) runs on the job queue, never on request threads
+
+def run_visual_assets_job(job):
+    """Renders the dashboard charts (VisualAnalyst) in a child process."""
+    return run_script(job, ["visual_analyst.py"], cwd=os.path.join(BASE_DIR, "bedrock_agents"))
+
+def run_ingest_job(job):
+    """Runs one of the knowledge base ingestion scripts in a child process."""
+    source = job.params.get("source")
+    if source not in INGEST_SCRIPTS:
+        raise ValueError(f"Unknown ingest source: {source} (expected one of {sorted(INGEST_SCRIPTS)})")
+    return run_script(job, [INGEST_SCRIPTS[source]], cwd=BASE_DIR)
+
+def run_image_job(job):
+    """Generates one image through the Photo Designer (LLM prompt + ComfyUI render)."""
+    from bedrock_agents.staff.photo_designer import PhotoDesigner
+    
+    theme = job.params.get("theme", "Home Protection")
+    concept = job.params.get("concept", theme)
+    job.progress(f"Rendering '{theme}'...")
+    return {"image_path": PhotoDesigner().generate_image(theme, concept)}
+
+# Meeting state lives in shared_state so every worker reports the same run
+MEETING_IDLE_STATE = {
     "is_running": False,
     "start_time": 0,
     "completed_at": 0,
-    "current_agent": "idle"
+    "current_agent": "idle",
+    "run_id": None
 }
+MEETING_HISTORY_SIZE = int(os.getenv("MEETING_HISTORY_SIZE", "20"))
 
-def run_meeting_background():
-    """Background worker that runs the meeting generator to completion."""
-    global MEETING_STATE
-    
-    MEETING_STATE["is_running"] = True
-    MEETING_STATE["start_time"] = time.time()
-    MEETING_STATE["completed_at"] = 0
-    MEETING_STATE["current_agent"] = "system"
+def get_meeting_state():
+    state = shared_state.get("meeting_state", MEETING_IDLE_STATE)
+    if state["is_running"] and state["run_id"] and not jobs.is_active(state["run_id"]):
+        # The meeting's job ended without reporting back (worker process died)
+        state = {**state, "is_running": False, "current_agent": "error"}
+    return state
+
+def update_meeting_state(**changes):
+    shared_state.update("meeting_state", lambda state: {**(state or MEETING_IDLE_STATE), **changes})
+
+def record_meeting_run(summary):
+    """Adds a finished run to the bounded history."""
+    shared_state.update(
+        "meeting_history",
+        lambda runs: ([summary] + (runs or []))[:MEETING_HISTORY_SIZE],
+        default=[]
+    )
+
+def run_meeting_job(job):
+    """Runs the meeting generator to completion, publishing every step as job progress.
+    Raises if the meeting fails, so the job is recorded as failed."""
+    start = job.started
     
-    print("🧵 Background Meeting Thread Started")
+    # Per-stage timing: a stage lasts from an agent's first message until the next agent speaks
+    stages = []
+    status = "completed"
+    error = None
     
     try:
         # Import here to avoid circular dependencies
         from bedrock_agents.orchestrator import run_meeting_generator
         
-        # Iterate through the generator to execute the workflow
-        # We don't stream the output, but we update the state for basic tracking
         for agent, message in run_meeting_generator():
-            MEETING_STATE["current_agent"] = agent
+            now = time.time()
+            if not stages or stages[-1]["agent"] != agent:
+                if stages:
+                    stages[-1]["duration"] = round(now - start - stages[-1]["started"], 2)
+                stages.append({"agent": agent, "started": round(now - start, 2), "duration": None})
+            if agent == "error":
+                status, error = "failed", message
+            
+            update_meeting_state(current_agent=agent)
             print(f"   PLEASE WAIT: [{agent.upper()}] {message}")
+            job.progress(message, agent=agent, stage_elapsed=round(now - start - stages[-1]["started"], 2))
             
+    except JobCancelled:
+        status = "cancelled"
+        raise
     except Exception as e:
         print(f"❌ Background Meeting Error: {e}")
-        MEETING_STATE["current_agent"] = "error"
+        update_meeting_state(current_agent="error")
+        status = "failed"
+        job.events.append({"agent": "error", "message": str(e), "elapsed": round(time.time() - start, 2)})
+        raise
     finally:
-        MEETING_STATE["is_running"] = False
-        MEETING_STATE["completed_at"] = time.time()
-        print("✅ Background Meeting Thread Finished")
+        end = time.time()
+        if stages and stages[-1]["duration"] is None:
+            stages[-1]["duration"] = round(end - start - stages[-1]["started"], 2)
+        
+        summary = {
+            "run_id": job.id,
+            "started_at": start,
+            "completed_at": end,
+            "duration": round(end - start, 2),
+            "status": status,
+            "stages": stages
+        }
+        record_meeting_run(summary)
+        update_meeting_state(is_running=False, completed_at=end)
+    if status == "failed":
+        raise RuntimeError(f"Meeting failed: {error}")
+    return summary
+
+jobs = JobQueue(shared_state, max_running=JOB_WORKERS, max_queued=JOB_QUEUE_LIMIT, shared_events=MULTI_WORKER)
+jobs.register("meeting", run_meeting_job, priority=10, max_concurrent=1)
+jobs.register("image", run_image_job, priority=20, max_concurrent=1)  # One ComfyUI render at a time
+jobs.register("visual_assets", run_visual_assets_job, priority=30, max_concurrent=1)
+jobs.register("ingest", run_ingest_job, priority=50, max_concurrent=1)
+jobs.start()
+
+@app.route('/api/jobs', methods=['POST'])
+@require_whitelisted_ip
+def submit_job():
+    """Queues a background job: {"kind": ..., "params": {...}, "priority": optional (lower runs first)}.
+    Whitelisted IPs only: ingestion rebuilds the vector stores and renders tie up ComfyUI."""
+    if not check_rate_limit(get_client_ip(), "jobs"):
+        return rate_limited_response()
+    
+    data = request.json or {}
+    kind = data.get("kind")
+    if kind == "meeting":
+        return jsonify({"error": "Start meetings with POST /api/meeting"}), 400
+    try:
+        job = jobs.submit(kind, data.get("params"), priority=data.get("priority"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFull as e:
+        return jsonify({"error": f"Job queue is full ({e}). Try again later."}), 503
+    return jsonify(job), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Lists recent jobs (newest first), optionally filtered by ?kind= and ?status=, plus queue stats."""
+    return jsonify({
+        "jobs": jobs.list(
+            kind=request.args.get("kind"),
+            status=request.args.get("status"),
+            limit=min(int(request.args.get("limit", 50)), 500)
+        ),
+        "stats": jobs.stats()
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Returns one job's status, latest progress and result."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+@require_whitelisted_ip
+def cancel_job(job_id):
+    """Cancels a queued job, or asks a running one to stop at its next progress report."""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def job_stream(job_id):
+    """Streams a job's progress events as SSE (replays from the start); the last one has done=true."""
+    if jobs.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    return Response(
+        stream_with_context(sse_events(jobs.events(job_id))),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
 
 @app.route('/api/meeting', methods=['POST', 'GET'])
 def run_meeting():
-    """Starts the meeting asynchronously in a background thread."""
-    global MEETING_STATE
+    """Queues the staff meeting as a background job."""
+    if not check_rate_limit(get_client_ip(), "meeting"):
+        return rate_limited_response()
     
-    if MEETING_STATE["is_running"]:
-        return jsonify({"status": "already_running", "message": "Meeting already in progress"}), 409
+    # Claim the meeting atomically (another worker may be starting one right now)
+    with shared_state.transaction() as db:
+        state = shared_state.get("meeting_state", MEETING_IDLE_STATE, db=db)
+        if state["is_running"] and state["run_id"] and jobs.is_active(state["run_id"]):
+            return jsonify({"status": "already_running", "message": "Meeting already in progress"}), 409
         
-    # Start background thread
-    thread = threading.Thread(target=run_meeting_background)
-    thread.daemon = True # Daemon thread so it doesn't block server shutdown
-    thread.start()
+        try:
+            job = jobs.submit("meeting", db=db)
+        except QueueFull as e:
+            return jsonify({"status": "busy", "message": f"Job queue is full ({e})"}), 503
+        shared_state.set("meeting_state", {
+            "is_running": True,
+            "start_time": time.time(),
+            "completed_at": 0,
+            "current_agent": "system",
+            "run_id": job["id"]
+        }, db=db)
     
     return jsonify({
         "status": "started", 
-        "message": "Staff meeting initiated in background."
+        "message": "Staff meeting initiated in background.",
+        "job_id": job["id"]
     })
 
 @app.route('/api/meeting/status', methods=['GET'])
 def meeting_status():
     """Returns the current status of the meeting."""
-    return jsonify(MEETING_STATE)
+    return jsonify(get_meeting_state())
+
+@app.route('/api/meeting/stream', methods=['GET'])
+def meeting_stream():
+    """Streams every (agent, message) step of the current meeting as SSE (replays from the start).
+    The final event has done=true with the run's duration; result holds per-stage timings."""
+    run_id = get_meeting_state().get("run_id")
+    if run_id and jobs.get(run_id) is not None:
+        events = jobs.events(run_id)
+    else:
+        events = EventLog()
+        events.append({"done": True, "status": "idle"})
+        events.close()
+    
+    return Response(
+        stream_with_context(sse_events(events)),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
+@app.route('/api/meeting/history', methods=['GET'])
+def meeting_history_list():
+    """Returns durations and stage timings of recent meeting runs (newest first)."""
+    return jsonify({"runs": shared_state.get("meeting_history", [])})
 
 @app.route('/api/tts', methods=['POST'])
 def tts_proxy():
@@ -244,44 +698,116 @@ def tts_proxy():
         data = request.json
         if not data or 'text' not in data:
             return jsonify({"error": "No text provided"}), 400
+        
+        if not check_rate_limit(get_client_ip(), "tts"):
+            return rate_limited_response()
+            
+        # Repeated phrases come straight from the on-disk cache
+        cache_key = AudioCache.key(data['text'], TTS_VOICE, TTS_SPEED)
+        cached_path = tts_cache.get(cache_key)
+        if cached_path:
+            response = send_file(cached_path, mimetype="audio/wav", as_attachment=True, download_name="generated.wav")
+            response.headers["X-TTS-Cache"] = "HIT"
+            return response
             
         print(f"🎤 Requesting audio for: {data['text'][:30]}...")
         
         # Connect to Local Mac Studio via Tunnel (Docker Gateway IP for Linux/Coolify)
         # Port 8001 is forwarded by sterling_tunnel.sh (Mapped to Mac 8000)
-        tts_url = "http://10.0.1.1:8001/generate"
+        tts_url = f"{TTS_HOST}/generate"
         
-        # Forward the request
-        resp = requests.post(tts_url, json={
-            "text": data['text'],
-            "voice": "David", # Hardcoded for this interface
-            "speed": 1.0
-        }, timeout=30) # Allow time for generation
+        # Forward the request (streamed, so audio flows to the browser as the Mac produces it)
+        tts_start = time.time()
+        try:
+            with circuit_breaker.get(TTS_HOST).call():
+                resp = requests.post(tts_url, json={
+                    "text": data['text'],
+                    "voice": TTS_VOICE,
+                    "speed": TTS_SPEED
+                }, timeout=30, stream=True) # Allow time for generation
+        except CircuitOpenError as e:
+            print(f"⚡ TTS skipped: {e}")
+            return jsonify({"error": "Voice server is offline. Please try again shortly."}), 503
+        except Exception:
+            metrics.observe_upstream("tts", time.time() - tts_start, error=True)
+            raise
+        metrics.observe("bedrock_upstream_first_chunk_seconds", time.time() - tts_start, upstream="tts")
         
-        if resp.status_code == 200:
-            # Return the audio file directly
-            return Response(
-                resp.content, 
-                mimetype="audio/wav",
-                headers={"Content-Disposition": "attachment; filename=generated.wav"}
-            )
-        else:
-            return jsonify({"error": f"TTS Backend Error: {resp.text}"}), resp.status_code
+        if resp.status_code != 200:
+            metrics.observe_upstream("tts", time.time() - tts_start, error=True)
+            error_text = resp.text
+            resp.close()
+            return jsonify({"error": f"TTS Backend Error: {error_text}"}), resp.status_code
+        
+        def generate():
+            writer = tts_cache.writer(cache_key)
+            error = False
+            try:
+                for chunk in resp.iter_content(chunk_size=16384):
+                    if chunk:
+                        writer.write(chunk)
+                        yield chunk
+                writer.commit()  # Only complete downloads are cached
+            except Exception:
+                error = True
+                raise
+            finally:
+                writer.abort()
+                resp.close()
+                metrics.observe_upstream("tts", time.time() - tts_start, error=error)
+        
+        headers = {"Content-Disposition": "attachment; filename=generated.wav", "X-TTS-Cache": "MISS"}
+        if resp.headers.get("Content-Length"):
+            headers["Content-Length"] = resp.headers["Content-Length"]
+        
+        return Response(stream_with_context(generate()), mimetype="audio/wav", headers=headers)
 
     except Exception as e:
         print(f"❌ TTS Proxy Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/tts/cache', methods=['GET'])
+def tts_cache_stats():
+    """Returns TTS audio cache size and hit rate."""
+    return jsonify(tts_cache.stats())
+
+# --- Market Analysis Cache ---
+# Serves the last brief instantly; after midnight one background thread regenerates it
+
+def _load_market_brief():
+    from bedrock_agents.staff.content_director import load_cached_brief
+    return load_cached_brief()
+
+def _regenerate_market_brief():
+    from bedrock_agents.staff.content_director import ContentDirector
+    return ContentDirector().create_daily_brief()
+
+market_brief_cache = StaleWhileRevalidate(
+    "market-analysis",
+    regenerate=_regenerate_market_brief,
+    is_fresh=lambda brief, age: brief.get('date') == datetime.now().strftime("%Y-%m-%d"),
+    load=_load_market_brief
+)
+
 @app.route('/api/bedrock/market-analysis', methods=['GET'])
 def get_market_analysis():
     """Generates the live market analysis using RAG and yfinance (Restored for Bedrock Page)."""
     try:
-        from bedrock_agents.staff.content_director import ContentDirector
+        briefing, cache_status = market_brief_cache.get()
+        if briefing is None:
+            raise RuntimeError(market_brief_cache.last_error or "Briefing unavailable")
         
-        director = ContentDirector()
-        briefing = director.create_daily_brief()
+        # Fresh until the next day's brief; a stale one is being replaced, so always revalidate
+        max_age = 0
+        if cache_status != "stale":
+            now = datetime.now()
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            max_age = (midnight - now).total_seconds()
         
-        return jsonify(briefing)
+        response = cached_json(briefing, max_age, last_modified=market_brief_cache.updated_at())
+        response.headers["X-Cache"] = cache_status
+        response.headers["X-Cache-Age"] = str(market_brief_cache.age())
+        return response
     except Exception as e:
         print(f"❌ Market Analysis Error: {e}")
         # FALLBACK: Return a safe "System Offline" briefing so the UI doesn't break
@@ -290,42 +816,111 @@ def get_market_analysis():
             "sentiment": "NEUTRAL",
             "body": "Daily briefing temporarily unavailable. Global markets remain volatile. Switz Re signals continued hardening of property catastrophe rates into 2026. Please stand by for live updates."
         }
-        return jsonify(fallback)
+        return uncacheable_json(fallback)
+
+@app.route('/api/bedrock/market-analysis/cache', methods=['GET'])
+def market_analysis_cache_metrics():
+    """Returns cache age, regeneration time and fresh/stale/miss counts for the market brief."""
+    return jsonify(market_brief_cache.metrics())
+
+# --- Dashboard News Brief ---
+# Rebuilt on a schedule in the background; page loads only ever read memory
+
+def _load_news_brief():
+    if not os.path.exists(NEWS_BRIEF_PATH):
+        return None
+    with open(NEWS_BRIEF_PATH, 'r') as f:
+        return json.load(f), os.path.getmtime(NEWS_BRIEF_PATH)
+
+def _regenerate_news_brief():
+    from bedrock_agents.news_intel import NewsIntelligence, FALLBACK_BRIEF
+    
+    briefing = NewsIntelligence().generate_brief()
+    if briefing is FALLBACK_BRIEF:
+        # Keep serving the last real brief; retry sooner than the schedule
+        raise RuntimeError("RSS or synthesis unavailable")
+    atomic_write_json(NEWS_BRIEF_PATH, briefing)
+    return briefing
+
+news_brief_cache = StaleWhileRevalidate(
+    "news-brief",
+    regenerate=_regenerate_news_brief,
+    is_fresh=lambda brief, age: age < NEWS_BRIEF_TTL,
+    load=_load_news_brief,
+    refresh_interval=NEWS_BRIEF_REFRESH,
+    wait_on_miss=False,
+    lock_path=NEWS_BRIEF_PATH + ".lock"
+)
 
 @app.route('/api/dashboard/brief', methods=['GET'])
 def get_dashboard_brief():
-    """Generates the Swayne Systems AI News Brief using RSS and Ollama (For Main Dashboard)."""
-    try:
-        from bedrock_agents.news_intel import NewsIntelligence
-        
-        intel = NewsIntelligence()
-        briefing = intel.generate_brief()
-        
-        # Structure it to match what the frontend expects
-        return jsonify({
-            "headline": briefing.get('headline', 'System Online'),
-            "briefing_body": briefing.get('body', 'Ready for input.'),
-            "market_sentiment": briefing.get('sentiment', 'READY')
-        })
-    except Exception as e:
-        print(f"❌ News Brief Error: {e}")
-        # FALLBACK
+    """Serves the Swayne Systems AI News Brief (RSS + Ollama) from memory (For Main Dashboard)."""
+    briefing, _ = news_brief_cache.get()
+    
+    if briefing is None:
+        # FALLBACK (first brief not built yet, or feeds unreachable since startup)
         fallback = {
             "headline": "Intelligence Grid Offline",
             "market_sentiment": "OFFLINE",
-            "briefing_body": "Unable to establish uplink with global news feeds. Internal systems operating normally."
+            "briefing_body": "Unable to establish uplink with global news feeds. Internal systems operating normally.",
+            "age_seconds": None
         }
-        return jsonify(fallback)
+        return uncacheable_json(fallback)
+    
+    # Structure it to match what the frontend expects
+    brief = {
+        "headline": briefing.get('headline', 'System Online'),
+        "briefing_body": briefing.get('body', 'Ready for input.'),
+        "market_sentiment": briefing.get('sentiment', 'READY')
+    }
+    age = news_brief_cache.age()
+    # Reusable until the next scheduled rebuild (0 while one is due or running);
+    # the ETag ignores age_seconds, which changes every request
+    next_refresh_at = news_brief_cache.next_refresh_at
+    return cached_json(
+        dict(brief, age_seconds=age),
+        max_age=max(0, next_refresh_at - time.time()) if next_refresh_at else 0,
+        last_modified=news_brief_cache.updated_at(),
+        etag_data=brief
+    )
+
+@app.route('/api/dashboard/brief/cache', methods=['GET'])
+def dashboard_brief_cache_metrics():
+    """Returns age, refresh timing and failures of the background news brief."""
+    return jsonify(news_brief_cache.metrics())
 
 # --- Antigravity Endpoints ---
 
+# Fixed Antigravity preamble: from Gemini's context cache when large enough, otherwise the opening turns of a session
+ANTIGRAVITY_SYSTEM_CONTEXT = """You are Antigravity, a powerful AI coding assistant. You're chatting with the owner of this website (swaynesystems.ai) through a secure admin panel.
+
+You have access to the sterling_lab codebase and can help with:
+- Explaining the current architecture
+- Suggesting improvements
+- Making code changes (you'll provide the changes, user approves)
+- Debugging issues
+- Adding new features
+
+The website is built with:
+- Flask backend (bedrock_api.py) on port 5000
+- Streamlit app (chat_app.py) on port 8501  
+- Nginx routing at port 80
+- Deployed via Coolify with dual git remotes
+
+Be concise, helpful, and proactive. When suggesting code changes, provide clear diffs."""
+ANTIGRAVITY_SYSTEM_ACK = "I understand. I'm Antigravity, ready to help you with the Sterling Lab website. I can analyze code, suggest improvements, and help implement changes. What would you like to work on?"
+
+# GenerativeModel objects are built once per process; token usage is tracked per session
+gemini_models = GeminiModels(
+    cache_min_tokens=GEMINI_CACHE_MIN_TOKENS, cache_ttl=GEMINI_CACHE_TTL, state=shared_state,
+    system_every_turn=GEMINI_SYSTEM_EVERY_TURN
+)
+
 @app.route('/api/antigravity/status', methods=['GET'])
 @require_whitelisted_ip
 def antigravity_status():
     """Check if user is authorized to use Antigravity"""
-    client_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-    if ',' in client_ip:
-        client_ip = client_ip.split(',')[0].strip()
+    client_ip = get_client_ip()
     
     return jsonify({
         "authorized": True,
@@ -349,47 +944,20 @@ def antigravity_chat():
         session_id = data.get('session_id', 'default')
         
         # Get or create conversation history
-        if session_id not in antigravity_conversations:
-            antigravity_conversations[session_id] = []
+        history = antigravity_conversations.get(session_id)
         
-        history = antigravity_conversations[session_id]
-        
-        # Build conversation context for Gemini
+        # Build conversation context for Gemini (token-budgeted, older turns summarized)
         conversation = []
-        for msg in history[-10:]:  # Last 10 messages for context
+        summary, turns = antigravity_history.compact(history, key=session_id)
+        if summary:
+            conversation.append({"role": "user", "parts": [f"Summary of our earlier conversation: {summary}"]})
+            conversation.append({"role": "model", "parts": ["Understood, I have that context."]})
+        for msg in turns:
             conversation.append({
                 "role": msg["role"],
                 "parts": [msg["content"]]
             })
         
-        # Add system context as first user message if empty
-        if not conversation:
-            system_context = """You are Antigravity, a powerful AI coding assistant. You're chatting with the owner of this website (swaynesystems.ai) through a secure admin panel.
-
-You have access to the sterling_lab codebase and can help with:
-- Explaining the current architecture
-- Suggesting improvements
-- Making code changes (you'll provide the changes, user approves)
-- Debugging issues
-- Adding new features
-
-The website is built with:
-- Flask backend (bedrock_api.py) on port 5000
-- Streamlit app (chat_app.py) on port 8501  
-- Nginx routing at port 80
-- Deployed via Coolify with dual git remotes
-
-Be concise, helpful, and proactive. When suggesting code changes, provide clear diffs."""
-            
-            conversation.append({
-                "role": "user",
-                "parts": [system_context]
-            })
-            conversation.append({
-                "role": "model",
-                "parts": ["I understand. I'm Antigravity, ready to help you with the Sterling Lab website. I can analyze code, suggest improvements, and help implement changes. What would you like to work on?"]
-            })
-        
         # Add current message
         conversation.append({
             "role": "user",
@@ -397,36 +965,62 @@ Be concise, helpful, and proactive. When suggesting code changes, provide clear
         })
         
         def generate():
+            response = None
+            full_response = ""
+            finished = False
+            gemini_start = time.time()
+            first_chunk_at = None
             try:
-                model = genai.GenerativeModel('gemini-2.0-flash-exp')
+                model, carried = gemini_models.get(GEMINI_MODEL, ANTIGRAVITY_SYSTEM_CONTEXT)
+                contents = conversation
+                if not carried and not history:
+                    # First turn of the session: the preamble goes in as opening turns
+                    contents = [
+                        {"role": "user", "parts": [ANTIGRAVITY_SYSTEM_CONTEXT]},
+                        {"role": "model", "parts": [ANTIGRAVITY_SYSTEM_ACK]}
+                    ] + conversation
                 response = model.generate_content(
-                    conversation,
+                    contents,
                     stream=True
                 )
                 
-                full_response = ""
                 for chunk in response:
+                    if first_chunk_at is None:
+                        first_chunk_at = time.time()
+                        metrics.observe("bedrock_upstream_first_chunk_seconds", first_chunk_at - gemini_start,
+                                        upstream="gemini_stream")
                     if chunk.text:
                         full_response += chunk.text
                         yield f"data: {json.dumps({'chunk': chunk.text})}\n\n"
+                finished = True
+                metrics.observe_upstream("gemini_stream", time.time() - gemini_start)
+                stream_tracker.completed("antigravity", estimate_tokens(full_response))
                 
                 # Save to history
                 history.append({"role": "user", "content": user_message})
                 history.append({"role": "model", "content": full_response})
+                antigravity_conversations.put(session_id, history)
                 
-                yield f"data: {json.dumps({'done': True})}\n\n"
+                usage = gemini_models.record_usage(session_id, response)
+                yield f"data: {json.dumps({'done': True, 'usage': usage})}\n\n"
                 
+            except GeneratorExit:
+                # Client disconnected: cancel the Gemini stream instead of draining it
+                if not finished:
+                    stream_tracker.abandoned("antigravity", estimate_tokens(full_response))
+                    if response is not None:
+                        close_upstream(response)
+                raise
             except Exception as e:
                 print(f"❌ Gemini error: {e}")
+                if not finished:
+                    metrics.observe_upstream("gemini_stream", time.time() - gemini_start, error=True)
                 yield f"data: {json.dumps({'error': str(e)})}\n\n"
         
         return Response(
             stream_with_context(generate()),
             mimetype='text/event-stream',
-            headers={
-                'Cache-Control': 'no-cache',
-                'X-Accel-Buffering': 'no'
-            }
+            headers=SSE_HEADERS
         )
     
     except Exception as e:
@@ -438,8 +1032,18 @@ Be concise, helpful, and proactive. When suggesting code changes, provide clear
 def antigravity_context():
     """Get conversation history"""
     session_id = request.args.get('session_id', 'default')
-    history = antigravity_conversations.get(session_id, [])
-    return jsonify({"history": history})
+    history = antigravity_conversations.get(session_id)
+    return jsonify({"history": history, "usage": gemini_models.session_usage(session_id)})
+
+@app.route('/api/antigravity/sessions/stats', methods=['GET'])
+@require_whitelisted_ip
+def antigravity_session_stats():
+    """Session store hit/miss and memory stats"""
+    return jsonify({
+        "antigravity": antigravity_conversations.stats(),
+        "public_chat": public_chat_conversations.stats(),
+        "gemini": gemini_models.stats()
+    })
 
 @app.route('/api/antigravity/apply', methods=['POST'])
 @require_whitelisted_ip
@@ -471,6 +1075,9 @@ def antigravity_apply():
 @app.route('/api/antigravity/public/chat', methods=['POST'])
 def antigravity_public_chat():
     """Public chat - Temporarily disabled during MCP migration"""
+    if not check_rate_limit(get_client_ip(), "public_chat"):
+        return rate_limited_response()
+    
     # RAG has been removed in favor of MCP tools
     # Return a friendly message directing users to the main chat
     def generate():
@@ -481,50 +1088,70 @@ def antigravity_public_chat():
     return Response(
         stream_with_context(generate()),
         mimetype='text/event-stream',
-        headers={
-            'Cache-Control': 'no-cache',
-            'X-Accel-Buffering': 'no'
-        }
+        headers=SSE_HEADERS
     )
 
 # === Session Token Management ===
 
+TOKEN_MAX_AGE = 7*24*60*60  # 7 days max
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+
+# HMAC state with the key already absorbed - copying it is cheaper than hmac.new() per token
+_auth_hmac = hmac.new(AUTH_SECRET.encode(), digestmod=hashlib.sha256)
+
+# Recently verified tokens -> expiry time (LRU). nginx auth_request hits this on every protected request.
+_verified_tokens = OrderedDict()
+_verified_tokens_lock = threading.Lock()
+
+def _sign(payload):
+    mac = _auth_hmac.copy()
+    mac.update(payload.encode())
+    return mac.hexdigest()
+
 def create_session_token(username):
     """Create encrypted session token with HMAC-SHA256"""
     timestamp = str(int(time.time()))
     payload = f"{username}:{timestamp}"
-    signature = hmac.new(
-        AUTH_SECRET.encode(),
-        payload.encode(),
-        hashlib.sha256
-    ).hexdigest()
+    signature = _sign(payload)
     return f"{payload}:{signature}"
 
 def validate_token(token):
     """Validate session token and check expiration"""
     if not token:
         return False
+    
+    now = time.time()
+    
+    # Fast path: token already verified and not yet expired
+    with _verified_tokens_lock:
+        expires_at = _verified_tokens.get(token)
+        if expires_at is not None:
+            if now <= expires_at:
+                _verified_tokens.move_to_end(token)
+                return True
+            del _verified_tokens[token]
+            return False
+    
     try:
         payload, signature = token.rsplit(':', 1)
         username, timestamp = payload.split(':')
         
-        # Check signature
-        expected = hmac.new(
-            AUTH_SECRET.encode(),
-            payload.encode(),
-            hashlib.sha256
-        ).hexdigest()
-        
-        if signature != expected:
+        # Check signature (constant-time comparison)
+        if not hmac.compare_digest(signature, _sign(payload)):
             return False
         
-        # Check expiration (7 days max)
-        if int(time.time()) - int(timestamp) > 7*24*60*60:
+        # Check expiration
+        expires_at = int(timestamp) + TOKEN_MAX_AGE
+        if now > expires_at:
             return False
-            
-        return True
     except:
         return False
+    
+    with _verified_tokens_lock:
+        _verified_tokens[token] = expires_at
+        while len(_verified_tokens) > TOKEN_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+    return True
 
 # === Authentication Endpoints ===
 
@@ -574,5 +1201,40 @@ def logout():
     response.set_cookie('sterling_session', '', max_age=0, path='/')
     return response
 
+# === Profiling ===
+
+def is_profile_admin():
+    """Admin session cookie, or the PROFILE_TOKEN in the X-Profile header (for curl)."""
+    header = request.headers.get("X-Profile", "")
+    if PROFILE_TOKEN and hmac.compare_digest(header, PROFILE_TOKEN):
+        return True
+    return validate_token(request.cookies.get('sterling_session'))
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """Recent request profiles, newest first (?sort=duration for slowest first, ?route= to filter)."""
+    if not is_profile_admin():
+        return jsonify({"error": "Access denied"}), 403
+    return jsonify({
+        "sample_rate": PROFILE_SAMPLE_RATE,
+        "profiles": profiler.list(
+            route=request.args.get("route"),
+            sort=request.args.get("sort", "recent"),
+            limit=min(int(request.args.get("limit", 50)), 500)
+        )
+    })
+
+@app.route('/api/profiles/<profile_id>.<fmt>', methods=['GET'])
+def download_profile(profile_id, fmt):
+    """Downloads one profile as collapsed stacks, pstats or its JSON summary."""
+    if not is_profile_admin():
+        return jsonify({"error": "Access denied"}), 403
+    path = profiler.path(profile_id, fmt)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(path, as_attachment=fmt != "json")
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    # Single-process mode (development / BEDROCK_API_WORKERS=1).
+    # Production multi-worker mode: gunicorn -c gunicorn.conf.py bedrock_api:app
+    app.run(host='0.0.0.0', port=5000, threaded=True)
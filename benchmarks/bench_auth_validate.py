@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Benchmark for the nginx auth_request path (/api/auth/validate)
+
+Compares the original validate_token (fresh HMAC per call, != comparison) with the
+current fast path, both as a bare function and through the Flask app.
+
+Usage: python benchmarks/bench_auth_validate.py [--tokens 50] [--calls 200000]
+"""
+
+import os
+import sys
+import time
+import hmac
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bedrock_api
+
+
+def legacy_validate_token(token):
+    """The original validate_token."""
+    if not token:
+        return False
+    try:
+        payload, signature = token.rsplit(':', 1)
+        username, timestamp = payload.split(':')
+        expected = hmac.new(
+            bedrock_api.AUTH_SECRET.encode(),
+            payload.encode(),
+            hashlib.sha256
+        ).hexdigest()
+        if signature != expected:
+            return False
+        if int(time.time()) - int(timestamp) > 7*24*60*60:
+            return False
+        return True
+    except:
+        return False
+
+
+def bench_function(label, validate, tokens, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        assert validate(tokens[i % len(tokens)])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {calls / elapsed:>12,.0f} validations/s")
+
+
+def bench_endpoint(label, tokens, calls):
+    client = bedrock_api.app.test_client()
+    start = time.perf_counter()
+    for i in range(calls):
+        client.set_cookie('sterling_session', tokens[i % len(tokens)])
+        assert client.get('/api/auth/validate').status_code == 200
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {calls / elapsed:>12,.0f} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=50, help="distinct active sessions")
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    tokens = [bedrock_api.create_session_token(f"user{i}") for i in range(args.tokens)]
+    http_calls = max(1, args.calls // 20)
+
+    print(f"\n🧪 {args.tokens} active sessions\n")
+    bench_function("function (before)", legacy_validate_token, tokens, args.calls)
+    bench_function("function (after)", bedrock_api.validate_token, tokens, args.calls)
+
+    fast_validate = bedrock_api.validate_token
+    bedrock_api.validate_token = legacy_validate_token
+    bench_endpoint("endpoint (before)", tokens, http_calls)
+    bedrock_api.validate_token = fast_validate
+    bench_endpoint("endpoint (after)", tokens, http_calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Claims intake throughput: sustained submissions per second with durable acknowledgement
+
+In-process mode drives ClaimsQueue directly from N submitter threads, with group commit
+(one fsync shared by concurrent submitters) and with one fsync per claim for comparison.
+--url mode drives POST /api/insurance/claims/submit on a running API instead.
+A share of the submissions are retries that reuse an earlier idempotency key.
+
+Usage:
+    python benchmarks/bench_claims_queue.py [--threads 1,8,32,64] [--seconds 5]
+    python benchmarks/bench_claims_queue.py --url http://localhost:5000 --threads 16,64
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from claims_queue import ClaimsQueue
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def claim(rng, i):
+    return {
+        "customer_id": f"C{rng.randrange(100_000):07d}",
+        "policy_number": f"HOME-2024-{rng.randrange(100_000):07d}",
+        "type": "home",
+        "date": "2026-10-16",
+        "description": f"Storm damage to roof and siding, claim {i}"
+    }
+
+
+def drive(submit, threads, seconds, retry_share):
+    """Runs submitters for `seconds`; returns (accepted, duplicates, latencies)."""
+    stop = time.time() + seconds
+    run = os.urandom(3).hex()  # Fresh keys per run (a running API remembers earlier ones)
+    results = []
+    lock = threading.Lock()
+
+    def submitter(n):
+        rng = random.Random(n)
+        accepted = duplicates = 0
+        latencies = []
+        keys = []
+        i = 0
+        while time.time() < stop:
+            if keys and rng.random() < retry_share:
+                key = rng.choice(keys)  # Client retry after a timeout
+            else:
+                key = f"{run}-{n}-{i}"
+                keys.append(key)
+            start = time.perf_counter()
+            duplicate = submit(claim(rng, i), key)
+            latencies.append(time.perf_counter() - start)
+            if duplicate:
+                duplicates += 1
+            else:
+                accepted += 1
+            i += 1
+        with lock:
+            results.append((accepted, duplicates, latencies))
+
+    workers = [threading.Thread(target=submitter, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return (sum(r[0] for r in results), sum(r[1] for r in results),
+            [latency for r in results for latency in r[2]])
+
+
+def run_local(levels, seconds, retry_share):
+    print(f"{'fsync':>8} {'threads':>8} {'accepted/s':>11} {'dupes/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'claims/fsync':>13} {'drain ms':>9}")
+    for group_commit in (True, False):
+        for threads in levels:
+            directory = tempfile.mkdtemp()
+            queue = ClaimsQueue(os.path.join(directory, "claims.sqlite3"), os.path.join(directory, "wal"),
+                                group_commit=group_commit)
+            accepted, duplicates, latencies = drive(
+                lambda c, key: queue.submit(c, idempotency_key=key)[1], threads, seconds, retry_share
+            )
+            start = time.perf_counter()
+            queue.flush()
+            drain = time.perf_counter() - start
+            stats = queue.stats()
+            queue.close()
+            print(f"{'group' if group_commit else 'each':>8} {threads:>8} {accepted / seconds:>11,.0f} "
+                  f"{duplicates / seconds:>8,.0f} {percentile(latencies, 0.5) * 1000:>8.2f} "
+                  f"{percentile(latencies, 0.99) * 1000:>8.2f} {stats['claims_per_fsync']:>13} {drain * 1000:>9.0f}")
+            shutil.rmtree(directory)
+
+
+def run_http(url, levels, seconds, retry_share):
+    local = threading.local()
+
+    def submit(c, key):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = session.post(f"{url}/api/insurance/claims/submit", json=c,
+                                headers={"Idempotency-Key": key}, timeout=30)
+        response.raise_for_status()
+        return response.json()["duplicate"]
+
+    print(f"{'threads':>8} {'accepted/s':>11} {'dupes/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for threads in levels:
+        accepted, duplicates, latencies = drive(submit, threads, seconds, retry_share)
+        print(f"{threads:>8} {accepted / seconds:>11,.0f} {duplicates / seconds:>8,.0f} "
+              f"{percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f}")
+    print(requests.get(f"{url}/api/insurance/claims/stats", timeout=10).json())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="bedrock_api base URL (default: drive ClaimsQueue in-process)")
+    parser.add_argument("--threads", default="1,8,32,64")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--retry-share", type=float, default=0.05, help="share of submissions that are retries")
+    args = parser.parse_args()
+
+    levels = [int(t) for t in args.threads.split(",")]
+    if args.url:
+        run_http(args.url.rstrip("/"), levels, args.seconds, args.retry_share)
+    else:
+        run_local(levels, args.seconds, args.retry_share)
+
+
+if __name__ == "__main__":
+    main()
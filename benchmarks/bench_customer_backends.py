@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Customer backend benchmark: JSON file (CustomerStore) vs SQLite (SqliteCustomerStore)
+
+For each book size, generates synthetic customers as JSON and as a SQLite database, then
+measures in a fresh process per backend: startup time, resident memory added by startup,
+and the latency of verify (name + phone), verify (policy number) and lookup by id.
+
+Usage: python benchmarks/bench_customer_backends.py [--sizes 10000,100000,1000000] [--lookups 5000]
+       [--json-max 1000000]   # skip the JSON loader above this size (it needs several GB of RAM at 1M)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from customer_store import CustomerStore, SqliteCustomerStore, import_customers
+from import_customers import synthetic_customers, write_json
+
+
+def rss():
+    """Resident memory of this process in bytes (Linux)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def worker(backend, path, size, lookups):
+    """Runs in a child process so startup time and memory are measured from a clean start."""
+    baseline = rss()
+    start = time.perf_counter()
+    store = CustomerStore(path) if backend == "json" else SqliteCustomerStore(path)
+    startup = time.perf_counter() - start
+    memory = (rss() - baseline) / 1e6
+
+    # Synthetic customer i has id C{i:07d}
+    rng = random.Random(7)
+    picks = [rng.randrange(size) for _ in range(lookups)]
+    results = {"startup_ms": startup * 1000, "memory_mb": memory}
+    customers = [store.get(f"C{i:07d}") for i in picks]  # Warm-up, and the names to verify with
+    for label, call, args in (
+        ("verify_name_phone", store.verify, [(c["name"], c["phone"], "") for c in customers]),
+        ("verify_policy", store.verify, [("", "", c["policies"][0]["number"]) for c in customers]),
+        ("get_by_id", store.get, [(c["id"],) for c in customers]),
+    ):
+        times = []
+        for a in args:
+            t = time.perf_counter()
+            customer = call(*a)
+            times.append(time.perf_counter() - t)
+            assert customer is not None
+        results[label] = {"p50_us": percentile(times, 0.5) * 1e6, "p99_us": percentile(times, 0.99) * 1e6}
+    print(json.dumps(results))
+
+
+def measure(backend, path, size, lookups):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", backend, path, str(size), "--lookups", str(lookups)],
+        capture_output=True, text=True, check=True, cwd=ROOT
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--json-max", type=int, default=1_000_000)
+    parser.add_argument("--worker", nargs=3, metavar=("BACKEND", "PATH", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], args.worker[1], int(args.worker[2]), args.lookups)
+        return
+
+    directory = tempfile.mkdtemp()
+    print(f"{'customers':>10} {'backend':>8} {'file MB':>8} {'startup':>10} {'RSS MB':>8} "
+          f"{'name+phone p50/p99':>20} {'policy p50/p99':>18} {'by id p50/p99':>18}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        json_path = os.path.join(directory, f"customers_{size}.json")
+        db_path = os.path.join(directory, f"customers_{size}.sqlite3")
+        import_customers(synthetic_customers(size), db_path)
+        backends = [("sqlite", db_path)]
+        if size <= args.json_max:
+            write_json(synthetic_customers(size), json_path)
+            backends.insert(0, ("json", json_path))
+
+        for backend, path in backends:
+            r = measure(backend, path, size, args.lookups)
+            cells = " ".join(
+                f"{r[k]['p50_us']:>8.1f}/{r[k]['p99_us']:<7.1f}µs".rjust(w)
+                for k, w in (("verify_name_phone", 20), ("verify_policy", 18), ("get_by_id", 18))
+            )
+            print(f"{size:>10,} {backend:>8} {os.path.getsize(path) / 1e6:>8.0f} {r['startup_ms']:>8.0f}ms "
+                  f"{r['memory_mb']:>8.0f} {cells}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Customer lookup benchmark: the old linear scans in chat_api vs CustomerStore's indexes
+
+Generates a synthetic book of business (import_customers.py --synthetic), then times
+verify (name + phone), verify (policy number) and lookup by id.
+
+Usage: python benchmarks/bench_customer_store.py [--customers 100000] [--lookups 2000]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from customer_store import CustomerStore
+from import_customers import synthetic_customers
+
+
+# --- The original chat_api lookups ---
+
+def legacy_verify(db, name, phone, policy_number):
+    customer = None
+    if name and phone:
+        for c in db:
+            if c['name'].lower() == name.lower() and c['phone'] == phone:
+                customer = c
+                break
+    if not customer and policy_number:
+        for c in db:
+            for policy in c['policies']:
+                if policy['number'] == policy_number:
+                    customer = c
+                    break
+            if customer:
+                break
+    return customer
+
+
+def legacy_get(db, customer_id):
+    return next((c for c in db if c['id'] == customer_id), None)
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        assert fn(*q) is not None
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=2000, help="per lookup type (the linear scans are slow)")
+    args = parser.parse_args()
+
+    customers = list(synthetic_customers(args.customers))
+    path = os.path.join(tempfile.mkdtemp(), "customers.json")
+    with open(path, "w") as f:
+        json.dump({"customers": customers}, f)
+    print(f"🧪 {args.customers:,} customers ({os.path.getsize(path) / 1e6:.0f} MB JSON), {args.lookups:,} lookups each\n")
+
+    start = time.perf_counter()
+    with open(path) as f:
+        db = json.load(f)["customers"]
+    legacy_load = time.perf_counter() - start
+    start = time.perf_counter()
+    store = CustomerStore(path)
+    store_load = time.perf_counter() - start
+
+    rng = random.Random(7)
+    picks = [rng.choice(db) for _ in range(args.lookups)]
+    by_name = [(c["name"].upper(), c["phone"], "") for c in picks]
+    by_policy = [("", "", c["policies"][-1]["number"]) for c in picks]
+    by_id = [(c["id"],) for c in picks]
+
+    print(f"{'':<22} {'linear scan':>14} {'indexed':>14} {'speedup':>10}")
+    print(f"{'load':<22} {legacy_load * 1000:>12.0f}ms {store_load * 1000:>12.0f}ms")
+    for label, legacy, indexed, queries in (
+        ("verify (name+phone)", lambda *q: legacy_verify(db, *q), store.verify, by_name),
+        ("verify (policy no.)", lambda *q: legacy_verify(db, *q), store.verify, by_policy),
+        ("get by id", lambda *q: legacy_get(db, *q), store.get, by_id),
+    ):
+        old = timed(legacy, queries)
+        new = timed(indexed, queries)
+        print(f"{label:<22} {old * 1e6:>12.1f}µs {new * 1e6:>12.2f}µs {old / new:>9,.0f}x")
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Antigravity Gemini context benchmark: prompt tokens per turn, with and without the context cache
+
+Runs multi-turn Antigravity sessions and reports, per session, the prompt tokens Gemini was
+sent and how many of them were served from the cached system context.
+
+Usage:
+    # A local stand-in for the Gemini REST API (generateContent streaming + cachedContents).
+    # It counts ~4 chars per token and, like Gemini, refuses to cache less than --min-cache-tokens.
+    python benchmarks/bench_gemini_context.py --stub-gemini 8090 --min-cache-tokens 32
+
+    export GEMINI_API_KEY=stub GEMINI_API_ENDPOINT=http://localhost:8090 ANTIGRAVITY_ALLOWED_IPS=127.0.0.1
+    GEMINI_CACHE_MIN_TOKENS=32 python bedrock_api.py   # Cache the (small) preamble; 4096 = never
+
+    python benchmarks/bench_gemini_context.py --url http://localhost:5000 --sessions 5 --turns 6
+"""
+
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+def _tokens(obj):
+    """Text tokens in a request fragment (~4 chars per token, like stream_tracker.estimate_tokens)."""
+    if isinstance(obj, dict):
+        return sum(_tokens(v) for k, v in obj.items() if k != "role")
+    if isinstance(obj, list):
+        return sum(_tokens(v) for v in obj)
+    return len(obj) // 4 if isinstance(obj, str) else 0
+
+
+def serve_stub_gemini(port, min_cache_tokens, reply_words, delay):
+    caches = {}  # name -> {"tokens": n, "expire": t}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            return json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        def _cache_resource(self, name, model, entry):
+            expire = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(entry["expire"]))
+            return {"name": name, "model": model, "expireTime": expire,
+                    "usageMetadata": {"totalTokenCount": entry["tokens"]}}
+
+        def do_POST(self):
+            path = self.path.split("?")[0]
+            request = self._body()
+
+            if path == "/v1beta/cachedContents":
+                tokens = _tokens(request.get("systemInstruction")) + _tokens(request.get("contents"))
+                if tokens < min_cache_tokens:
+                    self._json(400, {"error": {"code": 400, "status": "INVALID_ARGUMENT",
+                                               "message": f"Cached content is too small: {tokens} < {min_cache_tokens} tokens"}})
+                    return
+                name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+                ttl = float(str(request.get("ttl", "3600s")).rstrip("s"))
+                with lock:
+                    caches[name] = {"tokens": tokens, "expire": time.time() + ttl}
+                print(f"🗄️ Cache {name} created ({tokens} tokens)")
+                self._json(200, self._cache_resource(name, request.get("model"), caches[name]))
+                return
+
+            if path.endswith(":streamGenerateContent") or path.endswith(":generateContent"):
+                cached = 0
+                if request.get("cachedContent"):
+                    with lock:
+                        entry = caches.get(request["cachedContent"])
+                    if entry is None or entry["expire"] < time.time():
+                        self._json(404, {"error": {"code": 404, "status": "NOT_FOUND", "message": "Cache expired"}})
+                        return
+                    cached = entry["tokens"]
+                prompt = cached + _tokens(request.get("systemInstruction")) + _tokens(request.get("contents"))
+                usage = {"promptTokenCount": prompt, "cachedContentTokenCount": cached,
+                         "candidatesTokenCount": reply_words, "totalTokenCount": prompt + reply_words}
+
+                # REST streaming is one JSON array, written an element at a time
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for i in range(reply_words):
+                        last = i == reply_words - 1
+                        chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": "word "}]},
+                                                 **({"finishReason": "STOP"} if last else {})}]}
+                        if last:
+                            chunk["usageMetadata"] = usage
+                        data = (("[" if i == 0 else ",") + json.dumps(chunk) + ("]" if last else "")).encode()
+                        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                        self.wfile.flush()
+                        time.sleep(delay)
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    print("✂️ Stream cancelled by the API")
+                return
+
+            self._json(404, {"error": {"code": 404, "message": f"Unknown path {path}"}})
+
+        def do_PATCH(self):
+            name = self.path.split("?")[0][len("/v1beta/"):]
+            request = self._body()
+            with lock:
+                entry = caches.get(name)
+                if entry is not None:
+                    entry["expire"] = time.time() + float(str(request.get("ttl", "3600s")).rstrip("s"))
+            if entry is None:
+                self._json(404, {"error": {"code": 404, "status": "NOT_FOUND", "message": "No such cache"}})
+            else:
+                self._json(200, self._cache_resource(name, None, entry))
+
+        def do_GET(self):
+            name = self.path.split("?")[0][len("/v1beta/"):]
+            with lock:
+                entry = caches.get(name)
+            if entry is None:
+                self._json(404, {"error": {"code": 404, "status": "NOT_FOUND", "message": "No such cache"}})
+            else:
+                self._json(200, self._cache_resource(name, None, entry))
+
+    print(f"🧪 Stub Gemini on :{port} (caches need >= {min_cache_tokens} tokens)")
+    ThreadingHTTPServer(("0.0.0.0", port), Handler).serve_forever()
+
+
+def run_session(base_url, session_id, turns, timeout):
+    for turn in range(turns):
+        with requests.post(f"{base_url}/api/antigravity/chat", stream=True, timeout=timeout, json={
+            "message": f"Turn {turn}: how is the Flask backend wired to nginx?",
+            "session_id": session_id
+        }) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line.startswith(b"data: "):
+                    event = json.loads(line[6:])
+                    if event.get("error"):
+                        raise RuntimeError(event["error"])
+    return requests.get(f"{base_url}/api/antigravity/context", params={"session_id": session_id},
+                        timeout=timeout).json()["usage"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000", help="bedrock_api base URL")
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--stub-gemini", type=int, metavar="PORT", help="run the Gemini stand-in instead")
+    parser.add_argument("--min-cache-tokens", type=int, default=4096)
+    parser.add_argument("--stub-words", type=int, default=40)
+    parser.add_argument("--stub-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    if args.stub_gemini:
+        serve_stub_gemini(args.stub_gemini, args.min_cache_tokens, args.stub_words, args.stub_delay)
+        return
+
+    base_url = args.url.rstrip("/")
+    run_id = uuid.uuid4().hex[:6]
+    print(f"{'session':>14} {'turns':>6} {'prompt tok':>11} {'cached tok':>11} {'saved':>7}")
+    totals = {"prompt_tokens": 0, "cached_tokens": 0}
+    for i in range(args.sessions):
+        usage = run_session(base_url, f"bench-{run_id}-{i}", args.turns, args.timeout)
+        for key in totals:
+            totals[key] += usage[key]
+        share = usage["cached_tokens"] / usage["prompt_tokens"] if usage["prompt_tokens"] else 0
+        print(f"{'bench-' + run_id + '-' + str(i):>14} {usage['turns']:>6} {usage['prompt_tokens']:>11} "
+              f"{usage['tokens_saved']:>11} {share:>7.0%}")
+    print(f"\nTotal: {totals['prompt_tokens']} prompt tokens, {totals['cached_tokens']} served from the context cache")
+
+
+if __name__ == "__main__":
+    main()
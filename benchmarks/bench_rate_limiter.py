@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Rate limiter microbenchmark: legacy per-IP timestamp lists vs SlidingWindowLimiter
+
+Usage: python benchmarks/bench_rate_limiter.py [--ips 100000] [--calls 1000000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import SlidingWindowLimiter
+
+
+def legacy_check(limits, ip, limit=20, window_hours=1):
+    """The original check_rate_limit (list of datetimes per IP, rebuilt on every call)."""
+    now = datetime.now()
+    cutoff = now - timedelta(hours=window_hours)
+    limits[ip] = [t for t in limits[ip] if t > cutoff]
+    if len(limits[ip]) >= limit:
+        return False
+    limits[ip].append(now)
+    return True
+
+
+def run(label, check, ips):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for ip in ips:
+        check(ip)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {len(ips) / elapsed:>12,.0f} checks/s   peak mem {peak / 1e6:>7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ips", type=int, default=100_000)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    pool = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.ips)]
+    random.seed(42)
+    ips = [random.choice(pool) for _ in range(args.calls)]
+
+    print(f"🧪 {args.calls:,} checks across {args.ips:,} distinct IPs (limit 20/hour)\n")
+
+    legacy_limits = defaultdict(list)
+    run("legacy", lambda ip: legacy_check(legacy_limits, ip), ips)
+
+    limiter = SlidingWindowLimiter(20, 3600)
+    run("sliding-window", limiter.allow, ips)
+
+    # Idle eviction: jump past two windows and trigger a sweep
+    limiter.allow("probe", now=time.time() + 3 * 3600)
+    print(f"\nAfter idle sweep: legacy keeps {len(legacy_limits):,} IPs, "
+          f"sliding-window keeps {len(limiter):,} (evicted {limiter.evicted:,})")
+
+
+if __name__ == "__main__":
+    main()
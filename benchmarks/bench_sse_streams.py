@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Concurrent SSE stream benchmark for bedrock_api (single process vs gunicorn workers)
+
+Opens N simultaneous streaming chats at increasing concurrency levels and reports how many
+streams opened and completed, and the time to first byte.
+
+Usage:
+    # Optional: a fake Ollama that streams tokens slowly, so the LLM is never the bottleneck
+    python benchmarks/bench_sse_streams.py --stub-ollama 11500
+    # Lift the per-model slot cap so the gateway doesn't queue the stub's streams
+    export OLLAMA_HOST=http://localhost:11500 LLM_DEFAULT_CONCURRENCY=1000
+    python bedrock_api.py
+    BEDROCK_API_WORKERS=4 gunicorn -c gunicorn.conf.py bedrock_api:app
+
+    python benchmarks/bench_sse_streams.py --url http://localhost:5000 --levels 10,50,100,200
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def open_stream(url, payload, timeout, results):
+    start = time.perf_counter()
+    try:
+        with requests.post(url, json=payload, stream=True, timeout=timeout) as response:
+            if response.status_code != 200:
+                results.append({"ok": False, "error": f"HTTP {response.status_code}"})
+                return
+            ttfb = None
+            done = False
+            for line in response.iter_lines():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                if line.startswith(b"data: ") and json.loads(line[6:]).get("done"):
+                    done = True
+            results.append({"ok": done, "ttfb": ttfb, "total": time.perf_counter() - start,
+                            "error": None if done else "stream ended without done event"})
+    except Exception as e:
+        results.append({"ok": False, "error": type(e).__name__})
+
+
+def run_level(url, concurrency, timeout):
+    results = []
+    threads = [
+        threading.Thread(target=open_stream, args=(url, {
+            "message": f"Benchmark stream {i}",
+            "session_id": f"bench-{concurrency}-{i}",
+            "stream": True
+        }, timeout, results))
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    opened = [r for r in results if r.get("ttfb") is not None]
+    ttfbs = [r["ttfb"] * 1000 for r in opened]
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    p50, p95 = percentile(ttfbs, 0.5), percentile(ttfbs, 0.95)
+    print(f"{concurrency:>6} {len(opened):>8} {sum(r['ok'] for r in results):>10} "
+          f"{concurrency - sum(r['ok'] for r in results):>7} "
+          f"{p50 or 0:>10.0f} {p95 or 0:>10.0f} {elapsed:>9.1f}s  {errors or ''}")
+
+
+def serve_stub_ollama(port, tokens, delay):
+    """Minimal /api/chat that streams `tokens` chunks, one every `delay` seconds."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = json.dumps({"models": [{"name": "llama3.3"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not request.get("stream", True):
+                time.sleep(tokens * delay)
+                body = json.dumps({"model": "llama3.3", "message": {"role": "assistant", "content": "tok " * tokens},
+                                   "done": True, "eval_count": tokens,
+                                   "total_duration": int(tokens * delay * 1e9)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for i in range(tokens + 1):
+                    last = i == tokens
+                    chunk = {"model": "llama3.3", "message": {"role": "assistant", "content": "" if last else "tok "},
+                             "done": last}
+                    if last:
+                        chunk.update({"eval_count": tokens, "eval_duration": int(tokens * delay * 1e9),
+                                      "total_duration": int(tokens * delay * 1e9)})
+                    data = (json.dumps(chunk) + "\n").encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                    if not last:
+                        time.sleep(delay)
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                print(f"✂️ Stream cancelled by the API after {i} tokens")
+
+    print(f"🧪 Stub Ollama on :{port} ({tokens} tokens, {delay * 1000:.0f}ms apart)")
+    ThreadingHTTPServer(("0.0.0.0", port), Handler).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000", help="bedrock_api base URL")
+    parser.add_argument("--path", default="/api/chat", help="streaming endpoint (POST, stream=true)")
+    parser.add_argument("--levels", default="10,50,100,200", help="comma-separated concurrency levels")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--stub-ollama", type=int, metavar="PORT", help="run a slow-token fake Ollama instead")
+    parser.add_argument("--stub-tokens", type=int, default=50)
+    parser.add_argument("--stub-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.stub_ollama:
+        serve_stub_ollama(args.stub_ollama, args.stub_tokens, args.stub_delay)
+        return
+
+    url = args.url.rstrip("/") + args.path
+    print(f"Target: {url}")
+    print(f"{'conc':>6} {'opened':>8} {'completed':>10} {'failed':>7} {'ttfb p50':>10} {'ttfb p95':>10} {'wall':>10}")
+    for level in (int(x) for x in args.levels.split(",")):
+        run_level(url, level, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,31 +3,59 @@ Bedrock Insurance Advisor Chat API
 Handles customer verification, AI chat, and policy retrieval
 """
 
-import json
 import os
-from flask import Blueprint, request, jsonify
-import ollama
+import json
+import time
+import threading
+from collections import OrderedDict
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import llm_gateway
+from http_cache import cached_json
+from customer_store import CustomerStore, SqliteCustomerStore
+from claims_queue import ClaimsQueue
 
-# Load mock customer data
 # Load mock customer data
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 # Moved to root to avoid volume masking issues
-CUSTOMERS_FILE = os.path.join(DATA_DIR, "mock_customers.json")
+CUSTOMERS_FILE = os.getenv("CUSTOMERS_FILE", os.path.join(DATA_DIR, "mock_customers.json"))
+
+# SQLite customer database built by import_customers.py (instead of loading the JSON file)
+CUSTOMERS_DB = os.getenv("CUSTOMERS_DB")
+
+# Indexed by id, name + phone and policy number; picks up edits to the file without a restart
+customers = None
+if CUSTOMERS_DB:
+    try:
+        customers = SqliteCustomerStore(CUSTOMERS_DB)
+    except Exception as e:
+        print(f"⚠️ Failed to open customer database {CUSTOMERS_DB}, using {os.path.basename(CUSTOMERS_FILE)}: {e}")
+if customers is None:
+    customers = CustomerStore(CUSTOMERS_FILE)
+
+# Submitted claims: write-ahead log per process, written to SQLite in batches
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(DATA_DIR, "bedrock_agents", "data"))
+os.makedirs(STATE_DIR, exist_ok=True)
+claims = ClaimsQueue(os.path.join(STATE_DIR, "claims.sqlite3"), os.path.join(STATE_DIR, "claims_wal"))
 
-try:
-    with open(CUSTOMERS_FILE, 'r') as f:
-        CUSTOMER_DB = json.load(f)['customers']
-    print(f"✅ Loaded {len(CUSTOMER_DB)} mock customers")
-except Exception as e:
-    print(f"⚠️ Failed to load mock customers: {e}")
-    CUSTOMER_DB = []
+# Rendered customer contexts: (customer id, store version) -> text. Reusing the exact text keeps
+# the prompt prefix byte-identical across turns, so Ollama can reuse its KV cache.
+CONTEXT_CACHE_SIZE = 1000
+_context_cache = OrderedDict()
+_context_lock = threading.Lock()
 
 # Create Blueprint
 chat_bp = Blueprint('chat', __name__)
 
-# Ollama client
+# Ollama host (calls go through the shared LLM gateway)
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://host.docker.internal:11434")
-ollama_client = ollama.Client(host=OLLAMA_HOST)
+
+# Headers for Server-Sent Event responses (disable Nginx buffering so chunks flush immediately)
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+ERROR_REPLY = "I apologize, but I'm experiencing technical difficulties. Please try again or contact our support team."
 
 
 @chat_bp.route('/api/insurance/verify', methods=['POST'])
@@ -38,25 +66,8 @@ def verify_identity():
     phone = data.get('phone', '').strip()
     policy_number = data.get('policyNumber', '').strip()
     
-    # Search for customer
-    customer = None
-    
-    # Try by name and phone
-    if name and phone:
-        for c in CUSTOMER_DB:
-            if c['name'].lower() == name.lower() and c['phone'] == phone:
-                customer = c
-                break
-    
-    # Try by policy number
-    if not customer and policy_number:
-        for c in CUSTOMER_DB:
-            for policy in c['policies']:
-                if policy['number'] == policy_number:
-                    customer = c
-                    break
-            if customer:
-                break
+    # Try by name and phone, then by policy number
+    customer = customers.verify(name, phone, policy_number)
     
     if customer:
         return jsonify({
@@ -72,19 +83,20 @@ def verify_identity():
 
 @chat_bp.route('/api/insurance/chat', methods=['POST'])
 def chat():
-    """Handle AI chat with customer context"""
+    """Handle AI chat with customer context (stream=true sends tokens as Server-Sent Events)"""
     data = request.json
     message = data.get('message', '')
     customer_id = data.get('customer_id', '')
     
-    # Find customer
-    customer = next((c for c in CUSTOMER_DB if c['id'] == customer_id), None)
+    # Find customer (version read first, so text cached under a version is never older than it)
+    version = customers.version
+    customer = customers.get(customer_id)
     
     if not customer:
         return jsonify({'response': "I'm sorry, I couldn't find your account information."}), 400
     
     # Build context for AI
-    context = build_customer_context(customer)
+    context = build_customer_context(customer, version)
     
     # Create AI prompt with context
     system_prompt = f"""You are a helpful and professional insurance advisor for Bedrock Insurance. 
@@ -102,13 +114,24 @@ Guidelines:
 
 Customer question: {message}"""
     
+    messages = [
+        {'role': 'system', 'content': 'You are a professional insurance advisor at Bedrock Insurance.'},
+        {'role': 'user', 'content': system_prompt}
+    ]
+    
+    # Streaming mode: tokens as they are generated, then a usage summary
+    if data.get('stream'):
+        return Response(
+            stream_with_context(stream_advisor_reply(messages)),
+            mimetype='text/event-stream',
+            headers=SSE_HEADERS
+        )
+    
     try:
-        response = ollama_client.chat(
+        response = llm_gateway.chat(
             model='qwen',  # Fast 2.3GB model for quick chat responses
-            messages=[
-                {'role': 'system', 'content': 'You are a professional insurance advisor at Bedrock Insurance.'},
-                {'role': 'user', 'content': system_prompt}
-            ]
+            messages=messages,
+            host=OLLAMA_HOST
         )
         
         ai_response = response['message']['content']
@@ -120,53 +143,122 @@ Customer question: {message}"""
     except Exception as e:
         print(f"Error in chat: {e}")
         return jsonify({
-            'response': "I apologize, but I'm experiencing technical difficulties. Please try again or contact our support team."
+            'response': ERROR_REPLY
         }), 500
 
 
-def build_customer_context(customer):
-    """Build formatted context string for AI"""
-    context = f"Customer Name: {customer['name']}\n"
-    context += f"Email: {customer['email']}\n\n"
+def stream_advisor_reply(messages):
+    """Yields the advisor's reply as SSE chunk events, then a done event with usage stats.
+    Closing the stream (client gone) closes the Ollama stream, which stops generation."""
+    start = time.time()
+    first_token_at = None
+    token_count = 0
+    final_chunk = None
+    stream = llm_gateway.chat(model='qwen', messages=messages, host=OLLAMA_HOST, stream=True)
+    try:
+        for chunk in stream:
+            token = chunk['message']['content']
+            if token:
+                if first_token_at is None:
+                    first_token_at = time.time()
+                token_count += 1
+                yield f"data: {json.dumps({'chunk': token})}\n\n"
+            if chunk.get('done'):
+                final_chunk = chunk
+        
+        end = time.time()
+        usage = {
+            'prompt_tokens': None,
+            'output_tokens': token_count,
+            'ttft_ms': round((first_token_at - start) * 1000, 1) if first_token_at else None,
+            'total_ms': round((end - start) * 1000, 1),
+            'tokens_per_sec': None
+        }
+        # Prefer Ollama's own counters; fall back to wall-clock since the first token
+        if final_chunk and final_chunk.get('prompt_eval_count'):
+            usage['prompt_tokens'] = final_chunk['prompt_eval_count']
+        if final_chunk and final_chunk.get('eval_count') and final_chunk.get('eval_duration'):
+            usage['output_tokens'] = final_chunk['eval_count']
+            usage['tokens_per_sec'] = round(final_chunk['eval_count'] / (final_chunk['eval_duration'] / 1e9), 1)
+        elif first_token_at and end > first_token_at:
+            usage['tokens_per_sec'] = round(token_count / (end - first_token_at), 1)
+        
+        yield f"data: {json.dumps({'done': True, 'usage': usage})}\n\n"
     
-    context += "ACTIVE POLICIES:\n"
+    except Exception as e:
+        print(f"Error in chat stream: {e}")
+        yield f"data: {json.dumps({'error': ERROR_REPLY})}\n\n"
+    finally:
+        stream.close()
+
+
+def build_customer_context(customer, version):
+    """Formatted context string for AI (cached per customer until the store reloads)"""
+    key = (customer['id'], version)
+    with _context_lock:
+        context = _context_cache.get(key)
+        if context is not None:
+            _context_cache.move_to_end(key)
+            return context
+    
+    context = render_customer_context(customer)
+    with _context_lock:
+        _context_cache[key] = context
+        _context_cache.move_to_end(key)
+        while len(_context_cache) > CONTEXT_CACHE_SIZE:
+            _context_cache.popitem(last=False)
+    return context
+
+
+def render_customer_context(customer):
+    """Renders the customer's policies and claims in one pass"""
+    parts = [
+        f"Customer Name: {customer['name']}\n"
+        f"Email: {customer['email']}\n\n"
+        "ACTIVE POLICIES:\n"
+    ]
     for policy in customer['policies']:
-        context += f"\n{policy['type'].upper()} Insurance - {policy['number']}\n"
-        context += f"  Coverage: {policy['coverage']}\n"
-        context += f"  Premium: {policy['premium']}\n"
-        context += f"  Deductible: {policy['deductible']}\n"
-        context += f"  Status: {policy['status']}\n"
-        
+        parts.append(
+            f"\n{policy['type'].upper()} Insurance - {policy['number']}\n"
+            f"  Coverage: {policy['coverage']}\n"
+            f"  Premium: {policy['premium']}\n"
+            f"  Deductible: {policy['deductible']}\n"
+            f"  Status: {policy['status']}\n"
+        )
         if policy['type'] == 'home':
-            context += f"  Address: {policy['address']}\n"
+            parts.append(f"  Address: {policy['address']}\n")
         elif policy['type'] == 'auto':
-            context += f"  Vehicle: {policy['vehicle']}\n"
-        
-        context += f"  Features: {', '.join(policy['features'])}\n"
-        context += f"  Renewal: {policy['renewal_date']}\n"
+            parts.append(f"  Vehicle: {policy['vehicle']}\n")
+        parts.append(
+            f"  Features: {', '.join(policy['features'])}\n"
+            f"  Renewal: {policy['renewal_date']}\n"
+        )
     
     if customer['claims']:
-        context += "\n\nRECENT CLAIMS:\n"
+        parts.append("\n\nRECENT CLAIMS:\n")
         for claim in customer['claims']:
-            context += f"\nClaim #{claim['number']} ({claim['type']})\n"
-            context += f"  Date: {claim['date']}\n"
-            context += f"  Status: {claim['status']}\n"
-            context += f"  Amount: {claim['amount']}\n"
-            context += f"  Description: {claim['description']}\n"
+            parts.append(
+                f"\nClaim #{claim['number']} ({claim['type']})\n"
+                f"  Date: {claim['date']}\n"
+                f"  Status: {claim['status']}\n"
+                f"  Amount: {claim['amount']}\n"
+                f"  Description: {claim['description']}\n"
+            )
     
-    return context
+    return "".join(parts)
 
 
 @chat_bp.route('/api/insurance/policies/<customer_id>', methods=['GET'])
 def get_policies(customer_id):
     """Get all policies for a customer"""
-    customer = next((c for c in CUSTOMER_DB if c['id'] == customer_id), None)
+    customer = customers.get(customer_id)
     
     if customer:
-        return jsonify({
+        # Customer data: browser cache only, revalidated after a minute
+        return cached_json({
             'success': True,
             'policies': customer['policies']
-        })
+        }, max_age=60, private=True, last_modified=customers.mtime)
     else:
         return jsonify({
             'success': False,
@@ -176,12 +268,50 @@ def get_policies(customer_id):
 
 @chat_bp.route('/api/insurance/claims/submit', methods=['POST'])
 def submit_claim():
-    """Submit a new claim (POC - just returns success)"""
-    data = request.json
+    """Submit a new claim (durable once this returns; retries with the same Idempotency-Key
+    header or idempotency_key field get the original claim back)"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Claim details must be a JSON object'}), 400
+    
+    idempotency_key = request.headers.get('Idempotency-Key') or data.pop('idempotency_key', None)
+    try:
+        record, duplicate = claims.submit(data, idempotency_key=idempotency_key)
+    except Exception as e:
+        print(f"❌ Failed to record claim: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'We could not record your claim. Please try again.'
+        }), 503
     
-    # In production, this would create an actual claim record
     return jsonify({
         'success': True,
         'message': 'Claim submitted successfully. A claims adjuster will contact you within 24 hours.',
-        'claim_number': f"CLM-2025-{os.urandom(3).hex().upper()}"
+        'claim_number': record['claim_number'],
+        'status': record['status'],
+        'duplicate': duplicate
     })
+
+
+@chat_bp.route('/api/insurance/claims/<claim_number>', methods=['GET'])
+def get_claim(claim_number):
+    """Claim status by claim number"""
+    record = claims.get(claim_number)
+    if record is None:
+        return jsonify({
+            'success': False,
+            'message': 'Claim not found'
+        }), 404
+    return jsonify({
+        'success': True,
+        'claim_number': record['claim_number'],
+        'status': record['status'],
+        'submitted_at': record['submitted_at'],
+        'claim': record['claim']
+    })
+
+
+@chat_bp.route('/api/insurance/claims/stats', methods=['GET'])
+def claim_stats():
+    """Intake counters: submissions, duplicates, pending, batches and fsyncs"""
+    return jsonify(claims.stats())
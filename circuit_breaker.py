@@ -0,0 +1,187 @@
+"""
+Circuit Breaker
+Per-host breakers for the Mac Studio backends (Ollama, ComfyUI, TTS, ESC API), so callers
+fail in milliseconds while a host or its tunnel is down instead of waiting out timeouts.
+
+- closed: calls go through; consecutive connection failures are counted
+- open: calls fail immediately with CircuitOpenError; a background probe checks the host
+  every recovery_interval seconds
+- half_open: the probe reached the host; one trial call is let through, and its outcome
+  closes the breaker or opens it again
+
+Only transport failures (refused, reset, connect timeout) count: an HTTP error, or a read
+timeout from a host that accepted the connection (a slow generation), still means the host
+is up. Each process keeps its own breakers.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
+FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURES", "3"))  # Consecutive failures that open a breaker
+RECOVERY_INTERVAL = float(os.getenv("BREAKER_RECOVERY_SECONDS", "5"))  # Seconds between recovery probes
+PROBE_TIMEOUT = 2
+TRIAL_TIMEOUT = 60  # A half-open trial that never reported back frees its slot after this long
+
+FAILURE_ERRORS = (OSError,)  # requests, http.client and socket errors are all OSErrors
+ANSWERED_ERRORS = (requests.HTTPError, requests.exceptions.InvalidJSONError, requests.exceptions.ReadTimeout)
+try:
+    import httpx
+    FAILURE_ERRORS += (httpx.TransportError,)
+    ANSWERED_ERRORS += (httpx.ReadTimeout,)
+except ImportError:
+    pass
+
+
+def is_connection_failure(error):
+    if isinstance(error, ANSWERED_ERRORS):
+        return False  # Raised after the host accepted the connection
+    if isinstance(error, requests.ConnectionError) and error.args and isinstance(error.args[0], ReadTimeoutError):
+        return False  # A read timeout while streaming a response body
+    return isinstance(error, FAILURE_ERRORS)
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling a host whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, probe_url, failure_threshold=FAILURE_THRESHOLD, recovery_interval=RECOVERY_INTERVAL):
+        self.name = name
+        self.probe_url = probe_url
+        self.failure_threshold = failure_threshold
+        self.recovery_interval = recovery_interval
+
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._trial_started = None
+        self._probing = False
+
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self):
+        """True if a call may go ahead (in half-open state, claims the single trial)."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "half_open":
+                now = time.time()
+                if self._trial_started is None or now - self._trial_started > TRIAL_TIMEOUT:
+                    self._trial_started = now
+                    return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        """Raises CircuitOpenError while the breaker is open (doesn't claim a trial)."""
+        if self.state == "open":
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(f"{self.name} is unreachable (circuit open, last error: {self.last_error})")
+
+    def success(self):
+        with self._lock:
+            if self.state != "closed":
+                print(f"🟢 Circuit closed: {self.name} is back")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_started = None
+
+    def failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error) if error else None
+            self._trial_started = None
+            if self.state == "half_open" or \
+                    (self.state == "closed" and self.consecutive_failures >= self.failure_threshold):
+                self._open()
+
+    @contextmanager
+    def call(self):
+        """Guards one call: raises CircuitOpenError if not allowed, records the outcome."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unreachable (circuit {self.state}, last error: {self.last_error})")
+        try:
+            yield
+        except Exception as e:
+            if is_connection_failure(e):
+                self.failure(e)
+            else:
+                self.success()  # The host answered; the error is the caller's
+            raise
+        self.success()
+
+    def _open(self):
+        """Called with the lock held."""
+        self.state = "open"
+        self.opened_at = time.time()
+        self.times_opened += 1
+        print(f"🔴 Circuit open: {self.name} ({self.consecutive_failures} failures, last: {self.last_error})")
+        if not self._probing:
+            self._probing = True
+            threading.Thread(target=self._probe_loop, name=f"breaker-{self.name}", daemon=True).start()
+
+    def _probe_loop(self):
+        """Checks the host in the background until it answers, then lets one trial call through."""
+        while True:
+            time.sleep(self.recovery_interval)
+            try:
+                requests.get(self.probe_url, timeout=PROBE_TIMEOUT).close()  # Any HTTP response means reachable
+                reachable = True
+            except Exception:
+                reachable = False
+            with self._lock:
+                if self.state != "open":
+                    self._probing = False
+                    return
+                if reachable:
+                    self.state = "half_open"
+                    self._trial_started = None
+                    self._probing = False
+                    print(f"🟡 Circuit half-open: {self.name} answered a probe, allowing a trial call")
+                    return
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "open_for_seconds": round(time.time() - self.opened_at, 1) if self.state != "closed" and self.opened_at else None,
+                "last_error": self.last_error,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened
+            }
+
+
+_lock = threading.Lock()
+_breakers = {}  # "host:port" -> CircuitBreaker
+
+
+def get(url, probe_path="/"):
+    """The breaker for the host of url (created on first use, shared by every caller)."""
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    name = parts.netloc
+    with _lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, f"{parts.scheme}://{name}{probe_path}")
+        return breaker
+
+
+def states():
+    """Snapshot of every breaker, keyed by host:port."""
+    with _lock:
+        breakers = dict(_breakers)
+    return {name: breaker.snapshot() for name, breaker in sorted(breakers.items())}
@@ -0,0 +1,414 @@
+"""
+Claims Queue
+Durable intake for insurance claims: a submission is acknowledged once it is on disk, and
+written to the claims database in batches in the background.
+
+- Each process appends submissions to its own write-ahead log (one JSON line per claim).
+  Concurrent submitters share fsyncs (group commit): one fsync covers every line written
+  before it, so a burst costs a handful of syncs instead of one per claim
+- The log is written in segments: once the current one passes segment_bytes the writer
+  starts a new one, and deletes old segments as soon as all their claims are in SQLite
+- A writer thread inserts pending claims into SQLite in batches, one transaction each
+- On startup, logs left by processes that stopped (their file lock is free) are replayed;
+  inserts are idempotent, so replaying claims that were already written is harmless
+- Idempotency keys: before a keyed claim is acknowledged, its key is reserved in the shared
+  claim_keys table; a retry with the same key, on any worker, gets the original claim back
+- Claim status is looked up by claim number, pending or written
+"""
+
+import os
+import json
+import time
+import fcntl
+import socket
+import sqlite3
+import threading
+from collections import deque
+
+import metrics
+from shared_state import file_lock
+
+
+class ClaimsQueue:
+    def __init__(self, db_path, wal_dir, batch_size=500, flush_interval=0.05, group_commit=True,
+                 segment_bytes=4 << 20):
+        self.db_path = db_path
+        self.wal_dir = wal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.group_commit = group_commit  # False: one fsync per claim (for comparison)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()       # WAL appends and the pending maps
+        self._sync_cond = threading.Condition()
+        self._wake = threading.Event()
+        self._stopped = False
+
+        self._queue = deque()   # (seq, record) not yet in SQLite, in submission order
+        self._pending = {}      # claim number -> record
+        self._pending_keys = {} # idempotency key -> claim number
+        self._written = 0       # Lines appended to the WAL
+        self._synced = 0        # Lines known to be on disk
+        self._syncing = False
+        self._segments = deque()  # Older log segments: (last seq, file, path)
+        self._segment = 0
+
+        self.submitted = 0
+        self.duplicates = 0
+        self.fsyncs = 0
+        self.batches = 0
+        self.committed = 0
+        self.recovered = 0
+
+        os.makedirs(wal_dir, exist_ok=True)
+        with self._conn() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS claims (
+                    claim_number TEXT PRIMARY KEY,
+                    idempotency_key TEXT UNIQUE,
+                    customer_id TEXT,
+                    policy_number TEXT,
+                    status TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    submitted_at REAL NOT NULL,
+                    committed_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS claims_customer ON claims (customer_id, submitted_at)")
+            # Keys are reserved here, shared by all workers, before a keyed claim is acknowledged
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS claim_keys (
+                    idempotency_key TEXT PRIMARY KEY,
+                    claim_number TEXT NOT NULL,
+                    submitted_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS claim_keys_claim ON claim_keys (claim_number)")
+            db.execute("CREATE INDEX IF NOT EXISTS claim_keys_submitted ON claim_keys (submitted_at)")
+            db.execute("""
+                INSERT OR IGNORE INTO claim_keys
+                SELECT idempotency_key, claim_number, submitted_at, data FROM claims WHERE idempotency_key IS NOT NULL
+            """)
+
+        # Under the directory lock, so a starting process never mistakes a new log for an orphan
+        with file_lock(os.path.join(wal_dir, ".lock")):
+            self._recover()
+            self._wal, self._wal_path = self._open_segment()
+
+        self._writer = threading.Thread(target=self._write_loop, name="claims-writer", daemon=True)
+        self._writer.start()
+
+    def _open_segment(self):
+        self._segment += 1
+        path = os.path.join(self.wal_dir, f"claims-{socket.gethostname()}-{os.getpid()}-{self._segment}.wal")
+        wal = open(path, "ab")
+        fcntl.flock(wal, fcntl.LOCK_EX | fcntl.LOCK_NB)  # Held until the segment is deleted
+        return wal, path
+
+    def _conn(self, synchronous="FULL"):
+        # One connection per thread and sync level. FULL: a committed batch must survive power
+        # loss, since its log lines are then discarded. Key reservations use NORMAL: one lost
+        # to power loss is restored from the claims log when it is replayed
+        conn = getattr(self._local, synchronous, None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={synchronous}")
+            setattr(self._local, synchronous, conn)
+        return conn
+
+    # --- Submitting ---
+
+    def submit(self, claim, idempotency_key=None):
+        """Durably records a claim. Returns (record, duplicate); a duplicate is the record
+        first submitted with the same idempotency key."""
+        if idempotency_key:
+            existing = self._find_key(idempotency_key)
+            if existing is not None:
+                return self._duplicate(existing)
+
+        now = time.time()
+        record = {
+            "claim_number": f"CLM-{time.strftime('%Y', time.localtime(now))}-{os.urandom(6).hex().upper()}",
+            "idempotency_key": idempotency_key or None,
+            "status": "received",
+            "submitted_at": now,
+            "claim": claim
+        }
+        line = (json.dumps(record) + "\n").encode()
+
+        if idempotency_key:
+            existing = self._reserve(record)
+            if existing is not None:
+                return self._duplicate(existing)
+
+        with self._lock:
+            self._wal.write(line)
+            self._written += 1
+            seq = self._written
+            self._queue.append((seq, record))
+            self._pending[record["claim_number"]] = record
+            if idempotency_key:
+                self._pending_keys[idempotency_key] = record["claim_number"]
+            self.submitted += 1
+
+        self._sync(seq)
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+        metrics.inc("bedrock_claims_submitted_total", result="accepted")
+        return record, False
+
+    def _find_key(self, idempotency_key):
+        """The claim number already holding this key, from this process or the database."""
+        with self._lock:
+            claim_number = self._pending_keys.get(idempotency_key)
+        if claim_number is None:
+            row = self._conn().execute(
+                "SELECT claim_number FROM claim_keys WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone()
+            claim_number = row[0] if row else None
+        return claim_number
+
+    def _reserve(self, record):
+        """Claims the record's idempotency key for it in one committed transaction.
+        Returns the claim number that already holds the key, or None if this record got it."""
+        with self._conn("NORMAL") as db:
+            db.execute("""
+                INSERT INTO claim_keys (idempotency_key, claim_number, submitted_at, data)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (idempotency_key) DO NOTHING
+            """, (record["idempotency_key"], record["claim_number"], record["submitted_at"],
+                  json.dumps(record["claim"])))
+            claim_number = db.execute(
+                "SELECT claim_number FROM claim_keys WHERE idempotency_key = ?", (record["idempotency_key"],)
+            ).fetchone()[0]
+        return None if claim_number == record["claim_number"] else claim_number
+
+    def _duplicate(self, claim_number):
+        with self._lock:
+            self.duplicates += 1
+        metrics.inc("bedrock_claims_submitted_total", result="duplicate")
+        return self.get(claim_number), True
+
+    def _sync(self, seq):
+        """Returns once WAL line seq is on disk. Whoever finds no sync in progress fsyncs
+        for everyone who has written so far; the rest wait for it."""
+        if not self.group_commit:
+            with self._lock:
+                self._wal.flush()
+                os.fsync(self._wal.fileno())
+                self.fsyncs += 1
+            return
+
+        with self._sync_cond:
+            while self._synced < seq:
+                if self._syncing:
+                    self._sync_cond.wait()
+                    continue
+                self._syncing = True
+                with self._lock:
+                    target = self._written
+                    self._wal.flush()
+                self._sync_cond.release()
+                synced = False
+                try:
+                    os.fsync(self._wal.fileno())
+                    synced = True
+                finally:
+                    self._sync_cond.acquire()
+                    self._syncing = False
+                    if synced:
+                        self._synced = max(self._synced, target)
+                        self.fsyncs += 1
+                    self._sync_cond.notify_all()
+
+    # --- Writing to the database ---
+
+    def _write_loop(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                while self._write_batch():
+                    pass
+            except Exception as e:
+                print(f"⚠️ Claims writer failed, will retry: {e}")
+                time.sleep(1)
+
+    def _write_batch(self):
+        """Inserts up to batch_size pending claims in one transaction. Returns False when idle."""
+        with self._lock:
+            batch = [self._queue[i] for i in range(min(self.batch_size, len(self._queue)))]
+        if not batch:
+            return False
+
+        self._insert([record for _seq, record in batch])
+        with self._lock:
+            for _seq, record in batch:
+                self._queue.popleft()
+                self._pending.pop(record["claim_number"], None)
+                if record["idempotency_key"]:
+                    self._pending_keys.pop(record["idempotency_key"], None)
+            self.batches += 1
+            self.committed += len(batch)
+        self._rotate(committed_seq=batch[-1][0])
+        metrics.inc("bedrock_claims_written_total", len(batch))
+        metrics.inc("bedrock_claims_batches_total")
+        return True
+
+    def _rotate(self, committed_seq):
+        """Deletes log segments whose claims are all in the database, and starts a new
+        segment once the current one is over segment_bytes."""
+        with self._sync_cond:
+            while self._syncing:
+                self._sync_cond.wait()  # Never swap or close a file a sync is using
+            with self._lock:
+                if self._wal.tell() >= self.segment_bytes:
+                    # Seal the segment: everything written to it so far is on disk
+                    self._wal.flush()
+                    os.fsync(self._wal.fileno())
+                    self.fsyncs += 1
+                    self._synced = self._written
+                    self._segments.append((self._written, self._wal, self._wal_path))
+                    self._wal, self._wal_path = self._open_segment()
+                while self._segments and self._segments[0][0] <= committed_seq:
+                    _last_seq, wal, path = self._segments.popleft()
+                    os.remove(path)
+                    wal.close()
+            self._sync_cond.notify_all()
+
+    def _insert(self, records):
+        now = time.time()
+        rows = [(
+            r["claim_number"], r["idempotency_key"], r["claim"].get("customer_id"),
+            r["claim"].get("policy_number") or r["claim"].get("policy"), r["status"],
+            json.dumps(r["claim"]), r["submitted_at"], now
+        ) for r in records]
+        with self._conn() as db:
+            # OR IGNORE: replays of already-written claims
+            db.executemany("""
+                INSERT OR IGNORE INTO claims
+                (claim_number, idempotency_key, customer_id, policy_number, status, data, submitted_at, committed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            # Restores reservations lost to power loss when a log is replayed
+            db.executemany("""
+                INSERT OR IGNORE INTO claim_keys (idempotency_key, claim_number, submitted_at, data)
+                VALUES (?, ?, ?, ?)
+            """, [(row[1], row[0], row[6], row[5]) for row in rows if row[1]])
+
+    def _recover(self):
+        """Replays logs left by processes that stopped before their claims were written."""
+        for name in sorted(os.listdir(self.wal_dir)):
+            if not name.endswith(".wal"):
+                continue
+            path = os.path.join(self.wal_dir, name)
+            with open(path, "rb") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Owned by a running process
+                records = []
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break  # A torn final line was never acknowledged
+                for i in range(0, len(records), self.batch_size):
+                    self._insert(records[i:i + self.batch_size])
+                os.remove(path)
+            if records:
+                self.recovered += len(records)
+                print(f"♻️ Replayed {len(records)} claims from {name}")
+
+        # A process that stopped between reserving a key and logging its claim: the
+        # reservation holds the whole claim, and a retry may already have its number.
+        # Reservations a running worker has yet to write are inserted as that worker would
+        with self._conn() as db:
+            promoted = db.execute("""
+                INSERT OR IGNORE INTO claims
+                SELECT k.claim_number, k.idempotency_key, json_extract(k.data, '$.customer_id'),
+                       coalesce(json_extract(k.data, '$.policy_number'), json_extract(k.data, '$.policy')),
+                       'received', k.data, k.submitted_at, ?
+                FROM claim_keys k LEFT JOIN claims c ON c.claim_number = k.claim_number
+                WHERE c.claim_number IS NULL AND k.submitted_at > ?
+            """, (time.time(), time.time() - 86400)).rowcount
+        if promoted:
+            self.recovered += promoted
+            print(f"♻️ Recovered {promoted} reserved claims")
+
+    def flush(self, timeout=30):
+        """Waits until every pending claim is in the database."""
+        deadline = time.time() + timeout
+        while self._queue and time.time() < deadline:
+            self._wake.set()
+            time.sleep(self.flush_interval / 5)
+        return not self._queue
+
+    def close(self):
+        """Writes out pending claims and removes this process's log."""
+        self.flush()
+        self._stopped = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        with self._lock:
+            done = not self._queue
+            segments = list(self._segments) + [(self._written, self._wal, self._wal_path)]
+            self._segments.clear()
+        for _last_seq, wal, path in segments:
+            if done:
+                os.remove(path)
+            wal.close()
+
+    # --- Lookups ---
+
+    def get(self, claim_number):
+        """The claim's record (written or still pending), or None."""
+        with self._lock:
+            record = self._pending.get(claim_number)
+        if record is not None:
+            return record
+        db = self._conn()
+        row = db.execute("SELECT * FROM claims WHERE claim_number = ?", (claim_number,)).fetchone()
+        if row:
+            return self._record(row)
+        # A keyed claim still pending on another worker
+        row = db.execute(
+            "SELECT idempotency_key, submitted_at, data FROM claim_keys WHERE claim_number = ?", (claim_number,)
+        ).fetchone()
+        if row:
+            key, submitted_at, data = row
+            return {
+                "claim_number": claim_number,
+                "idempotency_key": key,
+                "status": "received",
+                "submitted_at": submitted_at,
+                "claim": json.loads(data)
+            }
+        return None
+
+    @staticmethod
+    def _record(row):
+        claim_number, key, _customer_id, _policy_number, status, data, submitted_at, _committed_at = row
+        return {
+            "claim_number": claim_number,
+            "idempotency_key": key,
+            "status": status,
+            "submitted_at": submitted_at,
+            "claim": json.loads(data)
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "duplicates": self.duplicates,
+                "pending": len(self._queue),
+                "committed": self.committed,
+                "batches": self.batches,
+                "fsyncs": self.fsyncs,
+                "claims_per_fsync": round(self.submitted / self.fsyncs, 1) if self.fsyncs else None,
+                "recovered": self.recovered
+            }
@@ -0,0 +1,384 @@
+"""
+Customer Store
+In-memory customer book for the insurance advisor, indexed for O(1) lookups.
+
+- Hash indexes by customer id, by (normalized name, phone) and by policy number, built
+  once per load instead of scanning every customer (and every policy) per request
+- Reloads when the JSON file changes on disk (checked at most every check_interval
+  seconds); the new indexes are built aside and swapped in with one assignment, so a
+  request never sees a half-built book
+- A file that fails to parse (e.g. caught mid-write) keeps the previous book and is
+  retried when it changes again
+- Where records share a key, the first one in the file wins, as with the old linear scans
+
+SqliteCustomerStore has the same interface over an indexed SQLite file (built with
+import_customers), for books too large to load into memory at startup.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+def normalize_name(name):
+    return (name or "").strip().lower()
+
+
+class _Book:
+    """One immutable load of the file: the records plus their indexes."""
+
+    def __init__(self, customers, mtime, version):
+        self.customers = customers
+        self.mtime = mtime
+        self.version = version
+        self.by_id = {}
+        self.by_name_phone = {}
+        self.by_policy = {}
+        for customer in customers:
+            self.by_id.setdefault(customer["id"], customer)
+            key = (normalize_name(customer["name"]), customer["phone"].strip())
+            self.by_name_phone.setdefault(key, customer)
+            for policy in customer.get("policies", []):
+                self.by_policy.setdefault(policy["number"], customer)
+
+
+class CustomerStore:
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()  # Serializes reloads; lookups never take it
+        self._book = _Book([], None, 0)
+        self._stat = None  # (mtime_ns, size) of the loaded file
+        self._bad_stat = None  # ... and of the last version that failed to load
+        self._last_check = 0.0
+        self._missing = False
+        self.reloads = 0
+        self.reload_errors = 0
+
+        self._reload(time.time())
+
+    # --- Lookups ---
+
+    def get(self, customer_id):
+        return self._current().by_id.get(customer_id)
+
+    def find_by_name_phone(self, name, phone):
+        return self._current().by_name_phone.get((normalize_name(name), (phone or "").strip()))
+
+    def find_by_policy(self, policy_number):
+        return self._current().by_policy.get((policy_number or "").strip())
+
+    def verify(self, name, phone, policy_number):
+        """Customer matching name and phone, else the holder of policy_number (None if neither)."""
+        book = self._current()
+        customer = None
+        if name and phone:
+            customer = book.by_name_phone.get((normalize_name(name), phone.strip()))
+        if customer is None and policy_number:
+            customer = book.by_policy.get(policy_number.strip())
+        return customer
+
+    @property
+    def mtime(self):
+        """Modification time of the loaded file (None if nothing is loaded), for Last-Modified."""
+        return self._current().mtime
+
+    @property
+    def version(self):
+        """Increments on every reload."""
+        return self._current().version
+
+    def __len__(self):
+        return len(self._current().customers)
+
+    def stats(self):
+        book = self._current()
+        return {
+            "backend": "json",
+            "customers": len(book.customers),
+            "policies": len(book.by_policy),
+            "version": book.version,
+            "loaded_mtime": book.mtime,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors
+        }
+
+    # --- Loading ---
+
+    def _current(self):
+        now = time.time()
+        if now - self._last_check >= self.check_interval:
+            self._reload(now)
+        return self._book
+
+    def _reload(self, now):
+        """Rebuilds the book if the file changed since the last load."""
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return  # Another thread just checked
+            self._last_check = now
+            try:
+                st = os.stat(self.path)
+            except OSError as e:
+                if not self._missing:
+                    print(f"⚠️ Customer file unavailable, keeping {len(self._book.customers)} loaded customers: {e}")
+                self._missing = True
+                return
+            self._missing = False
+            stat = (st.st_mtime_ns, st.st_size)
+            if stat == self._stat or stat == self._bad_stat:
+                return
+
+            start = time.perf_counter()
+            try:
+                with open(self.path, "r") as f:
+                    customers = json.load(f)["customers"]
+                book = _Book(customers, st.st_mtime, self._book.version + 1)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                self.reload_errors += 1
+                self._bad_stat = stat  # Retried once the file changes again (e.g. the write finishes)
+                print(f"⚠️ Failed to load customers from {os.path.basename(self.path)}, keeping the previous ones: {e}")
+                return
+
+            self._book = book
+            self._stat = stat
+            self.reloads += 1
+            verb = "Loaded" if self.reloads == 1 else "Reloaded"
+            print(f"✅ {verb} {len(customers)} customers ({len(book.by_policy)} policies) "
+                  f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+
+# --- SQLite backend ---
+
+SCHEMA = """
+CREATE TABLE customers (
+    id TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE TABLE policies (
+    number TEXT NOT NULL,
+    customer INTEGER NOT NULL,
+    type TEXT,
+    status TEXT,
+    renewal_date TEXT,
+    record TEXT NOT NULL
+);
+CREATE TABLE claims (
+    number TEXT NOT NULL,
+    customer INTEGER NOT NULL,
+    policy TEXT,
+    status TEXT,
+    date TEXT,
+    record TEXT NOT NULL
+);
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Built after the bulk insert (faster than maintaining them row by row)
+INDEXES = """
+CREATE INDEX customers_id ON customers (id);
+CREATE INDEX customers_name_phone ON customers (name_key, phone);
+CREATE INDEX policies_number ON policies (number);
+CREATE INDEX policies_customer ON policies (customer);
+CREATE INDEX claims_number ON claims (number);
+CREATE INDEX claims_customer ON claims (customer);
+"""
+
+
+def import_customers(customers, db_path, batch_size=10000):
+    """Bulk-loads customer records (mock_customers.json format, any iterable) into a new
+    SQLite file, then swaps it into place at db_path. Returns the number of customers."""
+    tmp_path = f"{db_path}.importing"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        db.execute("PRAGMA journal_mode=OFF")  # A failed import just leaves the temp file behind
+        db.execute("PRAGMA synchronous=OFF")
+        db.executescript(SCHEMA)
+        db.execute("BEGIN")
+
+        counts = {"customers": 0, "policies": 0, "claims": 0}
+        batch = []
+
+        def flush():
+            rows = [(c["id"], normalize_name(c["name"]), c["phone"].strip(),
+                     json.dumps(dict(c, policies=None, claims=None))) for c in batch]
+            cursor = db.execute("SELECT COALESCE(MAX(rowid), 0) FROM customers")
+            first_rowid = cursor.fetchone()[0] + 1
+            db.executemany("INSERT INTO customers (id, name_key, phone, record) VALUES (?, ?, ?, ?)", rows)
+            policies, claims = [], []
+            for rowid, c in enumerate(batch, first_rowid):
+                policies.extend((p["number"], rowid, p.get("type"), p.get("status"), p.get("renewal_date"),
+                                 json.dumps(p)) for p in c.get("policies", []))
+                claims.extend((cl["number"], rowid, cl.get("policy"), cl.get("status"), cl.get("date"),
+                               json.dumps(cl)) for cl in c.get("claims", []))
+            db.executemany("INSERT INTO policies (number, customer, type, status, renewal_date, record) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", policies)
+            db.executemany("INSERT INTO claims (number, customer, policy, status, date, record) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", claims)
+            counts["customers"] += len(batch)
+            counts["policies"] += len(policies)
+            counts["claims"] += len(claims)
+            batch.clear()
+
+        for customer in customers:
+            batch.append(customer)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+        db.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                       [(k, str(v)) for k, v in counts.items()] + [("imported_at", str(time.time()))])
+        db.execute("COMMIT")
+
+        db.executescript(INDEXES)
+        db.execute("ANALYZE")
+    finally:
+        db.close()
+
+    os.replace(tmp_path, db_path)  # Readers switch to the new file at their next check
+    return counts["customers"]
+
+
+class SqliteCustomerStore:
+    """CustomerStore interface over a file built by import_customers. Nothing is loaded up
+    front: each lookup is an indexed query. A re-import (which replaces the file) is picked
+    up at the next check, as with the JSON store."""
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stat = None     # (inode, mtime_ns) of the file the connections point at
+        self._mtime = None
+        self._generation = 0  # Bumped when the file is replaced; connections from older generations reopen
+        self._meta = {}
+        self._last_check = 0.0
+        self.reloads = 0
+
+        self._check(time.time())
+        print(f"✅ Opened customer database with {len(self)} customers ({self._meta.get('policies', 0)} policies)")
+
+    # --- Lookups ---
+
+    def get(self, customer_id):
+        row = self._query("SELECT rowid, record FROM customers WHERE id = ? ORDER BY rowid LIMIT 1", (customer_id,))
+        return self._customer(row)
+
+    def find_by_name_phone(self, name, phone):
+        row = self._query("SELECT rowid, record FROM customers WHERE name_key = ? AND phone = ? ORDER BY rowid LIMIT 1",
+                          (normalize_name(name), (phone or "").strip()))
+        return self._customer(row)
+
+    def find_by_policy(self, policy_number):
+        row = self._query(
+            "SELECT c.rowid, c.record FROM policies p JOIN customers c ON c.rowid = p.customer "
+            "WHERE p.number = ? ORDER BY p.rowid LIMIT 1", ((policy_number or "").strip(),)
+        )
+        return self._customer(row)
+
+    def verify(self, name, phone, policy_number):
+        """Customer matching name and phone, else the holder of policy_number (None if neither)."""
+        customer = None
+        if name and phone:
+            customer = self.find_by_name_phone(name, phone)
+        if customer is None and policy_number:
+            customer = self.find_by_policy(policy_number)
+        return customer
+
+    @property
+    def mtime(self):
+        self._conn()
+        return self._mtime
+
+    @property
+    def version(self):
+        self._conn()
+        return self._generation
+
+    def __len__(self):
+        self._conn()
+        return int(self._meta.get("customers", 0))
+
+    def stats(self):
+        self._conn()
+        return {
+            "backend": "sqlite",
+            "customers": int(self._meta.get("customers", 0)),
+            "policies": int(self._meta.get("policies", 0)),
+            "claims": int(self._meta.get("claims", 0)),
+            "version": self._generation,
+            "loaded_mtime": self._mtime,
+            "reloads": self.reloads
+        }
+
+    def _customer(self, row):
+        """Reassembles a record as it appeared in the JSON file."""
+        if row is None:
+            return None
+        rowid, record = row
+        conn = self._conn()
+        customer = json.loads(record)
+        customer["policies"] = [json.loads(r[0]) for r in conn.execute(
+            "SELECT record FROM policies WHERE customer = ? ORDER BY rowid", (rowid,))]
+        customer["claims"] = [json.loads(r[0]) for r in conn.execute(
+            "SELECT record FROM claims WHERE customer = ? ORDER BY rowid", (rowid,))]
+        return customer
+
+    # --- Connections ---
+
+    def _query(self, sql, params):
+        return self._conn().execute(sql, params).fetchone()
+
+    def _conn(self):
+        now = time.time()
+        if now - self._last_check >= self.check_interval:
+            self._check(now)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            if conn is not None:
+                conn.close()
+            # One read-only connection per thread
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+            self._local.generation = self._generation
+        return conn
+
+    def _check(self, now):
+        """Notices a re-import (the file at path was replaced)."""
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            try:
+                st = os.stat(self.path)
+                stat = (st.st_ino, st.st_mtime_ns)
+                if stat == self._stat:
+                    return
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+                try:
+                    meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+                finally:
+                    conn.close()
+            except (OSError, sqlite3.Error) as e:
+                if self._stat is None:
+                    raise
+                print(f"⚠️ Customer database unavailable, keeping the open one: {e}")
+                return
+            self._meta = meta
+            self._mtime = st.st_mtime
+            self._stat = stat
+            self._generation += 1
+            self.reloads += 1
+            if self.reloads > 1:
+                print(f"✅ Customer database replaced, now {meta.get('customers')} customers")
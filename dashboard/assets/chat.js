@@ -211,12 +211,7 @@ function addInsuranceMessage(text, type, avatar = null) {
     const avatarIcon = type === 'user' ? '👤' : '🤖';
 
     // Format if AI
-    let content = escapeHtml(text);
-    if (type !== 'user') {
-        content = text
-            .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>')
-            .replace(/\n/g, '<br>');
-    }
+    const content = type === 'user' ? escapeHtml(text) : formatAIMessage(text);
 
     messageDiv.innerHTML = `
         <div class="message-avatar">${avatarIcon}</div>
@@ -227,9 +222,16 @@ function addInsuranceMessage(text, type, avatar = null) {
 
     chatMessages.appendChild(messageDiv);
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return messageDiv;
+}
+
+function formatAIMessage(text) {
+    return text
+        .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>')
+        .replace(/\n/g, '<br>');
 }
 
-// Send request to AI
+// Send request to AI (streamed: tokens appear as they are generated)
 async function sendInsuranceAIRequest(message) {
     const typingIndicator = document.getElementById('typingIndicator');
     typingIndicator.style.display = 'flex';
@@ -240,17 +242,59 @@ async function sendInsuranceAIRequest(message) {
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 message: message,
-                customer_id: currentCustomer.id
+                customer_id: currentCustomer.id,
+                stream: true
             })
         });
 
-        const data = await response.json();
-
-        typingIndicator.style.display = 'none';
+        // Errors before streaming starts come back as plain JSON
+        if (!(response.headers.get('Content-Type') || '').startsWith('text/event-stream')) {
+            const data = await response.json();
+            typingIndicator.style.display = 'none';
+            if (data.response) {
+                addInsuranceMessage(data.response, 'ai');
+            }
+            return;
+        }
 
-        if (data.response) {
-            addInsuranceMessage(data.response, 'ai');
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let reply = '';
+        let messageDiv = null;
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            // An event can be split across reads: only parse complete ones
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const event of events) {
+                if (!event.startsWith('data: ')) continue;
+                const data = JSON.parse(event.slice(6));
+
+                if (data.chunk) {
+                    reply += data.chunk;
+                    if (!messageDiv) {
+                        typingIndicator.style.display = 'none';
+                        messageDiv = addInsuranceMessage(reply, 'ai');
+                    } else {
+                        messageDiv.querySelector('.message-content').innerHTML = formatAIMessage(reply);
+                    }
+                    const chatMessages = document.getElementById('insuranceChatMessages');
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                }
+
+                if (data.error) {
+                    typingIndicator.style.display = 'none';
+                    addInsuranceMessage(data.error, 'ai');
+                }
+            }
         }
+        typingIndicator.style.display = 'none';
     } catch (error) {
         typingIndicator.style.display = 'none';
         addInsuranceMessage("I apologize, but I'm having trouble connecting. Please try again.", 'ai');
@@ -6,6 +6,8 @@ Connects to ESC API running on Mac Studio M3 via SSH tunnel
 import streamlit as st
 import requests
 import json
+import circuit_breaker
+from circuit_breaker import CircuitOpenError
 import os
 import re
 from io import BytesIO
@@ -18,6 +20,7 @@ ESC_API_URL = os.getenv("ESC_API_URL", "http://localhost:8002")
 # public-facing URL where /map/{id} is reachable from the user's browser.
 ESC_MAP_URL = os.getenv("ESC_MAP_URL", ESC_API_URL)
 REQUEST_TIMEOUT = 600  # seconds — Qwen queries typically take 60-200s; 600s safety net
+esc_api = circuit_breaker.get(ESC_API_URL, probe_path="/health")  # Fail fast while the Mac Studio is offline
 
 # === STREAMLIT UI ===
 st.set_page_config(
@@ -452,7 +455,8 @@ def _render_map_link(trip_id: int):
 def fetch_stats():
     """Fetch database stats from ESC API."""
     try:
-        r = requests.get(f"{ESC_API_URL}/stats", timeout=5)
+        with esc_api.call():
+            r = requests.get(f"{ESC_API_URL}/stats", timeout=5)
         if r.status_code == 200:
             return r.json()
     except Exception:
@@ -463,7 +467,8 @@ def fetch_stats():
 def check_health():
     """Check ESC API health."""
     try:
-        r = requests.get(f"{ESC_API_URL}/health", timeout=5)
+        with esc_api.call():
+            r = requests.get(f"{ESC_API_URL}/health", timeout=5)
         if r.status_code == 200:
             data = r.json()
             return data.get("database") == "ok" and data.get("ollama", "").startswith("ok")
@@ -475,7 +480,8 @@ def check_health():
 def fetch_model_status() -> dict:
     """Check if gemma4:26b is loaded and ready."""
     try:
-        r = requests.get(f"{ESC_API_URL}/model_status", timeout=4)
+        with esc_api.call():
+            r = requests.get(f"{ESC_API_URL}/model_status", timeout=4)
         if r.status_code == 200:
             return r.json()
     except Exception:
@@ -486,13 +492,16 @@ def fetch_model_status() -> dict:
 def send_chat(message: str, history: list, mode: str = "photos") -> dict | None:
     """Send chat message to ESC API."""
     try:
-        r = requests.post(
-            f"{ESC_API_URL}/chat",
-            json={"message": message, "history": history, "mode": mode},
-            timeout=REQUEST_TIMEOUT,
-        )
+        with esc_api.call():
+            r = requests.post(
+                f"{ESC_API_URL}/chat",
+                json={"message": message, "history": history, "mode": mode},
+                timeout=REQUEST_TIMEOUT,
+            )
         if r.status_code == 200:
             return r.json()
+    except CircuitOpenError:
+        return {"response": "The archive server is offline right now. Please try again in a few minutes.", "sql_trace": []}
     except requests.exceptions.Timeout:
         return {"response": "The query timed out. Try a simpler question or be more specific about which tables to search.", "sql_trace": []}
     except Exception as e:
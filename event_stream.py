@@ -0,0 +1,54 @@
+"""
+Event Stream
+Append-only event log that any number of SSE subscribers can follow (with replay from the start).
+"""
+
+import json
+import threading
+
+
+class EventLog:
+    """Events for one run. Subscribers replay what already happened, then block for new events."""
+
+    def __init__(self):
+        self.events = []
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def append(self, event):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def follow(self, heartbeat=15):
+        """Yields events in order until the log is closed. Yields None every `heartbeat`
+        seconds without new events so callers can send keep-alives."""
+        index = 0
+        while True:
+            with self._cond:
+                if index >= len(self.events) and not self.closed:
+                    self._cond.wait(timeout=heartbeat)
+                pending = self.events[index:]
+                closed = self.closed
+            index += len(pending)
+
+            for event in pending:
+                yield event
+            if closed and index >= len(self.events):
+                return
+            if not pending:
+                yield None
+
+
+def sse_events(log, heartbeat=15):
+    """Formats an EventLog as Server-Sent Events, with comment lines as keep-alives."""
+    for event in log.follow(heartbeat=heartbeat):
+        if event is None:
+            yield ": keepalive\n\n"
+        else:
+            yield f"data: {json.dumps(event)}\n\n"
@@ -0,0 +1,199 @@
+"""
+Gemini Models
+Process-level registry of GenerativeModel objects, plus the fixed system context for
+Antigravity held in Gemini's context cache.
+
+- One GenerativeModel per (model, system instruction), built once per process instead of
+  on every request
+- When the preamble is at least cache_min_tokens long (Gemini rejects smaller caches), it is
+  uploaded once as CachedContent and every turn only references it; the cache's TTL is
+  extended while it is in use
+- Below that, get() reports that the model does not carry the preamble, and the caller sends
+  it once as a session's opening turns, so it is not billed on every turn
+  (system_every_turn=True sends it as the system instruction on every turn instead)
+- Per-session usage comes from Gemini's usage metadata: prompt, cached and output tokens
+"""
+
+import time
+import hashlib
+import threading
+
+import google.generativeai as genai
+from google.generativeai import caching
+
+from stream_tracker import estimate_tokens
+
+
+class GeminiModels:
+    def __init__(self, cache_min_tokens=4096, cache_ttl=3600, state=None, key="gemini_usage", max_sessions=500,
+                 system_every_turn=False, retry_interval=60):
+        self.cache_min_tokens = cache_min_tokens
+        self.cache_ttl = cache_ttl
+        self.system_every_turn = system_every_turn
+        self.retry_interval = retry_interval  # After a failed cache upload, before trying again
+        self.state = state  # SharedState for usage shared by all workers (None = this process only)
+        self.key = key
+        self.max_sessions = max_sessions
+
+        self._lock = threading.Lock()
+        self._models = {}   # (model, digest) -> GenerativeModel
+        self._caches = {}   # (model, digest) -> (CachedContent, expires_at)
+        self._uncacheable = set()  # (model, digest) the API refused as too small to cache
+        self._busy = set()         # (model, digest) with a cache upload or TTL update under way
+        self._retry_at = {}        # (model, digest) -> when to retry a failed upload
+        self._usage = {}
+
+        self.models_built = 0
+        self.caches_created = 0
+        self.cache_errors = 0
+
+    def get(self, model_name, system_instruction=None):
+        """Returns (model, carried): a GenerativeModel for model_name, and whether it carries the
+        system instruction. When carried is False the caller sends the instruction itself, once
+        per session."""
+        digest = hashlib.sha256((system_instruction or "").encode()).hexdigest()[:16]
+        key = (model_name, digest)
+
+        if system_instruction and key not in self._uncacheable and \
+                estimate_tokens(system_instruction) >= self.cache_min_tokens:
+            model = self._cached_model(key, model_name, system_instruction)
+            if model is not None:
+                return model, True
+            if key not in self._uncacheable:
+                # Not cached (yet): send it with this request
+                return self._model(key, model_name, system_instruction), True
+        if system_instruction and not self.system_every_turn:
+            return self._model((model_name, None), model_name, None), False
+        return self._model(key, model_name, system_instruction), True
+
+    def _model(self, key, model_name, system_instruction):
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._models[key] = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+                self.models_built += 1
+            return model
+
+    def _cached_model(self, key, model_name, system_instruction):
+        """Model bound to a CachedContent holding the system instruction, or None. Uploads and
+        TTL updates run outside the lock; other requests meanwhile use what is already there."""
+        now = time.time()
+        with self._lock:
+            if key in self._uncacheable or now < self._retry_at.get(key, 0):
+                return None
+            cached = self._caches.get(key)
+            model = self._models.get(("cached",) + key)
+            # Half the TTL left: extend it rather than uploading the context again
+            stale = cached is not None and now > cached[1] - self.cache_ttl / 2
+            if key in self._busy or (cached is not None and not stale):
+                return model if cached is not None else None
+            self._busy.add(key)
+
+        try:
+            if cached is not None:
+                cached[0].update(ttl=self.cache_ttl)
+                with self._lock:
+                    self._caches[key] = (cached[0], now + self.cache_ttl)
+                return model
+
+            content = caching.CachedContent.create(
+                model=model_name,
+                display_name=f"system-{key[1]}",
+                system_instruction=system_instruction,
+                ttl=self.cache_ttl
+            )
+            model = genai.GenerativeModel.from_cached_content(content)
+            with self._lock:
+                self._caches[key] = (content, now + self.cache_ttl)
+                self._models[("cached",) + key] = model
+                self.caches_created += 1
+            print(f"🗄️ Gemini context cache created for {model_name} ({estimate_tokens(system_instruction)} tokens)")
+            return model
+        except Exception as e:
+            # An expired or evicted cache is recreated on the next request, a failed upload after
+            # retry_interval; only a refusal as too small is final
+            print(f"⚠️ Gemini context cache unavailable, sending system instruction per request: {e}")
+            with self._lock:
+                self.cache_errors += 1
+                self._caches.pop(key, None)
+                if cached is None:
+                    if _too_small(e):
+                        self._uncacheable.add(key)
+                    else:
+                        self._retry_at[key] = now + self.retry_interval
+            return None
+        finally:
+            with self._lock:
+                self._busy.discard(key)
+
+    # --- Usage ---
+
+    def record_usage(self, session_id, response):
+        """Adds a finished (streamed) response's usage metadata to the session's totals."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return None
+        turn = {
+            "prompt_tokens": usage.prompt_token_count,
+            "cached_tokens": getattr(usage, "cached_content_token_count", 0),
+            "output_tokens": usage.candidates_token_count
+        }
+
+        def apply(sessions):
+            s = sessions.setdefault(session_id, {
+                "turns": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0
+            })
+            s["turns"] += 1
+            for name, value in turn.items():
+                s[name] += value
+            s["last_at"] = time.time()
+            if len(sessions) > self.max_sessions:
+                for old in sorted(sessions, key=lambda k: sessions[k]["last_at"])[:len(sessions) - self.max_sessions]:
+                    del sessions[old]
+            return sessions
+
+        try:
+            if self.state is not None:
+                self.state.update(self.key, apply, default={})
+            else:
+                with self._lock:
+                    apply(self._usage)
+        except Exception as e:
+            print(f"⚠️ Gemini usage update failed: {e}")
+        return turn
+
+    def session_usage(self, session_id):
+        """Totals for one session; tokens_saved are input tokens served from the context cache."""
+        if self.state is not None:
+            usage = self.state.get(self.key, {}).get(session_id)
+        else:
+            with self._lock:
+                usage = dict(self._usage.get(session_id) or {}) or None
+        if usage is not None:
+            usage["tokens_saved"] = usage["cached_tokens"]
+        return usage
+
+    def stats(self):
+        if self.state is not None:
+            sessions = self.state.get(self.key, {})
+        else:
+            with self._lock:
+                sessions = dict(self._usage)
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "models_built": self.models_built,
+                "context_caches": len(self._caches),
+                "caches_created": self.caches_created,
+                "cache_errors": self.cache_errors,
+                "cache_min_tokens": self.cache_min_tokens,
+                "sessions": len(sessions),
+                "prompt_tokens": sum(s["prompt_tokens"] for s in sessions.values()),
+                "tokens_saved": sum(s["cached_tokens"] for s in sessions.values())
+            }
+
+
+def _too_small(error):
+    """Whether Gemini refused a cache because the content is under its minimum size."""
+    message = str(error).lower()
+    return "too small" in message or "min_total_token_count" in message
@@ -0,0 +1,33 @@
+"""
+Gunicorn config for bedrock_api (multi-worker serving mode)
+Usage: BEDROCK_API_WORKERS=4 gunicorn -c gunicorn.conf.py bedrock_api:app
+"""
+
+import os
+
+bind = "0.0.0.0:5000"
+
+# Each worker is a separate process; cross-request state is shared through SQLite (shared_state.py)
+workers = int(os.getenv("BEDROCK_API_WORKERS", "2"))
+
+# Threaded workers: an SSE stream holds a thread for its whole lifetime, so threads (not workers)
+# set how many concurrent streams one process can serve
+worker_class = "gthread"
+threads = int(os.getenv("BEDROCK_API_THREADS", "32"))
+
+# Long LLM generations and meeting streams are legitimate; only kill truly stuck workers
+timeout = int(os.getenv("BEDROCK_API_TIMEOUT", "300"))
+graceful_timeout = 30
+keepalive = 5
+
+# No preload_app: background threads (health probes, cache refreshers) must start in each worker
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # bedrock_api reads the worker count to decide whether state must be shared through
+    # SQLite; give it the real one (the -w flag overrides the env default above)
+    os.environ["BEDROCK_API_WORKERS"] = str(server.num_workers)
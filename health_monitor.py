@@ -0,0 +1,98 @@
+"""
+Background Health Monitor
+Probes backend dependencies concurrently on an interval so /api/health can answer
+from the latest snapshot instead of waiting on timeouts.
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+class HealthMonitor:
+    """Periodically probes a set of HTTP dependencies and keeps a short history for each."""
+
+    def __init__(self, checks, interval=15, timeout=3, history_size=20):
+        # checks: {name: {"url": ..., "require_ok": bool}}
+        # require_ok=False counts any HTTP response as alive (servers without a health route)
+        self.checks = checks
+        self.interval = interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(checks)), thread_name_prefix="health-probe")
+        self._state = {
+            name: {
+                "ok": False,
+                "latency_ms": None,
+                "checked_at": None,
+                "last_success": None,
+                "consecutive_failures": 0,
+                "error": None,
+                "history": deque(maxlen=history_size)
+            }
+            for name in checks
+        }
+
+    def start(self):
+        """Starts the background probe loop (idempotent)."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.probe_all()
+            except Exception as e:
+                print(f"⚠️ Health monitor error: {e}")
+            time.sleep(self.interval)
+
+    def _probe(self, name):
+        check = self.checks[name]
+        start = time.time()
+        try:
+            response = requests.get(check["url"], timeout=self.timeout)
+            if check.get("require_ok", True):
+                ok = response.status_code == 200
+            else:
+                ok = response.status_code < 500
+            error = None if ok else f"HTTP {response.status_code}"
+        except Exception as e:
+            ok = False
+            error = type(e).__name__
+        return name, ok, (time.time() - start) * 1000, error
+
+    def probe_all(self):
+        """Probes every dependency at once and records the results."""
+        results = list(self._executor.map(self._probe, self.checks))
+        now = time.time()
+        with self._lock:
+            for name, ok, latency_ms, error in results:
+                state = self._state[name]
+                state["ok"] = ok
+                state["latency_ms"] = round(latency_ms, 1)
+                state["checked_at"] = now
+                state["error"] = error
+                if ok:
+                    state["last_success"] = now
+                    state["consecutive_failures"] = 0
+                else:
+                    state["consecutive_failures"] += 1
+                state["history"].append({"t": round(now, 1), "ok": ok, "latency_ms": round(latency_ms, 1)})
+
+    def is_ok(self, name):
+        with self._lock:
+            return self._state[name]["ok"]
+
+    def snapshot(self):
+        """Returns a copy of the latest probe results for every dependency."""
+        with self._lock:
+            return {
+                name: {**state, "history": list(state["history"])}
+                for name, state in self._state.items()
+            }
@@ -0,0 +1,126 @@
+"""
+History Compactor
+Keeps chat prompts within a token budget as conversations grow.
+
+- The most recent turns are kept verbatim, newest first, until the budget is used
+- Older turns are folded into a rolling summary, cached per conversation (by session id)
+- The summary is only regenerated once the folded turns it doesn't cover yet exceed
+  refresh_tokens; until then those few turns are sent verbatim alongside it
+"""
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from stream_tracker import estimate_tokens
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Role markers and separators per message
+
+
+def _turn_tokens(turn):
+    return estimate_tokens(turn["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _digest(turns):
+    raw = json.dumps([[t["role"], t["content"]] for t in turns], separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class HistoryCompactor:
+    def __init__(self, summarize, budget_tokens=1500, refresh_tokens=600, max_conversations=500):
+        # summarize(previous_summary or None, turns) -> str  (turns: [{"role", "content"}])
+        self.summarize = summarize
+        self.budget = budget_tokens
+        self.refresh_tokens = refresh_tokens
+        self.max_conversations = max_conversations
+
+        self._lock = threading.Lock()
+        self._summaries = OrderedDict()  # conversation key -> (turns covered, digest of those turns, summary)
+
+        self.compactions = 0
+        self.summaries_generated = 0
+        self.summary_failures = 0
+
+    def compact(self, history, key):
+        """Returns (summary or None, turns to send verbatim).
+
+        key identifies the conversation (a session id), so conversations that open the same
+        way keep separate summaries."""
+        history = [t for t in history if t.get("role") and t.get("content")]
+
+        # Newest turns first, as many as fit in the budget
+        split = len(history)
+        used = 0
+        while split > 0:
+            tokens = _turn_tokens(history[split - 1])
+            if used + tokens > self.budget:
+                break
+            used += tokens
+            split -= 1
+        # Start the verbatim part on a user turn so roles keep alternating after the summary
+        while split < len(history) and history[split]["role"] != "user":
+            split += 1
+
+        folded, recent = history[:split], history[split:]
+        if not folded:
+            return None, recent
+
+        with self._lock:
+            self.compactions += 1
+        covered, summary = self._cached(key, folded)
+        uncovered = folded[covered:]
+
+        if sum(_turn_tokens(t) for t in uncovered) > self.refresh_tokens:
+            try:
+                summary = self.summarize(summary, uncovered)
+                with self._lock:
+                    self.summaries_generated += 1
+                    self._summaries[key] = (len(folded), _digest(folded), summary)
+                    self._summaries.move_to_end(key)
+                    while len(self._summaries) > self.max_conversations:
+                        self._summaries.popitem(last=False)
+                uncovered = []
+            except Exception as e:
+                # Without a fresh summary, keep whatever context fits rather than failing the chat
+                print(f"⚠️ History summary failed: {e}")
+                with self._lock:
+                    self.summary_failures += 1
+                uncovered = self._tail(uncovered, self.refresh_tokens)
+
+        return summary, uncovered + recent
+
+    def _cached(self, key, folded):
+        """(turns covered, summary) if the cached summary covers a prefix of folded, else (0, None)."""
+        with self._lock:
+            entry = self._summaries.get(key)
+            if entry is not None:
+                self._summaries.move_to_end(key)
+        if entry is None:
+            return 0, None
+        covered, digest, summary = entry
+        if covered > len(folded) or _digest(folded[:covered]) != digest:
+            return 0, None  # History was edited or belongs to another conversation
+        return covered, summary
+
+    @staticmethod
+    def _tail(turns, budget):
+        kept = []
+        used = 0
+        for turn in reversed(turns):
+            used += _turn_tokens(turn)
+            if used > budget:
+                break
+            kept.append(turn)
+        return kept[::-1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "budget_tokens": self.budget,
+                "refresh_tokens": self.refresh_tokens,
+                "conversations": len(self._summaries),
+                "compactions": self.compactions,
+                "summaries_generated": self.summaries_generated,
+                "summary_failures": self.summary_failures
+            }
@@ -0,0 +1,48 @@
+"""
+HTTP Cache Headers
+ETag / Last-Modified validators and Cache-Control for generated JSON, so browsers and nginx
+can reuse a response and revalidate it with a header-only 304 Not Modified.
+"""
+
+import json
+import hashlib
+from datetime import datetime, timezone
+
+from flask import request, jsonify
+
+
+def content_etag(data):
+    """Stable hash of the JSON content (key order doesn't matter)."""
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def cached_json(data, max_age, private=False, last_modified=None, etag_data=None):
+    """jsonify(data) with validators and Cache-Control, answered with 304 when the client's copy matches.
+
+    etag_data: hash this instead of the body, for bodies with per-request fields (e.g. an age
+    counter). The ETag is then weak: the cached copy is equivalent, not byte-identical.
+    last_modified: Unix timestamp of when the content was generated.
+    """
+    response = jsonify(data)
+    if etag_data is None:
+        response.set_etag(content_etag(data))
+    else:
+        response.set_etag(content_etag(etag_data), weak=True)
+
+    if last_modified:
+        response.last_modified = datetime.fromtimestamp(int(last_modified), tz=timezone.utc)
+
+    response.cache_control.max_age = max(0, int(max_age))
+    if private:
+        response.cache_control.private = True  # Per-customer data: browsers only, never nginx
+    else:
+        response.cache_control.public = True
+    return response.make_conditional(request)
+
+
+def uncacheable_json(data):
+    """jsonify(data) for fallback/error bodies that must not be reused."""
+    response = jsonify(data)
+    response.cache_control.no_store = True
+    return response
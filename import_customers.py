@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Customer Database Import
+Builds the SQLite customer database that chat_api serves from when CUSTOMERS_DB is set.
+
+Usage:
+    # Import the JSON customer book
+    python import_customers.py --json mock_customers.json --db bedrock_agents/data/customers.sqlite3
+
+    # Synthetic customers for load testing (straight into SQLite, or written as JSON)
+    python import_customers.py --synthetic 1000000 --db bedrock_agents/data/customers.sqlite3
+    python import_customers.py --synthetic 100000 --write-json /tmp/customers_100k.json
+
+The database is built next to --db and swapped in when complete, so a running API picks
+up the new data without a restart.
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+
+from customer_store import import_customers
+
+FIRST = ["Sarah", "James", "Maria", "David", "Linda", "Robert", "Aisha", "Wei", "Carlos", "Emma"]
+LAST = ["Thompson", "Garcia", "Nguyen", "Patel", "Smith", "Okafor", "Kim", "Rossi", "Murphy", "Cohen"]
+FEATURES = {
+    "home": ["Fire & Theft", "Flood Protection", "Personal Property", "Liability"],
+    "auto": ["Collision", "Comprehensive", "Uninsured Motorist", "Roadside Assistance"],
+    "life": ["Term Life", "Accidental Death", "Terminal Illness"]
+}
+
+
+def synthetic_customers(count, seed=42):
+    """Yields count customers in mock_customers.json format (unique ids, phones and policy numbers)."""
+    rng = random.Random(seed)
+    for i in range(count):
+        policies = []
+        for kind in rng.sample(["home", "auto", "life"], rng.randint(1, 3)):
+            policy = {
+                "type": kind,
+                "number": f"{kind.upper()}-2024-{i:07d}",
+                "coverage": f"${rng.randint(1, 20) * 50_000:,}",
+                "premium": f"${rng.randint(40, 400) * 10:,}/year",
+                "deductible": f"${rng.choice([500, 1000, 2500, 5000]):,}",
+                "status": rng.choice(["active"] * 9 + ["lapsed"]),
+                "renewal_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "features": rng.sample(FEATURES[kind], 2)
+            }
+            if kind == "home":
+                policy["address"] = f"{rng.randint(1, 9999)} Elm Street, Springfield"
+            elif kind == "auto":
+                policy["vehicle"] = f"{rng.randint(2010, 2025)} Honda Accord"
+            policies.append(policy)
+
+        claims = []
+        if rng.random() < 0.2:
+            policy = rng.choice(policies)
+            claims.append({
+                "number": f"CLM-2024-{i:07d}",
+                "type": policy["type"],
+                "policy": policy["number"],
+                "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "status": rng.choice(["open", "in review", "settled"]),
+                "amount": f"${rng.randint(5, 500) * 100:,}",
+                "description": "Synthetic claim for load testing"
+            })
+
+        yield {
+            "id": f"C{i:07d}",
+            "name": f"{rng.choice(FIRST)} {rng.choice(LAST)} {i}",
+            "phone": f"555-{i:07d}",
+            "email": f"customer{i}@email.com",
+            "policies": policies,
+            "claims": claims,
+            "documents": []
+        }
+
+
+def write_json(customers, path):
+    """Writes customers as a mock_customers.json-format file, one record at a time."""
+    count = 0
+    with open(path, "w") as f:
+        f.write('{"customers": [\n')
+        for customer in customers:
+            if count:
+                f.write(",\n")
+            f.write(json.dumps(customer))
+            count += 1
+        f.write("\n]}\n")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--json", help="customer file in mock_customers.json format")
+    source.add_argument("--synthetic", type=int, metavar="N", help="generate N synthetic customers")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="SQLite database to build")
+    parser.add_argument("--write-json", metavar="PATH", help="write the customers as JSON instead")
+    args = parser.parse_args()
+    if not args.db and not args.write_json:
+        parser.error("one of --db or --write-json is required")
+
+    if args.json:
+        with open(args.json) as f:
+            customers = json.load(f)["customers"]
+    else:
+        customers = synthetic_customers(args.synthetic, args.seed)
+
+    start = time.time()
+    if args.write_json:
+        count = write_json(customers, args.write_json)
+        print(f"✅ Wrote {count:,} customers to {args.write_json} in {time.time() - start:.1f}s")
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+        count = import_customers(customers, args.db)
+        print(f"✅ Imported {count:,} customers into {args.db} in {time.time() - start:.1f}s "
+              f"({os.path.getsize(args.db) / 1e6:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+Background Jobs
+Priority queue for long-running work (staff meetings, chart rendering, ingestion, image
+generation) so it never runs on request threads.
+
+- Jobs are rows in SQLite (the SharedState file): they survive restarts and every API worker
+  process sees the same queue
+- A bounded number of jobs run at once across all processes, optionally fewer per kind
+  (e.g. one ComfyUI render at a time); lower priority numbers run first
+- Progress events go to a per-job event stream that SSE clients can follow (in SQLite when
+  several worker processes share the queue, otherwise in memory so followers wake at once)
+- Running jobs are heartbeated; a job whose process died is marked interrupted
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import subprocess
+import threading
+
+import metrics
+from event_stream import EventLog
+from shared_state import SharedEventLog
+
+ACTIVE = ("queued", "running")
+FINISHED = ("completed", "failed", "cancelled", "interrupted")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """Handle passed to a job function: its parameters plus progress reporting."""
+
+    def __init__(self, queue, row):
+        self.queue = queue
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.params = row["params"]
+        self.started = time.time()
+        self.events = queue._log(self.id)
+
+    def progress(self, message=None, percent=None, **fields):
+        """Publishes a progress event. Raises JobCancelled if cancellation was requested."""
+        if self.cancelled():
+            raise JobCancelled()
+        event = {"message": message, "elapsed": round(time.time() - self.started, 2), **fields}
+        if percent is not None:
+            event["percent"] = percent
+        self.events.append(event)
+        self.queue.state.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(event), self.id))
+
+    def cancelled(self):
+        row = self.queue.state.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (self.id,)).fetchone()
+        return bool(row and row[0])
+
+
+class JobQueue:
+    def __init__(self, state, max_running=2, max_queued=100, retention=500, poll_interval=1.0, heartbeat=10,
+                 shared_events=True):
+        self.state = state
+        self.shared_events = shared_events  # False: one process, progress events kept in memory
+        self.max_running = max_running    # Across all processes sharing the database
+        self.max_queued = max_queued
+        self.retention = retention        # Finished jobs kept for status lookups
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+        self._kinds = {}  # kind -> (fn, default priority, max concurrent or None)
+        self._wake = threading.Event()
+        self._started = False
+        self._logs = {}  # job id -> EventLog (shared_events=False)
+        self._logs_lock = threading.Lock()
+
+        with state.transaction() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL,
+                    worker TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at)")
+
+    def register(self, kind, fn, priority=50, max_concurrent=None):
+        """fn(job) -> JSON-serializable result. Raise to fail the job."""
+        self._kinds[kind] = (fn, priority, max_concurrent)
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        for i in range(self.max_running):
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+        threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+
+    # --- Submitting and inspecting ---
+
+    def submit(self, kind, params=None, priority=None, db=None):
+        """Queues a job and returns its record. Pass db to submit inside a caller's transaction."""
+        if kind not in self._kinds:
+            raise ValueError(f"Unknown job kind: {kind}")
+        queued = self.state.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'", db=db).fetchone()[0]
+        if queued >= self.max_queued:
+            raise QueueFull(f"{queued} jobs already queued")
+
+        job_id = uuid.uuid4().hex[:16]
+        priority = self._kinds[kind][1] if priority is None else int(priority)
+        self.state.execute(
+            "INSERT INTO jobs (id, kind, params, priority, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+            (job_id, kind, json.dumps(params or {}), priority, time.time()), db=db
+        )
+        print(f"📥 Job {job_id} queued ({kind}, priority {priority})")
+        metrics.inc("bedrock_jobs_submitted_total", kind=kind)
+        self._wake.set()
+        return self.get(job_id, db=db)
+
+    def get(self, job_id, db=None):
+        row = self.state.execute("SELECT * FROM jobs WHERE id = ?", (job_id,), db=db).fetchone()
+        return self._record(row) if row else None
+
+    def list(self, kind=None, status=None, limit=50):
+        sql, params = "SELECT * FROM jobs WHERE 1=1", []
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(int(limit))
+        return [self._record(row) for row in self.state.execute(sql, params).fetchall()]
+
+    def is_active(self, job_id):
+        job = self.get(job_id)
+        return job is not None and job["status"] in ACTIVE
+
+    def cancel(self, job_id):
+        """Queued jobs are cancelled right away; running ones at their next progress report."""
+        with self.state.transaction() as db:
+            job = self.get(job_id, db=db)
+            if job is None or job["status"] not in ACTIVE:
+                return job
+            if job["status"] == "queued":
+                db.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ?", (time.time(), job_id))
+            else:
+                db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        if job["status"] == "queued":
+            self._finish_events(job_id, "cancelled")
+        return self.get(job_id)
+
+    def events(self, job_id):
+        """The job's event stream, for followers."""
+        if self.shared_events:
+            return SharedEventLog(self.state, f"job:{job_id}")
+        with self._logs_lock:
+            log = self._logs.get(job_id)
+        if log is None:
+            job = self.get(job_id)
+            if job is not None and job["status"] in FINISHED:
+                # Finished before this process started: only the outcome is known
+                log = EventLog()
+                started, finished = job["started_at"], job["finished_at"]
+                log.append({
+                    "done": True, "job_id": job_id, "status": job["status"],
+                    "duration": round(finished - started, 2) if started and finished else None,
+                    "result": job["result"], "error": job["error"]
+                })
+                log.close()
+                return log
+        return self._log(job_id)
+
+    def _log(self, job_id):
+        if self.shared_events:
+            return SharedEventLog(self.state, f"job:{job_id}")
+        with self._logs_lock:
+            log = self._logs.get(job_id)
+            if log is None:
+                log = self._logs[job_id] = EventLog()
+            return log
+
+    def stats(self):
+        rows = self.state.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status").fetchall()
+        kinds = {}
+        for kind, status, count in rows:
+            kinds.setdefault(kind, {})[status] = count
+        return {
+            "max_running": self.max_running,
+            "max_queued": self.max_queued,
+            "queued": sum(c.get("queued", 0) for c in kinds.values()),
+            "running": sum(c.get("running", 0) for c in kinds.values()),
+            "kinds": kinds
+        }
+
+    @staticmethod
+    def _record(row):
+        keys = ("id", "kind", "params", "priority", "status", "progress", "result", "error",
+                "created_at", "started_at", "finished_at", "heartbeat_at", "worker", "cancel_requested")
+        job = dict(zip(keys, row))
+        for key in ("params", "progress", "result"):
+            job[key] = json.loads(job[key]) if job[key] is not None else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    # --- Workers ---
+
+    def _claim(self):
+        """Atomically picks the next runnable job (global and per-kind limits permitting)."""
+        with self.state.transaction() as db:
+            running = dict(db.execute("SELECT kind, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY kind").fetchall())
+            if sum(running.values()) >= self.max_running:
+                return None
+            for job_id, kind in db.execute(
+                "SELECT id, kind FROM jobs WHERE status = 'queued' ORDER BY priority, created_at"
+            ).fetchall():
+                if kind not in self._kinds:
+                    continue  # Registered by another process
+                limit = self._kinds[kind][2]
+                if limit is not None and running.get(kind, 0) >= limit:
+                    continue
+                now = time.time()
+                db.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, worker = ? WHERE id = ?",
+                    (now, now, self.worker_id, job_id)
+                )
+                return self.get(job_id, db=db)
+        return None
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"⚠️ Job claim failed: {e}")
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _run(self, row):
+        fn = self._kinds[row["kind"]][0]
+        job = Job(self, row)
+        metrics.observe("bedrock_job_queue_wait_seconds", row["started_at"] - row["created_at"], kind=row["kind"])
+        print(f"🧵 Job {job.id} started ({job.kind})")
+
+        result, error, status = None, None, "completed"
+        try:
+            result = fn(job)
+        except JobCancelled:
+            status = "cancelled"
+        except Exception as e:
+            print(f"❌ Job {job.id} ({job.kind}) failed: {e}")
+            status, error = "failed", str(e)
+
+        duration = time.time() - job.started
+        try:
+            self.state.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result), error, time.time(), job.id)
+            )
+            self._finish_events(job.id, status, duration=duration, result=result, error=error)
+            self._prune()
+        except Exception as e:
+            print(f"⚠️ Job {job.id}: failed to record result: {e}")
+        metrics.inc("bedrock_jobs_finished_total", kind=job.kind, status=status)
+        metrics.observe("bedrock_job_duration_seconds", duration, kind=job.kind)
+        print(f"✅ Job {job.id} {status} ({duration:.1f}s)")
+        self._wake.set()  # A slot opened up
+
+    def _finish_events(self, job_id, status, duration=None, result=None, error=None):
+        events = self._log(job_id)
+        events.append({
+            "done": True,
+            "job_id": job_id,
+            "status": status,
+            "duration": round(duration, 2) if duration is not None else None,
+            "result": result,
+            "error": error
+        })
+        events.close()
+
+    def _heartbeat(self):
+        while True:
+            try:
+                now = time.time()
+                self.state.execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE worker = ? AND status = 'running'", (now, self.worker_id)
+                )
+                self._recover(now)
+            except Exception as e:
+                print(f"⚠️ Job heartbeat failed: {e}")
+            time.sleep(self.heartbeat)
+
+    def _recover(self, now):
+        """Marks running jobs whose process stopped heartbeating (crash, restart) as interrupted."""
+        with self.state.transaction() as db:
+            lost = [r[0] for r in db.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND heartbeat_at < ?", (now - 6 * self.heartbeat,)
+            ).fetchall()]
+            for job_id in lost:
+                db.execute(
+                    "UPDATE jobs SET status = 'interrupted', error = 'worker process stopped', finished_at = ? WHERE id = ?",
+                    (now, job_id)
+                )
+        for job_id in lost:
+            print(f"⚠️ Job {job_id} interrupted (its worker process stopped)")
+            self._finish_events(job_id, "interrupted", error="worker process stopped")
+
+    def _prune(self):
+        """Drops the oldest finished jobs (and their event streams) beyond the retention limit."""
+        placeholders = ",".join("?" * len(FINISHED))
+        old = [r[0] for r in self.state.execute(
+            f"SELECT id FROM jobs WHERE status IN ({placeholders}) ORDER BY finished_at DESC LIMIT -1 OFFSET ?",
+            (*FINISHED, self.retention)
+        ).fetchall()]
+        for job_id in old:
+            self.state.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self.state.delete_stream(f"job:{job_id}")
+            with self._logs_lock:
+                self._logs.pop(job_id, None)
+
+
+def run_script(job, argv, cwd=None):
+    """Runs a script in a child process, publishing each output line as progress.
+    Cancelling the job terminates the process."""
+    proc = subprocess.Popen(
+        [sys.executable, "-u", *argv], cwd=cwd,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1
+    )
+    last_line = ""
+    try:
+        for line in proc.stdout:
+            line = line.rstrip()
+            if line:
+                last_line = line
+                job.progress(line)
+        returncode = proc.wait()
+    except BaseException:
+        proc.terminate()
+        proc.wait()
+        raise
+    if returncode != 0:
+        raise RuntimeError(f"{os.path.basename(argv[0])} exited with {returncode}: {last_line}")
+    return {"returncode": returncode}
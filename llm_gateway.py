@@ -0,0 +1,372 @@
+"""
+LLM Gateway
+Single entry point for every Ollama call (bedrock_api, chat_api, mcp_chat, bedrock_agents)
+
+- One pooled client per host, so connections over the tunnel are reused
+- Per-model concurrency limits, so a Mac Studio is never asked to run more
+  heavy generations at once than it can hold in memory (enforced with lock files,
+  so the limit holds across gunicorn workers and every other process on this host)
+- Retries with jittered exponential backoff on connection failures
+- Identical in-flight requests are merged into a single upstream call
+- A per-host circuit breaker fails calls immediately while a host is unreachable
+- Call latency is measured here and nowhere else
+"""
+
+import os
+import json
+import time
+import fcntl
+import random
+import tempfile
+import hashlib
+import threading
+from contextlib import contextmanager
+
+import metrics
+import circuit_breaker
+
+import httpx
+import ollama
+
+# Default host (callers with their own host setting pass it explicitly)
+DEFAULT_HOST = os.getenv("OLLAMA_HOST", "http://host.docker.internal:11434")
+
+# Max simultaneous generations per model on one host.
+# Big models get one slot so a second caller queues instead of forcing a swap.
+MODEL_CONCURRENCY = {
+    "llama3.3": 1,
+    "qwen2.5-coder:32b": 1,
+    "gemma2:27b": 2,
+}
+DEFAULT_CONCURRENCY = int(os.getenv("LLM_DEFAULT_CONCURRENCY", "4"))
+
+# Override via env, e.g. LLM_MODEL_CONCURRENCY="llama3.3=2,qwen=8"
+for _entry in os.getenv("LLM_MODEL_CONCURRENCY", "").split(","):
+    if "=" in _entry:
+        _model, _limit = _entry.rsplit("=", 1)
+        MODEL_CONCURRENCY[_model.strip()] = int(_limit)
+
+# How long a caller waits for a free model slot before giving up
+SLOT_TIMEOUT = float(os.getenv("LLM_SLOT_TIMEOUT", "300"))
+
+# Slot lock files, shared by every process on this host that calls through the gateway
+SLOT_DIR = os.getenv("LLM_SLOT_DIR", os.path.join(tempfile.gettempdir(), "llm_gateway_slots"))
+SLOT_POLL_INTERVAL = 0.05
+
+# Retry policy (connection failures only - a generation that started is never replayed)
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = 8.0
+
+RETRYABLE_ERRORS = (
+    ConnectionError,
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.RemoteProtocolError,
+)
+
+
+class GatewayBusyError(RuntimeError):
+    """Raised when no slot for a model frees up within SLOT_TIMEOUT."""
+
+
+_lock = threading.Lock()
+_clients = {}      # host -> ollama.Client
+_slots = {}        # (host, model) -> _Slots
+_in_flight = {}    # request key -> _Flight
+_stats = {}        # model -> counters
+
+
+class _Slots:
+    """Cross-process counting semaphore: `limit` lock files, a slot is held by flocking one.
+    A process that dies releases its slots with its file descriptors."""
+
+    def __init__(self, host, model, limit):
+        name = hashlib.sha256(f"{host}|{model}".encode()).hexdigest()[:16]
+        self.paths = [os.path.join(SLOT_DIR, f"{name}-{i}.lock") for i in range(limit)]
+        self.limit = limit
+        self.in_use = 0  # Held by this process
+
+    def acquire(self, timeout):
+        """Returns the held lock file, or None after timeout."""
+        deadline = time.time() + timeout
+        while True:
+            for path in self.paths:
+                f = open(path, "a")
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    f.close()
+                    continue
+                with _lock:
+                    self.in_use += 1
+                return f
+            if time.time() >= deadline:
+                return None
+            time.sleep(SLOT_POLL_INTERVAL)
+
+    def release(self, f):
+        with _lock:
+            self.in_use -= 1
+        f.close()  # Drops the lock
+
+
+class _Flight:
+    """A running upstream call that identical requests can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+def get_client(host=None):
+    """Returns the shared (connection-pooled) Ollama client for a host."""
+    host = host or DEFAULT_HOST
+    with _lock:
+        client = _clients.get(host)
+        if client is None:
+            client = ollama.Client(host=host)
+            _clients[host] = client
+        return client
+
+
+def _get_slot(host, model):
+    key = (host, model)
+    with _lock:
+        slot = _slots.get(key)
+        if slot is None:
+            os.makedirs(SLOT_DIR, exist_ok=True)
+            slot = _Slots(host, model, MODEL_CONCURRENCY.get(model, DEFAULT_CONCURRENCY))
+            _slots[key] = slot
+        return slot
+
+
+@contextmanager
+def _model_slot(host, model):
+    slot = _get_slot(host, model)
+    held = slot.acquire(timeout=SLOT_TIMEOUT)
+    if held is None:
+        raise GatewayBusyError(f"No free slot for {model} on {host} after {SLOT_TIMEOUT}s")
+    try:
+        yield
+    finally:
+        slot.release(held)
+
+
+def _backoff(attempt):
+    """Full-jitter exponential backoff."""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt))
+    time.sleep(random.uniform(0, delay))
+
+
+def _record(model, seconds=None, error=False, retried=False, merged=False, cancelled=False):
+    with _lock:
+        s = _stats.setdefault(model, {
+            "calls": 0, "errors": 0, "retries": 0, "merged": 0, "cancelled": 0,
+            "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0
+        })
+        if merged:
+            s["merged"] += 1
+            return
+        if retried:
+            s["retries"] += 1
+            return
+        s["calls"] += 1
+        if error:
+            s["errors"] += 1
+        if cancelled:
+            s["cancelled"] += 1
+        if seconds is not None:
+            s["total_seconds"] += seconds
+            s["last_seconds"] = seconds
+            s["max_seconds"] = max(s["max_seconds"], seconds)
+
+
+def _request_key(host, model, messages, kwargs):
+    raw = json.dumps([host, model, messages, kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _call_with_retries(host, model, fn):
+    # The breaker sees one outcome per logical call, after any retries
+    with circuit_breaker.get(host).call():
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except RETRYABLE_ERRORS as e:
+                if attempt >= MAX_RETRIES:
+                    raise
+                print(f"⚠️ LLM Gateway: {model} @ {host} unreachable ({e}), retrying...")
+                _record(model, retried=True)
+                _backoff(attempt)
+                attempt += 1
+
+
+def _observe_model_time(model, response):
+    # Ollama's own timing (nanoseconds): the rest of the upstream latency is tunnel + queueing
+    if response and response.get("total_duration"):
+        metrics.observe("bedrock_upstream_model_seconds", response["total_duration"] / 1e9,
+                        upstream="ollama_chat", model=model)
+
+
+def _chat_once(host, model, messages, kwargs):
+    circuit_breaker.get(host).check()  # Don't queue for a slot on a host that is down
+    client = get_client(host)
+    start = time.time()
+    called = None
+    try:
+        with _model_slot(host, model):
+            called = time.time()
+            metrics.observe("bedrock_llm_slot_wait_seconds", called - start, model=model)
+            response = _call_with_retries(
+                host, model,
+                lambda: client.chat(model=model, messages=messages, **kwargs)
+            )
+    except Exception:
+        _record(model, time.time() - start, error=True)
+        if called is not None:
+            metrics.observe_upstream("ollama_chat", time.time() - called, error=True, model=model)
+        raise
+    _record(model, time.time() - start)
+    metrics.observe_upstream("ollama_chat", time.time() - called, model=model)
+    _observe_model_time(model, response)
+    return response
+
+
+def _chat_stream(host, model, messages, kwargs):
+    circuit_breaker.get(host).check()
+    client = get_client(host)
+    start = time.time()
+    error = False
+    cancelled = False
+    stream = None
+    called = None
+    try:
+        with _model_slot(host, model):
+            called = time.time()
+            metrics.observe("bedrock_llm_slot_wait_seconds", called - start, model=model)
+
+            # The connection opens on the first chunk, so that is what gets retried
+            def open_stream():
+                it = client.chat(model=model, messages=messages, stream=True, **kwargs)
+                try:
+                    return it, next(it)
+                except StopIteration:
+                    return it, None
+
+            stream, first = _call_with_retries(host, model, open_stream)
+            metrics.observe("bedrock_upstream_first_chunk_seconds", time.time() - called,
+                            upstream="ollama_chat", model=model)
+            if first is not None:
+                yield first
+                for chunk in stream:
+                    if chunk.get("done"):
+                        _observe_model_time(model, chunk)
+                    yield chunk
+    except GeneratorExit:
+        # Caller stopped iterating (e.g. the client disconnected): closing the
+        # HTTP stream below makes Ollama abort the generation
+        cancelled = True
+        raise
+    except Exception:
+        error = True
+        raise
+    finally:
+        if stream is not None:
+            stream.close()
+        _record(model, time.time() - start, error=error, cancelled=cancelled)
+        if called is not None:
+            metrics.observe_upstream("ollama_chat", time.time() - called, error=error, model=model)
+
+
+def chat(model, messages, host=None, stream=False, **kwargs):
+    """Ollama chat through the gateway.
+
+    Accepts the same keyword arguments as ollama.Client.chat (format, tools, options...).
+    With stream=True returns an iterator of chunks; the model slot is held until it is
+    exhausted or closed.
+    """
+    host = host or DEFAULT_HOST
+
+    if stream:
+        return _chat_stream(host, model, messages, kwargs)
+
+    # Merge identical in-flight requests into one upstream call
+    key = _request_key(host, model, messages, kwargs)
+    with _lock:
+        flight = _in_flight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight()
+            _in_flight[key] = flight
+        else:
+            flight.waiters += 1
+
+    if not leader:
+        _record(model, merged=True)
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = _chat_once(host, model, messages, kwargs)
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _lock:
+            _in_flight.pop(key, None)
+        flight.done.set()
+
+
+def embed(model, input, host=None, **kwargs):
+    """Ollama embeddings through the gateway (pooled client, model slot, retries).
+    Returns one vector per input string."""
+    host = host or DEFAULT_HOST
+    circuit_breaker.get(host).check()
+    client = get_client(host)
+    start = time.time()
+    try:
+        with _model_slot(host, model):
+            called = time.time()
+            response = _call_with_retries(
+                host, model,
+                lambda: client.embed(model=model, input=input, **kwargs)
+            )
+    except Exception:
+        _record(model, time.time() - start, error=True)
+        metrics.observe_upstream("ollama_embed", time.time() - start, error=True, model=model)
+        raise
+    _record(model, time.time() - start)
+    metrics.observe_upstream("ollama_embed", time.time() - called, model=model)
+    return response["embeddings"]
+
+
+def get_stats():
+    """Per-model call counts and latency, plus current slot usage (slots held by this process)."""
+    with _lock:
+        models = {}
+        for model, s in _stats.items():
+            entry = dict(s)
+            completed = s["calls"]
+            entry["avg_seconds"] = round(s["total_seconds"] / completed, 3) if completed else 0.0
+            entry["total_seconds"] = round(s["total_seconds"], 3)
+            entry["max_seconds"] = round(s["max_seconds"], 3)
+            entry["last_seconds"] = round(s["last_seconds"], 3)
+            models[model] = entry
+
+        slots = {}
+        for (host, model), slot in _slots.items():
+            slots[f"{model}@{host}"] = {"limit": slot.limit, "in_use": slot.in_use}
+
+        return {
+            "hosts": sorted(_clients.keys()),
+            "models": models,
+            "slots": slots,
+            "in_flight": len(_in_flight)
+        }
@@ -10,12 +10,19 @@ Tools:
 """
 
 import streamlit as st
+try:
+    from streamlit.runtime.scriptrunner_utils.exceptions import StopException, RerunException
+except ImportError:  # Older Streamlit
+    from streamlit.runtime.scriptrunner import StopException, RerunException
 import time
 import requests
 import json
 import os
 from datetime import datetime
-from ollama import Client
+import llm_gateway
+import circuit_breaker
+from shared_state import SharedState
+from stream_tracker import StreamTracker
 
 # === CONFIGURATION ===
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,6 +31,9 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://host.docker.internal:11434")
 M1_OLLAMA = os.getenv("M1_OLLAMA", "http://host.docker.internal:12434")
 
+# Shared with bedrock_api, which reports abandoned-stream stats at /api/streams/stats
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(SCRIPT_DIR, "bedrock_agents", "data"))
+
 # Models
 TOOL_MODEL = "qwen2.5:14b"  # Fast model for tool-calling decisions
 SYNTH_MODEL = "gemma2:27b"  # Fast model for synthesizing responses
@@ -287,6 +297,12 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_stream_tracker():
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return StreamTracker(SharedState(os.path.join(STATE_DIR, "shared_state.sqlite3")))
+
+
 def main():
     # === SIDEBAR ===
     # Logo loading disabled to avoid numpy conflicts in some environments
@@ -301,9 +317,10 @@ def main():
     st.sidebar.markdown("---")
     st.sidebar.subheader("System Status")
 
-    # Check M3 (tool model)
+    # Check M3 (tool model); shares the gateway's breaker, so an open circuit skips the request
     try:
-        r = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=2)
+        with circuit_breaker.get(OLLAMA_HOST).call():
+            r = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=2)
         if r.status_code == 200:
             st.sidebar.success("🟢 M3 Ultra (Tool Agent)")
         else:
@@ -392,10 +409,10 @@ How can I help you today?"""
                     # Call Llama 3.3 with tools
                     status.write("📤 Sending to Llama 3.3...")
 
-                    client = Client(host=OLLAMA_HOST)
-                    response = client.chat(
+                    response = llm_gateway.chat(
                         model=TOOL_MODEL,
                         messages=[{"role": "user", "content": prompt}],
+                        host=OLLAMA_HOST,
                         tools=TOOLS
                     )
 
@@ -449,18 +466,31 @@ Provide a clear, well-formatted response that directly answers the user's questi
 
                         # Stream the response token by token
                         final_content = ""
-                        stream = client.chat(
+                        token_count = 0
+                        stream_tracker = get_stream_tracker()
+                        stream = llm_gateway.chat(
                             model=SYNTH_MODEL,
                             messages=[{"role": "user", "content": synthesis_prompt}],
+                            host=OLLAMA_HOST,
                             stream=True
                         )
 
-                        for chunk in stream:
-                            token = chunk.get("message", {}).get("content", "")
-                            if not token and hasattr(chunk.get("message", {}), "content"):
-                                token = chunk["message"].content
-                            final_content += token
-                            response_placeholder.markdown(final_content + "▌")
+                        try:
+                            for chunk in stream:
+                                token = chunk.get("message", {}).get("content", "")
+                                if not token and hasattr(chunk.get("message", {}), "content"):
+                                    token = chunk["message"].content
+                                final_content += token
+                                token_count += 1
+                                response_placeholder.markdown(final_content + "▌")
+                            stream_tracker.completed("mcp_chat", token_count)
+                        except (StopException, RerunException, GeneratorExit):
+                            # Streamlit stops a script whose browser went away (or was rerun) by raising
+                            # at the next st.* call - don't let Ollama finish for nobody
+                            stream_tracker.abandoned("mcp_chat", token_count)
+                            raise
+                        finally:
+                            stream.close()
 
                         # Final update without cursor
                         response_placeholder.markdown(final_content)
@@ -0,0 +1,133 @@
+"""
+Metrics
+In-process counters and latency histograms, rendered in the Prometheus text format.
+
+- Per Flask route: request counts (by status), 5xx/exception counts and latency
+- Per upstream (ollama_chat, gemini_stream, comfyui_*, tts, yfinance, rss): call latency,
+  errors and, for streams, time to first chunk
+- Ollama reports its own generation time, so model time can be told apart from the tunnel
+
+Each process keeps its own registry (under gunicorn, every worker reports its own series).
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+# Seconds. LLM generations and ComfyUI renders run into minutes, so the top buckets are wide.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_help = {
+    "bedrock_http_requests_total": ("counter", "HTTP requests by route, method and status"),
+    "bedrock_http_request_errors_total": ("counter", "HTTP requests that raised or returned 5xx"),
+    "bedrock_http_request_duration_seconds": ("histogram", "Time until the response started (streams: until the first byte)"),
+    "bedrock_upstream_calls_total": ("counter", "Calls to upstream services"),
+    "bedrock_upstream_errors_total": ("counter", "Failed calls to upstream services"),
+    "bedrock_upstream_duration_seconds": ("histogram", "Upstream call latency, including the tunnel"),
+    "bedrock_upstream_first_chunk_seconds": ("histogram", "Streaming upstreams: time until the first chunk"),
+    "bedrock_upstream_model_seconds": ("histogram", "Generation time reported by the model server itself"),
+    "bedrock_llm_slot_wait_seconds": ("histogram", "Time spent waiting for a gateway model slot"),
+    "bedrock_chat_cache_total": ("counter", "/api/chat response cache lookups by result (exact, semantic, miss)"),
+    "bedrock_jobs_submitted_total": ("counter", "Background jobs queued, by kind"),
+    "bedrock_jobs_finished_total": ("counter", "Background jobs finished, by kind and status"),
+    "bedrock_job_queue_wait_seconds": ("histogram", "Time a background job waited in the queue"),
+    "bedrock_job_duration_seconds": ("histogram", "Background job run time"),
+    "bedrock_claims_submitted_total": ("counter", "Claim submissions by result (accepted, duplicate)"),
+    "bedrock_claims_written_total": ("counter", "Claims written to the database"),
+    "bedrock_claims_batches_total": ("counter", "Claim database write batches (transactions)"),
+}
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, seconds, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+                break
+        h[-2] += seconds
+        h[-1] += 1
+
+
+def observe_request(route, method, status, seconds, error=False):
+    inc("bedrock_http_requests_total", route=route, method=method, status=str(status))
+    if error or status >= 500:
+        inc("bedrock_http_request_errors_total", route=route, method=method)
+    observe("bedrock_http_request_duration_seconds", seconds, route=route, method=method)
+
+
+def observe_upstream(upstream, seconds, error=False, **labels):
+    inc("bedrock_upstream_calls_total", upstream=upstream, **labels)
+    if error:
+        inc("bedrock_upstream_errors_total", upstream=upstream, **labels)
+    observe("bedrock_upstream_duration_seconds", seconds, upstream=upstream, **labels)
+
+
+@contextmanager
+def timed(upstream, **labels):
+    """Times an upstream call; exceptions are counted as errors and re-raised."""
+    start = time.time()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        observe_upstream(upstream, time.time() - start, error=error, **labels)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def render():
+    """All series in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(h) for key, h in _histograms.items()}
+
+    lines = []
+    for name in sorted({n for n, _ in counters} | {n for n, _ in histograms}):
+        kind, text = _help.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for (n, labels), h in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, h):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {h[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {round(h[-2], 6)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {h[-1]}")
+        else:
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
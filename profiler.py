@@ -0,0 +1,193 @@
+"""
+Request Profiler
+Opt-in sampling profiler for bedrock_api requests.
+
+- One background thread samples the stacks of the request threads being profiled
+  (wall clock, so time blocked on yfinance, RSS or Ollama shows up as well as CPU)
+- Each profile is written as collapsed stacks (flamegraph.pl / speedscope) and as a pstats
+  file built from the same samples (snakeviz, pstats.Stats), plus a small JSON summary
+- Only the newest `keep` profiles are kept
+- Costs nothing on requests that are not profiled: the sampler only runs while one is
+"""
+
+import os
+import sys
+import json
+import time
+import marshal
+import threading
+from collections import Counter, defaultdict
+
+
+def _frame_key(frame):
+    code = frame.f_code
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+class _Session:
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.started = time.time()
+        self.stacks = Counter()  # root-to-leaf tuple of frame keys -> samples
+
+
+class Profiler:
+    def __init__(self, directory, interval=0.005, keep=200):
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+
+        self._lock = threading.Lock()
+        self._sessions = {}  # thread id -> _Session
+        self._active = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """Starts profiling the calling thread. Returns a session for stop()."""
+        session = _Session(threading.get_ident())
+        with self._lock:
+            self._sessions[session.thread_id] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+                self._thread.start()
+        self._active.set()
+        return session
+
+    def stop(self, session, route, method, status):
+        """Stops sampling and writes the profile. Returns its summary (None if nothing was sampled)."""
+        duration = time.time() - session.started
+        with self._lock:
+            self._sessions.pop(session.thread_id, None)
+            if not self._sessions:
+                self._active.clear()
+        if not session.stacks:
+            return None
+        try:
+            return self._write(session, route, method, status, duration)
+        except Exception as e:
+            print(f"⚠️ Profiler: failed to write profile: {e}")
+            return None
+
+    def _sample_loop(self):
+        while True:
+            self._active.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, session in self._sessions.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_key(frame))
+                        frame = frame.f_back
+                    session.stacks[tuple(reversed(stack))] += 1
+            del frames
+            time.sleep(self.interval)
+
+    # --- Output ---
+
+    def _write(self, session, route, method, status, duration):
+        slug = route.strip("/").replace("/", "_").replace("<", "").replace(">", "") or "root"
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(session.started)) + f"{session.started % 1:.3f}"[1:]
+        profile_id = f"{stamp}-{os.getpid()}-{session.thread_id % 100000}-{slug}"
+        base = os.path.join(self.directory, profile_id)
+
+        with open(base + ".collapsed", "w") as f:
+            for stack, count in session.stacks.most_common():
+                f.write(";".join(f"{name} ({os.path.basename(filename)}:{line})" for filename, line, name in stack))
+                f.write(f" {count}\n")
+
+        # The sampler wakes late under GIL contention, so weight samples by the time they really covered
+        samples = sum(session.stacks.values())
+        with open(base + ".pstats", "wb") as f:
+            marshal.dump(self._pstats(session.stacks, duration / samples), f)
+
+        summary = {
+            "id": profile_id,
+            "route": route,
+            "method": method,
+            "status": status,
+            "duration_ms": round(duration * 1000, 1),
+            "samples": samples,
+            "created_at": session.started,
+            "pid": os.getpid(),
+            "top": self._top(session.stacks, samples)
+        }
+        with open(base + ".json", "w") as f:
+            json.dump(summary, f)
+
+        self._rotate()
+        print(f"🔬 Profiled {method} {route}: {summary['duration_ms']}ms, {samples} samples -> {profile_id}")
+        return summary
+
+    @staticmethod
+    def _pstats(stacks, t):
+        """pstats-compatible table from samples: calls are sample counts, times are samples x t seconds."""
+        self_time = Counter()
+        total = Counter()
+        callers = defaultdict(Counter)
+        for stack, count in stacks.items():
+            self_time[stack[-1]] += count
+            for key in set(stack):  # Recursion counts once per sample
+                total[key] += count
+            for caller, callee in set(zip(stack, stack[1:])):
+                callers[callee][caller] += count
+
+        stats = {}
+        for key, inclusive in total.items():
+            stats[key] = (
+                inclusive, inclusive, self_time[key] * t, inclusive * t,
+                {caller: (n, n, 0.0, n * t) for caller, n in callers[key].items()}
+            )
+        return stats
+
+    @staticmethod
+    def _top(stacks, samples, limit=10):
+        """Functions with the most self time, as a quick answer without opening the files."""
+        self_time = Counter()
+        for stack, count in stacks.items():
+            self_time[stack[-1]] += count
+        return [
+            {"function": f"{name} ({os.path.basename(filename)}:{line})", "self_pct": round(100 * n / samples, 1)}
+            for (filename, line, name), n in self_time.most_common(limit)
+        ]
+
+    def _rotate(self):
+        summaries = sorted(f for f in os.listdir(self.directory) if f.endswith(".json"))
+        for name in summaries[:-self.keep] if len(summaries) > self.keep else []:
+            base = os.path.join(self.directory, name[:-5])
+            for ext in (".json", ".collapsed", ".pstats"):
+                try:
+                    os.remove(base + ext)
+                except FileNotFoundError:
+                    pass
+
+    # --- Index ---
+
+    def list(self, route=None, sort="recent", limit=50):
+        """Summaries of stored profiles (newest first, or slowest first with sort="duration")."""
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue  # Rotated away or still being written
+            if route and summary["route"] != route:
+                continue
+            profiles.append(summary)
+
+        key = "duration_ms" if sort == "duration" else "created_at"
+        profiles.sort(key=lambda p: p[key], reverse=True)
+        return profiles[:limit]
+
+    def path(self, profile_id, ext):
+        """File path of a stored profile, or None (also rejects anything that isn't a plain id)."""
+        if ext not in ("collapsed", "pstats", "json") or os.path.basename(profile_id) != profile_id:
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{ext}")
+        return path if os.path.exists(path) else None
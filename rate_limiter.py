@@ -0,0 +1,186 @@
+"""
+Sliding-Window Rate Limiter
+Constant time and memory per key (two counters + timestamps), with idle keys evicted periodically.
+SharedSlidingWindowLimiter keeps the same counters in SQLite for multi-worker serving.
+"""
+
+import time
+import threading
+
+
+class _Window:
+    __slots__ = ("start", "current", "previous", "last_seen")
+
+    def __init__(self, start):
+        self.start = start
+        self.current = 0
+        self.previous = 0
+        self.last_seen = start
+
+
+class SlidingWindowLimiter:
+    """Sliding-window counter: approximates the request count over the trailing window by
+    weighting the previous fixed window's count by how much of it still overlaps."""
+
+    def __init__(self, limit, window_seconds, sweep_interval=60):
+        self.limit = limit
+        self.window = float(window_seconds)
+        self.sweep_interval = sweep_interval
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def allow(self, key, now=None):
+        """Counts a hit for key. Returns True if it is within the limit."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+
+            w = self._keys.get(key)
+            if w is None:
+                w = self._keys[key] = _Window(now)
+            else:
+                elapsed = now - w.start
+                if elapsed >= self.window:
+                    # Roll forward; anything older than two windows no longer counts
+                    w.previous = w.current if elapsed < 2 * self.window else 0
+                    w.current = 0
+                    w.start = now - (elapsed % self.window)
+            w.last_seen = now
+
+            overlap = 1.0 - (now - w.start) / self.window
+            if w.previous * overlap + w.current >= self.limit:
+                self.rejected += 1
+                return False
+
+            w.current += 1
+            self.allowed += 1
+            return True
+
+    def _sweep(self, now):
+        # A key untouched for two windows has a zero count, so dropping it changes nothing
+        idle = [k for k, w in self._keys.items() if now - w.last_seen >= 2 * self.window]
+        for k in idle:
+            del self._keys[k]
+        self.evicted += len(idle)
+        self._last_sweep = now
+
+    def __len__(self):
+        return len(self._keys)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "window_seconds": self.window,
+                "tracked_keys": len(self._keys),
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+                "evicted": self.evicted
+            }
+
+
+class SharedSlidingWindowLimiter:
+    """Same algorithm as SlidingWindowLimiter, with counters in a SharedState SQLite
+    table so every worker process enforces one combined limit."""
+
+    def __init__(self, name, limit, window_seconds, state, sweep_interval=60):
+        self.name = name
+        self.limit = limit
+        self.window = float(window_seconds)
+        self.state = state
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.time()
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+        with state.transaction() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    name TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    start REAL NOT NULL,
+                    current INTEGER NOT NULL,
+                    previous INTEGER NOT NULL,
+                    last_seen REAL NOT NULL,
+                    PRIMARY KEY (name, key)
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_rate_limits_seen ON rate_limits (name, last_seen)")
+
+    def allow(self, key, now=None):
+        now = time.time() if now is None else now
+        with self.state.transaction() as db:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = now
+                cursor = db.execute(
+                    "DELETE FROM rate_limits WHERE name = ? AND last_seen < ?", (self.name, now - 2 * self.window)
+                )
+                self.evicted += cursor.rowcount
+
+            row = db.execute(
+                "SELECT start, current, previous FROM rate_limits WHERE name = ? AND key = ?", (self.name, key)
+            ).fetchone()
+            start, current, previous = row if row else (now, 0, 0)
+
+            elapsed = now - start
+            if elapsed >= self.window:
+                previous = current if elapsed < 2 * self.window else 0
+                current = 0
+                start = now - (elapsed % self.window)
+
+            overlap = 1.0 - (now - start) / self.window
+            allowed = previous * overlap + current < self.limit
+            if allowed:
+                current += 1
+
+            db.execute(
+                "INSERT OR REPLACE INTO rate_limits (name, key, start, current, previous, last_seen) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.name, key, start, current, previous, now)
+            )
+
+        if allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return allowed
+
+    def stats(self):
+        tracked = self.state._conn().execute(
+            "SELECT COUNT(*) FROM rate_limits WHERE name = ?", (self.name,)
+        ).fetchone()[0]
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window,
+            "tracked_keys": tracked,
+            "allowed": self.allowed,  # This worker only
+            "rejected": self.rejected,
+            "evicted": self.evicted
+        }
+
+
+class RateLimits:
+    """Named limiters, e.g. RateLimits({"public_chat": (20, 3600), "tts": (60, 3600)}).
+    Pass a SharedState to enforce the limits across worker processes."""
+
+    def __init__(self, limits, sweep_interval=60, shared_state=None):
+        if shared_state is not None:
+            self.limiters = {
+                name: SharedSlidingWindowLimiter(name, limit, window, shared_state, sweep_interval=sweep_interval)
+                for name, (limit, window) in limits.items()
+            }
+        else:
+            self.limiters = {
+                name: SlidingWindowLimiter(limit, window, sweep_interval=sweep_interval)
+                for name, (limit, window) in limits.items()
+            }
+
+    def allow(self, name, key):
+        return self.limiters[name].allow(key)
+
+    def stats(self):
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
@@ -0,0 +1,165 @@
+"""
+Response Cache
+Caches chat replies so repeated questions skip the LLM entirely.
+
+- Exact tier: key is the normalized conversation (system prompt, history, message)
+- Semantic tier (optional): a near-duplicate message with the same system prompt and
+  history is served if its embedding is within the similarity threshold
+- Entries expire after a TTL; the least recently used are evicted beyond max_entries
+"""
+
+import re
+import json
+import math
+import time
+import hashlib
+import operator
+import threading
+from collections import OrderedDict
+
+
+def normalize(text):
+    """Case, whitespace and trailing punctuation don't change the answer."""
+    return re.sub(r"\s+", " ", text).strip().lower().rstrip("?!. ")
+
+
+def _digest(obj):
+    return hashlib.sha256(json.dumps(obj, separators=(",", ":")).encode()).hexdigest()
+
+
+def _unit(vector):
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return tuple(x / norm for x in vector)
+
+
+class _Entry:
+    __slots__ = ("reply", "created", "partition", "vector")
+
+    def __init__(self, reply, created, partition, vector):
+        self.reply = reply
+        self.created = created
+        self.partition = partition
+        self.vector = vector
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1000, ttl_seconds=3600, embed=None, similarity=0.92):
+        # embed(text) -> vector enables the semantic tier (None = exact matches only)
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.embed = embed
+        self.similarity = similarity
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # exact key -> _Entry (least recently used first)
+        self._partitions = {}          # context digest -> {exact key: unit vector}
+        self._vectors = OrderedDict()  # normalized message -> unit vector (reused by put)
+
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+        self.evictions = 0
+        self.embed_errors = 0
+
+    @staticmethod
+    def _keys(messages):
+        """(exact key, context partition, normalized message) for a conversation ending in a user turn."""
+        context = [[m["role"], normalize(m["content"])] for m in messages[:-1]]
+        message = normalize(messages[-1]["content"])
+        partition = _digest(context)
+        return _digest([partition, message]), partition, message
+
+    def get(self, messages):
+        """Returns (reply, tier) with tier "exact" or "semantic", or (None, None) on a miss."""
+        key, partition, message = self._keys(messages)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits["exact"] += 1
+                return entry.reply, "exact"
+            if entry is not None:
+                self._remove(key)
+            candidates = list(self._partitions.get(partition, {}).items())
+
+        if self.embed is not None and candidates:
+            vector = self._vector(message)
+            if vector is not None:
+                best_key, best_score = None, self.similarity
+                for candidate_key, candidate in candidates:
+                    score = sum(map(operator.mul, vector, candidate))
+                    if score >= best_score:
+                        best_key, best_score = candidate_key, score
+
+                with self._lock:
+                    entry = self._entries.get(best_key) if best_key else None
+                    if entry is not None and now - entry.created < self.ttl:
+                        self._entries.move_to_end(best_key)
+                        self.hits["semantic"] += 1
+                        return entry.reply, "semantic"
+
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def put(self, messages, reply):
+        key, partition, message = self._keys(messages)
+        vector = self._vector(message) if self.embed is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(reply, time.time(), partition, vector)
+            if vector is not None:
+                self._partitions.setdefault(partition, {})[key] = vector
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _vector(self, message):
+        with self._lock:
+            vector = self._vectors.get(message)
+            if vector is not None:
+                self._vectors.move_to_end(message)
+                return vector
+        try:
+            vector = _unit(self.embed(message))
+        except Exception as e:
+            print(f"⚠️ Response cache: embedding failed ({e}), exact matches only")
+            with self._lock:
+                self.embed_errors += 1
+            return None
+        with self._lock:
+            self._vectors[message] = vector
+            while len(self._vectors) > 256:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        if entry.vector is not None:
+            partition = self._partitions.get(entry.partition)
+            if partition is not None:
+                partition.pop(key, None)
+                if not partition:
+                    del self._partitions[entry.partition]
+
+    def stats(self):
+        with self._lock:
+            hits = self.hits["exact"] + self.hits["semantic"]
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "semantic": self.embed is not None,
+                "similarity": self.similarity,
+                "hits_exact": self.hits["exact"],
+                "hits_semantic": self.hits["semantic"],
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "embed_errors": self.embed_errors
+            }
@@ -0,0 +1,153 @@
+"""
+Session Store
+Bounded in-memory LRU of conversation histories backed by SQLite.
+
+- Writes go through to SQLite, so sessions survive restarts
+- Memory is capped by session count and approximate bytes; least recently used
+  sessions are dropped from memory and reloaded lazily from SQLite on demand
+- Sessions idle longer than the TTL are deleted from both tiers
+- shared=True (multi-worker serving) checks each memory hit against SQLite's
+  updated_at, so a session written by another worker process is reloaded
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class SessionStore:
+    def __init__(self, db_path, namespace="default", max_sessions=500, max_bytes=50 * 1024 * 1024,
+                 ttl_seconds=7 * 24 * 3600, sweep_interval=300, shared=False):
+        self.namespace = namespace
+        self.shared = shared
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.sweep_interval = sweep_interval
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # session_id -> [history, size_bytes, last_access, updated_at]
+        self._memory_bytes = 0
+        self._last_sweep = time.time()
+        self._stats = {"hits": 0, "misses": 0, "disk_loads": 0, "spilled": 0, "expired": 0}
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                namespace TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, session_id)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (namespace, updated_at)")
+        self._db.commit()
+
+    def get(self, session_id):
+        """Returns the session's history list (empty list for a new session)."""
+        now = time.time()
+        with self._lock:
+            self._maybe_sweep(now)
+
+            entry = self._memory.get(session_id)
+            if entry is not None and self.shared and not self._is_current(session_id, entry[3]):
+                self._forget(session_id)  # Updated by another worker
+                entry = None
+            if entry is not None and now - entry[2] <= self.ttl:
+                self._memory.move_to_end(session_id)
+                entry[2] = now
+                self._stats["hits"] += 1
+                return entry[0]
+
+            if entry is not None:
+                self._forget(session_id)  # Expired
+
+            self._stats["misses"] += 1
+            row = self._db.execute(
+                "SELECT data, updated_at FROM sessions WHERE namespace = ? AND session_id = ?",
+                (self.namespace, session_id)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                return []
+
+            self._stats["disk_loads"] += 1
+            history = json.loads(row[0])
+            self._remember(session_id, history, len(row[0]), now, row[1])
+            return history
+
+    def put(self, session_id, history):
+        """Stores the session's history (write-through to SQLite)."""
+        now = time.time()
+        data = json.dumps(history)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (namespace, session_id, data, updated_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, session_id, data, now)
+            )
+            self._db.commit()
+            self._remember(session_id, history, len(data), now, now)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._forget(session_id)
+            self._db.execute("DELETE FROM sessions WHERE namespace = ? AND session_id = ?", (self.namespace, session_id))
+            self._db.commit()
+
+    def _is_current(self, session_id, updated_at):
+        row = self._db.execute(
+            "SELECT updated_at FROM sessions WHERE namespace = ? AND session_id = ?",
+            (self.namespace, session_id)
+        ).fetchone()
+        return row is not None and row[0] == updated_at
+
+    def _remember(self, session_id, history, size, now, updated_at):
+        self._forget(session_id)
+        self._memory[session_id] = [history, size, now, updated_at]
+        self._memory_bytes += size
+
+        # Spill least recently used sessions (they stay in SQLite)
+        while self._memory and (len(self._memory) > self.max_sessions or self._memory_bytes > self.max_bytes):
+            _, (_, old_size, _, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= old_size
+            self._stats["spilled"] += 1
+
+    def _forget(self, session_id):
+        entry = self._memory.pop(session_id, None)
+        if entry is not None:
+            self._memory_bytes -= entry[1]
+
+    def _maybe_sweep(self, now):
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        cutoff = now - self.ttl
+
+        for session_id in [sid for sid, entry in self._memory.items() if entry[2] < cutoff]:
+            self._forget(session_id)
+
+        cursor = self._db.execute(
+            "DELETE FROM sessions WHERE namespace = ? AND updated_at < ?", (self.namespace, cutoff)
+        )
+        self._db.commit()
+        self._stats["expired"] += cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            disk_sessions = self._db.execute(
+                "SELECT COUNT(*) FROM sessions WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "memory_sessions": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "disk_sessions": disk_sessions
+            }
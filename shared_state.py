@@ -0,0 +1,153 @@
+"""
+Shared State
+SQLite-backed state that every bedrock_api worker process sees consistently
+(multi-worker serving mode), plus small file helpers for cross-process safety.
+"""
+
+import os
+import json
+import time
+import fcntl
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+class SharedState:
+    """JSON key/value store and append-only event streams in one SQLite file (WAL mode)."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self.transaction() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS kv (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    stream TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    event TEXT NOT NULL,
+                    PRIMARY KEY (stream, seq)
+                )
+            """)
+
+    def _conn(self):
+        # One connection per thread; WAL lets readers proceed while a writer commits
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Exclusive write transaction (BEGIN IMMEDIATE) for read-modify-write across processes."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def execute(self, sql, params=(), db=None):
+        """Runs one statement (autocommit unless inside a transaction). Returns the cursor."""
+        return (db or self._conn()).execute(sql, params)
+
+    def get(self, key, default=None, db=None):
+        row = (db or self._conn()).execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value, db=None):
+        (db or self._conn()).execute(
+            "INSERT OR REPLACE INTO kv (key, value, updated_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time())
+        )
+
+    def update(self, key, fn, default=None):
+        """Atomically replaces the value with fn(old_value). Returns the new value."""
+        with self.transaction() as db:
+            value = fn(self.get(key, default, db=db))
+            self.set(key, value, db=db)
+            return value
+
+    def append_event(self, stream, event):
+        with self.transaction() as db:
+            seq = db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM events WHERE stream = ?", (stream,)).fetchone()[0]
+            db.execute("INSERT INTO events (stream, seq, event) VALUES (?, ?, ?)", (stream, seq, json.dumps(event)))
+        return seq
+
+    def events_since(self, stream, seq=0):
+        rows = self._conn().execute(
+            "SELECT seq, event FROM events WHERE stream = ? AND seq > ? ORDER BY seq", (stream, seq)
+        ).fetchall()
+        return [(s, json.loads(e)) for s, e in rows]
+
+    def delete_stream(self, stream):
+        self._conn().execute("DELETE FROM events WHERE stream = ?", (stream,))
+
+
+class SharedEventLog:
+    """EventLog (see event_stream.py) whose events live in SharedState, so a subscriber
+    connected to any worker can follow a run started in another."""
+
+    def __init__(self, state, stream, poll_interval=0.5):
+        self.state = state
+        self.stream = stream
+        self.poll_interval = poll_interval
+
+    def append(self, event):
+        self.state.append_event(self.stream, event)
+
+    def close(self):
+        self.state.append_event(self.stream, {"_closed": True})
+
+    def follow(self, heartbeat=15):
+        seq = 0
+        idle = 0.0
+        while True:
+            pending = self.state.events_since(self.stream, seq)
+            for seq, event in pending:
+                if event.get("_closed"):
+                    return
+                yield event
+            if pending:
+                idle = 0.0
+                continue
+            time.sleep(self.poll_interval)
+            idle += self.poll_interval
+            if idle >= heartbeat:
+                idle = 0.0
+                yield None
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock shared by all processes on this host."""
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def atomic_write_json(path, data):
+    """Writes JSON via temp file + rename so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
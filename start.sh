@@ -56,7 +56,12 @@ ESC_PID=$!
 
 # Step 4: Start Bedrock Chat API
 echo "[4/8] Starting Bedrock Chat API..."
-python bedrock_api.py 2>&1 | tee /tmp/bedrock_api.log &
+if [ "${BEDROCK_API_WORKERS:-1}" -gt 1 ]; then
+    # Multi-worker mode: sessions, rate limits and meeting state are shared through SQLite
+    gunicorn -c gunicorn.conf.py bedrock_api:app 2>&1 | tee /tmp/bedrock_api.log &
+else
+    python bedrock_api.py 2>&1 | tee /tmp/bedrock_api.log &
+fi
 API_PID=$!
 
 # Step 5: Pre-create ChromaDB Directories (Critical for Volume Mounts)
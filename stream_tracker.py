@@ -0,0 +1,96 @@
+"""
+Stream Tracker
+Counts streamed generations that finished vs. were abandoned by the client, and estimates
+the tokens saved by cancelling the abandoned ones upstream instead of letting them finish.
+
+The estimate for an abandoned stream is the average completed length for the same source
+minus what had already been generated when the client went away.
+"""
+
+import threading
+
+
+def estimate_tokens(text):
+    """Rough token count for providers that don't report one per chunk (~4 chars per token)."""
+    return len(text) // 4
+
+
+def close_upstream(stream):
+    """Stops an upstream token stream: Ollama iterators (close) and Gemini streaming
+    responses (the underlying gRPC/HTTP iterator is cancelled or closed)."""
+    for target in (stream, getattr(stream, "_iterator", None)):
+        for method in ("cancel", "close"):
+            fn = getattr(target, method, None)
+            if callable(fn):
+                try:
+                    fn()
+                except Exception as e:
+                    print(f"⚠️ Failed to close upstream stream: {e}")
+
+
+class StreamTracker:
+    """Per-source counters. Pass a SharedState so every process (API workers, Streamlit apps)
+    adds to the same totals."""
+
+    def __init__(self, state=None, key="stream_tracker"):
+        self.state = state
+        self.key = key
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def completed(self, source, tokens):
+        def apply(counters):
+            c = self._entry(counters, source)
+            c["completed"] += 1
+            c["completed_tokens"] += tokens
+            return counters
+        self._update(apply)
+
+    def abandoned(self, source, tokens_received):
+        def apply(counters):
+            c = self._entry(counters, source)
+            average = c["completed_tokens"] / c["completed"] if c["completed"] else 0
+            c["abandoned"] += 1
+            c["abandoned_tokens_received"] += tokens_received
+            c["estimated_tokens_saved"] += max(0, round(average - tokens_received))
+            return counters
+        self._update(apply)
+        print(f"✂️ {source}: client disconnected after {tokens_received} tokens, upstream generation cancelled")
+
+    @staticmethod
+    def _entry(counters, source):
+        return counters.setdefault(source, {
+            "completed": 0,
+            "completed_tokens": 0,
+            "abandoned": 0,
+            "abandoned_tokens_received": 0,
+            "estimated_tokens_saved": 0
+        })
+
+    def _update(self, apply):
+        try:
+            if self.state is not None:
+                self.state.update(self.key, apply, default={})
+            else:
+                with self._lock:
+                    apply(self._counters)
+        except Exception as e:
+            # Accounting must never break a stream
+            print(f"⚠️ Stream tracker update failed: {e}")
+
+    def stats(self):
+        if self.state is not None:
+            counters = self.state.get(self.key, {})
+        else:
+            with self._lock:
+                counters = {source: dict(c) for source, c in self._counters.items()}
+
+        for c in counters.values():
+            started = c["completed"] + c["abandoned"]
+            c["avg_completion_tokens"] = round(c["completed_tokens"] / c["completed"], 1) if c["completed"] else None
+            c["abandon_rate"] = round(c["abandoned"] / started, 3) if started else 0.0
+        return {
+            "sources": counters,
+            "abandoned": sum(c["abandoned"] for c in counters.values()),
+            "estimated_tokens_saved": sum(c["estimated_tokens_saved"] for c in counters.values())
+        }
@@ -0,0 +1,170 @@
+"""
+Stale-While-Revalidate Cache
+Tiered (memory, then disk) cache for expensive generated content.
+
+- Fresh values are served from memory
+- Stale values are still served immediately while exactly one background
+  thread regenerates them (single-flight)
+- Only a cold start with nothing on disk makes a caller wait for generation
+- Optionally regenerates on a fixed schedule so readers never trigger it
+- With lock_path, worker processes regenerate one at a time; the others pick up
+  the fresh result from the disk tier instead of regenerating it again (a scheduled
+  refresh only does so if another worker wrote it after the refresh started)
+"""
+
+import time
+import threading
+from contextlib import nullcontext
+
+from shared_state import file_lock
+
+
+class StaleWhileRevalidate:
+    def __init__(self, name, regenerate, is_fresh, load=None, refresh_interval=None, retry_after=60,
+                 wait_on_miss=True, lock_path=None):
+        # regenerate() -> value                      (slow; expected to persist its own result)
+        # is_fresh(value, age_seconds) -> bool
+        # load() -> (value, updated_at) or None      (disk tier, read on first use and before regenerating)
+        # refresh_interval: optionally regenerate on a schedule as well as on demand
+        # retry_after: seconds to wait after a failed regeneration before trying again
+        # wait_on_miss: on a cold start, block for the first value (False returns None right away)
+        # lock_path: file lock that serializes regeneration across processes
+        self.name = name
+        self._regenerate = regenerate
+        self._is_fresh = is_fresh
+        self._load = load
+        self.refresh_interval = refresh_interval
+        self.retry_after = retry_after
+        self.wait_on_miss = wait_on_miss
+        self.lock_path = lock_path
+
+        self._lock = threading.Lock()
+        self._value = None
+        self._updated_at = 0
+        self._loaded = False
+        self._refreshing = None  # threading.Event while a regeneration is running
+        self._retry_at = 0
+        self._refresh_started = 0  # When this process's current (or last) refresh began
+        self.next_refresh_at = None  # When the schedule next regenerates (None without one)
+
+        self.regenerations = 0
+        self.failures = 0
+        self.last_regen_seconds = None
+        self.last_error = None
+        self.served = {"fresh": 0, "stale": 0, "miss": 0}
+
+        if refresh_interval:
+            threading.Thread(target=self._schedule, name=f"{name}-refresher", daemon=True).start()
+
+    def get(self):
+        """Returns (value, status) where status is fresh, stale or miss. Value is None only
+        when nothing was ever generated and generation failed."""
+        with self._lock:
+            if not self._loaded:
+                self._load_from_disk()
+            value, updated_at = self._value, self._updated_at
+
+        if value is None:
+            # Cold start: wait for the (single) regeneration
+            refresh = self._start_refresh()
+            if self.wait_on_miss:
+                refresh.wait()
+            with self._lock:
+                self.served["miss"] += 1
+                return self._value, "miss"
+
+        if self._is_fresh(value, time.time() - updated_at):
+            status = "fresh"
+        else:
+            status = "stale"
+            self._start_refresh()
+
+        with self._lock:
+            self.served[status] += 1
+        return value, status
+
+    def _load_from_disk(self):
+        self._loaded = True
+        if self._load is None:
+            return
+        try:
+            loaded = self._load()
+        except Exception as e:
+            print(f"⚠️ {self.name}: disk cache read failed: {e}")
+            return
+        if loaded is not None:
+            self._value, self._updated_at = loaded
+
+    def _start_refresh(self, scheduled=False):
+        """Starts a background regeneration unless one is already running. Returns its Event."""
+        with self._lock:
+            if self._refreshing is not None:
+                return self._refreshing
+            if time.time() < self._retry_at:
+                skipped = threading.Event()
+                skipped.set()
+                return skipped
+            done = self._refreshing = threading.Event()
+        threading.Thread(target=self._refresh, args=(done, scheduled), name=f"{self.name}-regen", daemon=True).start()
+        return done
+
+    def _refresh(self, done, scheduled=False):
+        start = time.time()
+        with self._lock:
+            self._refresh_started = start
+        try:
+            with file_lock(self.lock_path) if self.lock_path else nullcontext():
+                # Another process may have regenerated it while we waited for the lock. A scheduled
+                # refresh only takes a copy written since it started, so the schedule is kept
+                loaded = self._load() if self._load else None
+                if loaded is not None and self._is_fresh(loaded[0], time.time() - loaded[1]) and \
+                        (not scheduled or loaded[1] > self._refresh_started):
+                    value, updated_at = loaded
+                    regenerated = False
+                else:
+                    value, updated_at = self._regenerate(), time.time()
+                    regenerated = True
+            with self._lock:
+                self._value = value
+                self._updated_at = updated_at
+                self.last_error = None
+                if regenerated:
+                    self.regenerations += 1
+                    self.last_regen_seconds = round(time.time() - start, 2)
+        except Exception as e:
+            print(f"❌ {self.name}: regeneration failed: {e}")
+            with self._lock:
+                self.failures += 1
+                self.last_error = str(e)
+                self._retry_at = time.time() + self.retry_after
+        finally:
+            with self._lock:
+                self._refreshing = None
+            done.set()
+
+    def _schedule(self):
+        while True:
+            self._start_refresh(scheduled=True).wait()
+            self.next_refresh_at = time.time() + self.refresh_interval
+            time.sleep(self.refresh_interval)
+
+    def age(self):
+        with self._lock:
+            return round(time.time() - self._updated_at, 1) if self._value is not None else None
+
+    def updated_at(self):
+        """Unix time the current value was generated (None before the first one)."""
+        with self._lock:
+            return self._updated_at if self._value is not None else None
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "age_seconds": round(time.time() - self._updated_at, 1) if self._value is not None else None,
+                "refreshing": self._refreshing is not None,
+                "regenerations": self.regenerations,
+                "failures": self.failures,
+                "last_regen_seconds": self.last_regen_seconds,
+                "last_error": self.last_error,
+                "served": dict(self.served)
+            }